@@ -0,0 +1,181 @@
+import calendar
+import logging
+from datetime import date
+from app.core.config_handler import app_config
+from app.core.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# History tables that can move to the archive database, parents before the
+# rows that reference them. The archive file is attached to every connection
+# under the ARCHIVE_SCHEMA name, and a temporary view all_<table> per
+# connection shows the live and archived rows of each table together.
+ARCHIVE_SCHEMA = 'archive'
+ARCHIVED_TABLES = ['check_ins', 'booking_services', 'company_charges', 'reservations', 'reservation_cancellations']
+
+# Rows picked for one archiving run, per table. check_ins and reservations
+# are picked by age (:cutoff); the others follow their parent row. A stay
+# only moves once it is checked out and every charge on it is settled.
+_BATCH_SQL = {
+    'check_ins': '''
+        SELECT c.id FROM main.check_ins c
+        WHERE c.status = 'checked_out'
+          AND IFNULL(c.actual_departure, c.departure_date) < :cutoff
+          AND NOT EXISTS (SELECT 1 FROM main.booking_services bs
+                          WHERE bs.booking_id = c.id AND IFNULL(bs.is_paid, 0) = 0)
+          AND NOT EXISTS (SELECT 1 FROM main.company_charges cc
+                          WHERE cc.checkin_id = c.checkin_id AND IFNULL(cc.is_paid, 0) = 0)
+    ''',
+    'booking_services': '''
+        SELECT bs.id FROM main.booking_services bs
+        JOIN temp.archive_batch b ON b.table_name = 'check_ins' AND b.row_id = bs.booking_id
+    ''',
+    'company_charges': '''
+        SELECT cc.id FROM main.company_charges cc
+        JOIN main.check_ins c ON c.checkin_id = cc.checkin_id
+        JOIN temp.archive_batch b ON b.table_name = 'check_ins' AND b.row_id = c.id
+    ''',
+    'reservations': '''
+        SELECT r.id FROM main.reservations r WHERE r.arrival_date < :cutoff
+    ''',
+    'reservation_cancellations': '''
+        SELECT rc.id FROM main.reservation_cancellations rc
+        JOIN main.reservations r ON r.reservation_id = rc.reservation_id
+        JOIN temp.archive_batch b ON b.table_name = 'reservations' AND b.row_id = r.id
+    ''',
+}
+
+# Indexes on the archive tables for the report filters, parent lookups and
+# the daily_stats refresh
+_ARCHIVE_INDEXES = [
+    ('check_ins', 'arrival_date'),
+    ('check_ins', 'departure_date'),
+    ('check_ins', 'actual_departure'),
+    ('check_ins', 'checkin_id'),
+    ('booking_services', 'booking_id'),
+    ('booking_services', 'charge_date'),
+    ('company_charges', 'checkin_id'),
+    ('reservations', 'arrival_date'),
+    ('reservations', 'reservation_id'),
+    ('reservation_cancellations', 'reservation_id'),
+    ('reservation_cancellations', 'cancellation_date'),
+]
+
+
+def history_view(table):
+    """Name of the view over the live and archived rows of table"""
+    return f'all_{table}'
+
+
+def _columns(c, schema, table):
+    c.execute(f'PRAGMA {schema}.table_info({table})')
+    return [(row[1], row[2]) for row in c.fetchall()]
+
+
+def _create_views(c):
+    for table in ARCHIVED_TABLES:
+        columns = ', '.join(name for name, _type in _columns(c, 'main', table))
+        c.execute(f'DROP VIEW IF EXISTS temp.{history_view(table)}')
+        if columns:
+            c.execute(f'CREATE TEMP VIEW {history_view(table)} AS '
+                      f'SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM {ARCHIVE_SCHEMA}.{table}')
+
+
+def _attach(conn):
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (db_manager.get_archive_path(),))
+    conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL')
+    c = conn.cursor()
+    try:
+        _create_views(c)
+    finally:
+        c.close()
+
+
+def ensure_archive_schema():
+    """Create the archive tables, or add the columns the live tables gained since.
+
+    Archive tables carry the live columns and declared types (so MONEY
+    columns still convert) but no constraints: the rows they would point
+    to stay in the live database.
+    """
+    with db_manager.transaction() as c:
+        for table in ARCHIVED_TABLES:
+            columns = _columns(c, 'main', table)
+            archived = {name for name, _type in _columns(c, ARCHIVE_SCHEMA, table)}
+            if not archived:
+                definitions = ', '.join(f'{name} {type_}'.strip() for name, type_ in columns if name != 'id')
+                c.execute(f'CREATE TABLE {ARCHIVE_SCHEMA}.{table} (id INTEGER PRIMARY KEY, {definitions})')
+            else:
+                for name, type_ in columns:
+                    if name not in archived:
+                        c.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}.{table} ADD COLUMN {name} {type_}')
+        for table, column in _ARCHIVE_INDEXES:
+            c.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_{column} ON {table} ({column})')
+        _create_views(c)
+
+
+def _months_before(day, months):
+    month = day.month - 1 - months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    # The 31st becomes the last day of a shorter month
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _copy_batch(c):
+    for table in ARCHIVED_TABLES:
+        columns = ', '.join(name for name, _type in _columns(c, 'main', table))
+        c.execute(f'''
+            INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table} ({columns})
+            SELECT {columns} FROM main.{table}
+            WHERE id IN (SELECT row_id FROM temp.archive_batch WHERE table_name = ?)
+        ''', (table,))
+
+
+def archive_history(months=None):
+    """Move closed stays and old reservations into the archive database.
+
+    Stays checked out, with every service and company charge settled, and
+    reservations arriving more than `months` months ago (default: [Database]
+    archive_after_months) move along with their services, charges and
+    cancellations. Returns {table: rows moved}.
+
+    Rows are copied in one transaction and deleted from the live tables in
+    a second one that copies them again first, so a crash in between leaves
+    rows in both databases rather than in neither.
+    """
+    if months is None:
+        months = int(app_config.get('Database', 'archive_after_months', '12'))
+    cutoff = _months_before(date.today(), months).isoformat()
+    ensure_archive_schema()
+
+    with db_manager.transaction() as c:
+        c.execute('DROP TABLE IF EXISTS temp.archive_batch')
+        c.execute('''
+            CREATE TEMP TABLE archive_batch (
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                PRIMARY KEY (table_name, row_id)
+            ) WITHOUT ROWID
+        ''')
+        for table in ARCHIVED_TABLES:
+            c.execute(f"INSERT INTO temp.archive_batch SELECT '{table}', id FROM ({_BATCH_SQL[table]})",
+                      {'cutoff': cutoff})
+        _copy_batch(c)
+
+    moved = {}
+    with db_manager.transaction() as c:
+        _copy_batch(c)
+        for table in reversed(ARCHIVED_TABLES):
+            c.execute(f'''
+                DELETE FROM main.{table}
+                WHERE id IN (SELECT row_id FROM temp.archive_batch WHERE table_name = ?)
+                  AND id IN (SELECT id FROM {ARCHIVE_SCHEMA}.{table})
+            ''', (table,))
+            moved[table] = c.rowcount
+        c.execute('DROP TABLE temp.archive_batch')
+    logger.info(f"Archived history before {cutoff}: {moved}")
+    return moved
+
+
+db_manager.add_open_hook(_attach)
@@ -0,0 +1,251 @@
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from app.core.archive import ensure_archive_schema
+from app.core.cache import ref_cache
+from app.core.config_handler import app_config
+from app.core.connection import db_manager
+from app.core.executor import db_executor
+
+logger = logging.getLogger(__name__)
+
+# A backup set is kissan-<stamp>.db, plus kissan_archive-<stamp>.db when
+# the archive database exists (see app/core/archive.py)
+STAMP_FORMAT = '%Y%m%d-%H%M%S'
+_BACKUP_NAME = re.compile(r'^kissan-(\d{8}-\d{6})\.db$')
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_dir():
+    """Directory holding the backups ([Database] backup_path)"""
+    path = app_config.get('Database', 'backup_path') or os.path.join(
+        os.path.dirname(db_manager.get_db_path()), 'backups')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _sources():
+    sources = [('kissan', db_manager.get_db_path())]
+    archive_path = db_manager.get_archive_path()
+    if os.path.exists(archive_path):
+        sources.append(('kissan_archive', archive_path))
+    return sources
+
+
+def verify(path):
+    """Raise BackupError unless PRAGMA integrity_check passes on the file"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        result = str(e)
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise BackupError(f"{os.path.basename(path)} failed the integrity check: {result}")
+
+
+def _copy(source_path, dest_path, pages, sleep):
+    """Copy a live database with the backup API, a few pages at a time.
+
+    The source connection pins one WAL snapshot for the whole copy, so
+    commits from the front desk neither wait for the backup nor make it
+    start over; the copy is the database as of the moment it began.
+    """
+    part_path = dest_path + '.part'
+    source = sqlite3.connect(source_path, isolation_level=None)
+    dest = sqlite3.connect(part_path, isolation_level=None)
+    try:
+        source.execute('BEGIN')
+        source.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+        source.backup(dest, pages=pages, sleep=sleep)
+        source.execute('COMMIT')
+        # A self-contained file, without -wal / -shm companions
+        dest.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        source.close()
+        dest.close()
+    try:
+        verify(part_path)
+    except BackupError:
+        os.remove(part_path)
+        raise
+    os.replace(part_path, dest_path)
+
+
+def create_backup(pages=None, sleep_ms=None):
+    """Back up the live (and archive) database; return the main backup's path"""
+    if pages is None:
+        pages = int(app_config.get('Database', 'backup_pages', '256'))
+    if sleep_ms is None:
+        sleep_ms = int(app_config.get('Database', 'backup_sleep_ms', '10'))
+    directory = backup_dir()
+    created = datetime.now()
+    # Never overwrite a set taken within the same second
+    while os.path.exists(os.path.join(directory, f'kissan-{created:{STAMP_FORMAT}}.db')):
+        created += timedelta(seconds=1)
+    stamp = created.strftime(STAMP_FORMAT)
+    paths = []
+    for name, source_path in _sources():
+        path = os.path.join(directory, f'{name}-{stamp}.db')
+        _copy(source_path, path, pages, sleep_ms / 1000)
+        paths.append(path)
+    logger.info(f"Backup written to {paths[0]}")
+    return paths[0]
+
+
+def _archive_backup_path(path):
+    """The archive file of the backup set path belongs to, or None"""
+    directory, filename = os.path.split(path)
+    match = _BACKUP_NAME.match(filename)
+    if not match:
+        return None
+    archive_path = os.path.join(directory, f'kissan_archive-{match.group(1)}.db')
+    return archive_path if os.path.exists(archive_path) else None
+
+
+def list_backups():
+    """Backup sets, newest first: {path, archive_path, created, size}"""
+    directory = backup_dir()
+    backups = []
+    for filename in os.listdir(directory):
+        match = _BACKUP_NAME.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        backups.append({
+            'path': path,
+            'archive_path': _archive_backup_path(path),
+            'created': datetime.strptime(match.group(1), STAMP_FORMAT),
+            'size': os.path.getsize(path),
+        })
+    backups.sort(key=lambda backup: backup['created'], reverse=True)
+    return backups
+
+
+def rotate_backups(days=None):
+    """Delete backup sets older than `days` ([Database] backup_days), always keeping the newest"""
+    if days is None:
+        days = int(app_config.get('Database', 'backup_days', '7'))
+    cutoff = datetime.now() - timedelta(days=days)
+    removed = []
+    for backup in list_backups()[1:]:
+        if backup['created'] < cutoff:
+            for path in (backup['path'], backup['archive_path']):
+                if path:
+                    os.remove(path)
+            removed.append(backup['path'])
+    return removed
+
+
+def run_backup():
+    """Back up, then rotate; what the scheduler runs on a db_executor thread"""
+    path = create_backup()
+    rotate_backups()
+    return path
+
+
+def restore_backup(path):
+    """Replace the live database and archive with a backup set.
+
+    A set without an archive file leaves the archive empty. The backup
+    files are verified and the current data is backed up first; returns
+    the path of that safety backup. Other terminals should be closed, and
+    the application restarted afterwards.
+    """
+    archive_path = _archive_backup_path(path)
+    verify(path)
+    if archive_path:
+        verify(archive_path)
+    safety_path = create_backup(pages=-1, sleep_ms=0)
+    _restore(path, db_manager.get_connection())
+    if archive_path or os.path.exists(db_manager.get_archive_path()):
+        dest = sqlite3.connect(db_manager.get_archive_path(), isolation_level=None)
+        try:
+            if archive_path:
+                _restore(archive_path, dest)
+            else:
+                # The set was taken before anything was archived: the live
+                # archive holds rows the restored database never had, so it
+                # is emptied (its rows are in the safety backup). The file
+                # stays in place, attached to the open connections.
+                blank = sqlite3.connect(':memory:')
+                try:
+                    blank.backup(dest)
+                finally:
+                    blank.close()
+        finally:
+            dest.close()
+        ensure_archive_schema()
+    ref_cache.invalidate()
+    logger.info(f"Restored {path}; previous data saved to {safety_path}")
+    return safety_path
+
+
+def _restore(path, dest):
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        source.backup(dest)
+    finally:
+        source.close()
+
+
+class BackupScheduler(QObject):
+    """Takes a backup on a db_executor thread whenever the newest one is
+    older than [Database] backup_interval_hours, checking once an hour"""
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    CHECK_INTERVAL_MS = 60 * 60 * 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = None
+        self._handle = None
+
+    def start(self):
+        if self._timer is None:
+            # Created here so the module-level instance can exist before
+            # the QApplication does
+            self._timer = QTimer(self)
+            self._timer.timeout.connect(self.check)
+        self._timer.start(self.CHECK_INTERVAL_MS)
+        self.check()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    def check(self):
+        """Start a backup if the newest one is too old"""
+        hours = float(app_config.get('Database', 'backup_interval_hours', '24'))
+        backups = list_backups()
+        if not backups or datetime.now() - backups[0]['created'] >= timedelta(hours=hours):
+            self.run()
+
+    def run(self):
+        """Start a backup now, unless one is already running"""
+        if self._handle is not None:
+            return
+        self._handle = db_executor.submit(run_backup)
+        self._handle.finished.connect(self._on_finished)
+        self._handle.failed.connect(self._on_failed)
+
+    def _on_finished(self, path):
+        self._handle = None
+        self.finished.emit(path)
+
+    def _on_failed(self, error):
+        self._handle = None
+        logger.error(f"Backup failed: {error}")
+        self.failed.emit(str(error))
+
+
+# Singleton instance
+backup_scheduler = BackupScheduler()
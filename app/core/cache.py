@@ -0,0 +1,97 @@
+import threading
+from functools import wraps
+from app.core.connection import db_manager
+
+
+class ReferenceCache:
+    """Read-through cache for small reference tables (rooms, rates, services...).
+
+    Each entry is loaded on first use by its registered loader and kept until
+    a writer invalidates it. Every invalidation bumps the entry's version, so
+    a load that raced with a write is thrown away instead of being stored,
+    and keyed indexes built on top of an entry are dropped with it.
+
+    Rows are stored and handed out read-only (FrozenRecord), so every caller
+    shares them without a copy; copy() one to edit it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders = {}
+        self._versions = {}
+        self._entries = {}
+        self._indexes = {}
+
+    def register(self, name, loader):
+        """Register loader() as the source of the named entry"""
+        self._loaders[name] = loader
+        self._versions.setdefault(name, 0)
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def version(self, name):
+        """Counter bumped every time the entry is invalidated"""
+        return self._versions[name]
+
+    def _rows(self, name):
+        with self._lock:
+            rows = self._entries.get(name)
+            version = self._versions[name]
+        if rows is not None:
+            return rows
+        rows = tuple(row.frozen() for row in self._loaders[name]())
+        # Reads inside a write transaction may see uncommitted rows that a
+        # rollback would take back, so they are served but not kept.
+        if not db_manager.get_connection().in_transaction:
+            with self._lock:
+                if self._versions[name] == version:
+                    self._entries[name] = rows
+        return rows
+
+    def get(self, name):
+        """All rows of the entry"""
+        return list(self._rows(name))
+
+    def lookup(self, name, key_column, key):
+        """The row whose key_column equals key, or None"""
+        with self._lock:
+            index = self._indexes.get((name, key_column))
+        if index is None:
+            rows = self._rows(name)
+            index = {row[key_column]: row for row in rows}
+            with self._lock:
+                if self._entries.get(name) is rows:
+                    self._indexes[(name, key_column)] = index
+        return index.get(key)
+
+    def invalidate(self, *names):
+        """Drop the named entries (all of them when no name is given)"""
+        with self._lock:
+            for name in names or list(self._versions):
+                self._versions[name] += 1
+                self._entries.pop(name, None)
+            self._indexes = {key: index for key, index in self._indexes.items() if key[0] in self._entries}
+
+    def invalidates(self, *names):
+        """Decorator for writers: invalidate the entries once the write commits.
+
+        A writer called inside an outer transaction() (a service's unit of
+        work) only commits with it, so the invalidation waits for that
+        commit (db_manager.on_commit) and is dropped on rollback. Done any
+        earlier, another thread could reload and keep the old rows in
+        between.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    db_manager.on_commit(lambda: self.invalidate(*names))
+            return wrapper
+        return decorator
+
+
+# Singleton instance
+ref_cache = ReferenceCache()
@@ -0,0 +1,105 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from app.core.cache import ref_cache
+from app.core.config_handler import app_config
+from app.core.connection import db_manager
+from app.core.migrations import CHANGE_TRACKED_TABLES
+
+
+class ChangeTracker(QObject):
+    """Announces rows that other connections changed in the shared database.
+
+    poll() costs a single PRAGMA data_version while nothing happened. SQLite
+    bumps that counter only for commits made through other connections
+    (another terminal, or another thread of this one); when it moves, the
+    change_log entries written since the last poll are read and reported:
+
+    changes        {table: {row_id: op}} for the whole batch, op being
+                   'I', 'U' or 'D'
+    table_changed  (table, row_ids) once per changed table
+
+    If the log was pruned past the last entry seen, every tracked table is
+    reported with an empty id list, meaning "reload all of it". Writes made
+    through the polling connection are not announced by themselves (the
+    widget that made them refreshes its own views), but they can show up in
+    the next batch.
+    """
+    changes = pyqtSignal(dict)
+    table_changed = pyqtSignal(str, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = None
+        self._data_version = None
+        self.last_seq = 0
+
+    def start(self, interval_ms=None):
+        """Prune the log, skip what is already in it and start polling"""
+        if interval_ms is None:
+            interval_ms = int(app_config.get('Database', 'change_poll_ms', '1000'))
+        self.prune()
+        conn = db_manager.get_connection()
+        self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        self.last_seq = conn.execute('SELECT IFNULL(MAX(seq), 0) FROM change_log').fetchone()[0]
+        if self._timer is None:
+            # Created here rather than in __init__ so the module-level
+            # instance can exist before the QApplication does
+            self._timer = QTimer(self)
+            self._timer.timeout.connect(self.poll)
+        self._timer.start(interval_ms)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    def prune(self, keep=None):
+        """Delete all but the newest `keep` change_log entries"""
+        if keep is None:
+            keep = int(app_config.get('Database', 'change_log_keep', '10000'))
+        with db_manager.transaction() as c:
+            c.execute('DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?', (keep,))
+
+    def poll(self):
+        """Report changes committed by other connections since the last poll"""
+        conn = db_manager.get_connection()
+        if conn.in_transaction:
+            return {}
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._data_version:
+            return {}
+        self._data_version = version
+
+        with db_manager.snapshot() as c:
+            c.execute('SELECT MIN(seq), MAX(seq) FROM change_log')
+            first, last = c.fetchone()
+            if first is not None and first > self.last_seq + 1:
+                rows = None
+            else:
+                c.execute('SELECT table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq',
+                          (self.last_seq,))
+                rows = c.fetchall()
+        if last is not None:
+            self.last_seq = last
+
+        if rows is None:
+            changes = {table: {} for table in CHANGE_TRACKED_TABLES}
+        else:
+            changes = {}
+            for table, row_id, op in rows:
+                ops = changes.setdefault(table, {})
+                # A row inserted and then updated in the batch is still new
+                if ops.get(row_id) != 'I' or op == 'D':
+                    ops[row_id] = op
+        if not changes:
+            return changes
+
+        cached = [table for table in changes if table in ref_cache]
+        if cached:
+            ref_cache.invalidate(*cached)
+        self.changes.emit(changes)
+        for table, ops in changes.items():
+            self.table_changed.emit(table, list(ops))
+        return changes
+
+
+# Singleton instance
+change_tracker = ChangeTracker()
@@ -49,18 +49,15 @@ class ConfigManager:
         appdata = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
         
         if 'Database' in self.config:
-            self.config['Database']['path'] = os.path.expandvars(
-                self.config['Database']['path'].replace(
-                    '%APPDATA%', 
-                    str(Path(appdata) / 'KISSAN')
-                )
-            )
-            self.config['Database']['backup_path'] = os.path.expandvars(
-                self.config['Database']['backup_path'].replace(
-                    '%APPDATA%', 
-                    str(Path(appdata) / 'KISSAN')
-                )
-            )
+            # Either may be missing; the code then falls back to its default
+            for key in ('path', 'backup_path'):
+                if key in self.config['Database']:
+                    self.config['Database'][key] = os.path.expandvars(
+                        self.config['Database'][key].replace(
+                            '%APPDATA%',
+                            str(Path(appdata) / 'KISSAN')
+                        )
+                    )
     
     def create_default_config(self):
         """Create default configuration file"""
@@ -81,7 +78,31 @@ class ConfigManager:
         # Add Database section
         self.config['Database'] = {
             'path': '%APPDATA%/kissan.db',
-            'backup_path': '%APPDATA%/backups'
+            'backup_path': '%APPDATA%/backups',
+            'backup_days': '7',
+            'backup_interval_hours': '24',
+            'backup_pages': '256',
+            'backup_sleep_ms': '10',
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'foreign_keys': 'ON',
+            'cache_size': '-16000',
+            'mmap_size': '268435456',
+            'busy_timeout': '5000',
+            'change_poll_ms': '1000',
+            'change_log_keep': '10000',
+            'worker_threads': '2',
+            'fetch_size': '500',
+            'archive_after_months': '12'
+        }
+        
+        # Add Diagnostics section
+        self.config['Diagnostics'] = {
+            'query_stats': 'no',
+            'slow_query_ms': '200',
+            'slow_log_path': '',
+            'slow_log_max_bytes': '1048576',
+            'slow_log_backups': '3'
         }
         
         # Add Security section
@@ -0,0 +1,203 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.core.config_handler import app_config
+from app.core import money  # noqa: F401 (registers the MONEY column type)
+
+# PRAGMAs applied to every new connection. Each one can be overridden by a
+# key of the same name in the [Database] section of the config file.
+PRAGMA_DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'cache_size': '-16000',
+    'mmap_size': '268435456',
+    'busy_timeout': '5000',
+}
+
+# Rows a streaming reader (the iter_* functions) fetches from SQLite at a
+# time, unless the [Database] section sets fetch_size
+FETCH_SIZE = 500
+
+
+class ConnectionManager:
+    """Keeps one long-lived SQLite connection per thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._db_path = None
+        # Swapped for an instrumented subclass when query stats are enabled
+        self.cursor_class = sqlite3.Cursor
+        # Called with every newly opened connection (see add_open_hook)
+        self._open_hooks = []
+
+    def get_db_path(self):
+        """Resolve the database path once instead of on every query"""
+        if self._db_path is None:
+            self._db_path = app_config.get_db_path()
+        return self._db_path
+
+    def get_archive_path(self):
+        """Database file holding archived history, next to the live one
+        (kissan.db keeps it in kissan_archive.db)"""
+        return os.path.splitext(self.get_db_path())[0] + '_archive.db'
+
+    def get_fetch_size(self):
+        """Batch size for the streaming readers ([Database] fetch_size)"""
+        return max(int(app_config.get('Database', 'fetch_size', FETCH_SIZE)), 1)
+
+    def set_db_path(self, path):
+        """Point every connection opened from now on at another database file.
+
+        Closes the open connections first; meant for scripts (data
+        generator, benchmarks) working on a file other than the configured one.
+        """
+        self.close_all()
+        self._db_path = path
+
+    def get_connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.on_commit = None
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    def _open(self):
+        # isolation_level=None leaves transaction control to transaction(),
+        # so plain reads never hold a snapshot open between calls.
+        # detect_types turns MONEY columns into Money values.
+        conn = sqlite3.connect(self.get_db_path(), isolation_level=None, check_same_thread=False,
+                               detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        for name, default in PRAGMA_DEFAULTS.items():
+            value = app_config.get('Database', name, default)
+            conn.execute(f'PRAGMA {name} = {value}')
+        for hook in self._open_hooks:
+            hook(conn)
+        return conn
+
+    def add_open_hook(self, hook):
+        """Run hook(conn) on every connection opened from now on"""
+        self._open_hooks.append(hook)
+
+    @contextmanager
+    def cursor(self):
+        """Yield a cursor on the thread's connection for read-only work"""
+        cursor = self.get_connection().cursor(self.cursor_class)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def on_commit(self, callback):
+        """Call callback() once the calling thread's outermost transaction
+        (or snapshot) commits; it is dropped if the work it belongs to is
+        rolled back. Outside a transaction it is called straight away."""
+        pending = getattr(self._local, 'on_commit', None)
+        if pending is None:
+            callback()
+        else:
+            pending.append(callback)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor inside a transaction that commits once on exit.
+
+        Nested calls on the same thread join the outer transaction through a
+        savepoint, so a failing inner block only undoes its own work and the
+        whole sequence still costs a single commit. Callbacks registered with
+        on_commit() run after that commit.
+        """
+        conn = self.get_connection()
+        depth = self._local.depth
+        savepoint = f'sp_{depth}'
+        conn.execute('BEGIN IMMEDIATE' if depth == 0 else f'SAVEPOINT {savepoint}')
+        if depth == 0:
+            self._local.on_commit = []
+        pending = self._local.on_commit
+        # The callbacks registered before this block, kept if it rolls back
+        registered = len(pending)
+        self._local.depth = depth + 1
+        cursor = conn.cursor(self.cursor_class)
+        try:
+            yield cursor
+        except BaseException:
+            if depth == 0:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            else:
+                del pending[registered:]
+                if conn.in_transaction:
+                    conn.execute(f'ROLLBACK TO {savepoint}')
+                    conn.execute(f'RELEASE {savepoint}')
+            raise
+        else:
+            conn.execute('COMMIT' if depth == 0 else f'RELEASE {savepoint}')
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self._local.on_commit = None
+            cursor.close()
+        # Only reached once the outermost block has committed
+        if depth == 0:
+            for callback in pending:
+                callback()
+
+    @contextmanager
+    def snapshot(self):
+        """Yield a cursor whose reads all see the same committed state.
+
+        Opens a deferred (read) transaction, so several queries can be
+        combined without taking the write lock. Inside a transaction() the
+        outer transaction already provides the snapshot and is reused.
+        """
+        conn = self.get_connection()
+        depth = self._local.depth
+        if depth == 0:
+            conn.execute('BEGIN')
+            self._local.on_commit = []
+        self._local.depth = depth + 1
+        cursor = conn.cursor(self.cursor_class)
+        try:
+            yield cursor
+        finally:
+            self._local.depth = depth
+            cursor.close()
+            if depth == 0:
+                pending, self._local.on_commit = self._local.on_commit, None
+                if conn.in_transaction:
+                    conn.execute('COMMIT')
+                for callback in pending:
+                    callback()
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                self._connections.pop(threading.get_ident(), None)
+            self._local.conn = None
+            conn.close()
+
+    def close_all(self):
+        """Close every connection opened by any thread"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        self._db_path = None
+
+
+# Singleton instance
+db_manager = ConnectionManager()
+atexit.register(db_manager.close_all)
@@ -1,256 +1,415 @@
 import sqlite3
-from app.core.config_handler import app_config
-from datetime import datetime
+from app.core.archive import ensure_archive_schema, history_view
+from app.core.cache import ref_cache
+from app.core.connection import db_manager
+from app.core.instrumentation import instrument_module
+from app.core.migrations import migrate, SEARCH_KINDS, SEARCH_SOURCES
+from app.core.money import Money, to_cents
+from app.core.rows import fetch_all, fetch_one, iter_records
+from datetime import date, datetime, timedelta
+import re
 
 def get_connection():
-    db_path = app_config.get_db_path()
-    return sqlite3.connect(db_path)
+    """Return the calling thread's shared connection (do not close it)"""
+    return db_manager.get_connection()
+
+# Context managers every CRUD function runs on: cursor() for reads,
+# transaction() for writes (nested calls join the outer transaction),
+# snapshot() for several reads that must agree with each other.
+cursor = db_manager.cursor
+transaction = db_manager.transaction
+snapshot = db_manager.snapshot
+
+def _insert_many(c, sql, params):
+    """Run an INSERT once per parameter tuple and return the new row ids.
+
+    Runs inside the caller's write transaction, so no other connection can
+    interleave and AUTOINCREMENT hands out one contiguous block of ids.
+    """
+    params = list(params)
+    if not params:
+        return []
+    c.executemany(sql, params)
+    c.execute('SELECT last_insert_rowid()')
+    last_id = c.fetchone()[0]
+    return list(range(last_id - len(params) + 1, last_id + 1))
+
+# Dates are stored as ISO text: DATE_FORMAT for calendar days (arrival,
+# departure, date of birth) and DATETIME_FORMAT for moments (check-in time,
+# creation and cancellation stamps). Both sort chronologically as plain
+# strings, so range filters compare the bare column and can use its index.
+DATE_FORMAT = '%Y-%m-%d'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value.strip())
+
+def to_iso_date(value):
+    """Normalize a date, datetime or ISO string to 'YYYY-MM-DD' (None/'' pass through)"""
+    return _as_datetime(value).strftime(DATE_FORMAT) if value else value
+
+def to_iso_datetime(value):
+    """Normalize a date, datetime or ISO string to 'YYYY-MM-DD HH:MM:SS' (None/'' pass through)"""
+    return _as_datetime(value).strftime(DATETIME_FORMAT) if value else value
+
+def day_range(from_date, to_date):
+    """Half-open [from, day after to) bounds covering both days entirely.
+
+    Matches date-only and date-time values alike, so a filter written as
+    col >= ? AND col < ? needs no date() call on the column.
+    """
+    end = _as_datetime(to_date) + timedelta(days=1)
+    return to_iso_date(from_date), end.strftime(DATE_FORMAT)
+
+# Rows per page for the list views
+PAGE_SIZE = 100
+
+def _keyset_page(select_sql, id_column, after, limit, sort_column=None, sort_key=None, descending=True,
+                 filters=(), filter_params=()):
+    """Fetch one page of select_sql ordered by (sort_column, id_column).
+
+    after is the last row of the previous page (None for the first page);
+    the next page seeks past its sort values instead of using OFFSET, so
+    every page costs the same however deep the user has scrolled. filters
+    are further WHERE conditions, filter_params their parameters.
+    """
+    op, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+    conditions, params = list(filters), list(filter_params)
+    if sort_column is None:
+        order = f'{id_column} {direction}'
+        if after is not None:
+            conditions.append(f'{id_column} {op} ?')
+            params.append(after['id'])
+    else:
+        order = f'{sort_column} {direction}, {id_column} {direction}'
+        if after is not None:
+            conditions.append(f'({sort_column}, {id_column}) {op} (?, ?)')
+            params += [after[sort_key], after['id']]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with cursor() as c:
+        c.execute(f'{select_sql} {where} ORDER BY {order} LIMIT ?', params + [limit])
+        return fetch_all(c)
+
+# Streaming readers (iter_*) yield their rows instead of returning a list,
+# so exports of the whole history run in constant memory. Read them to the
+# end on the thread that started them: the cursor stays open until then.
+def _iter_rows(sql, params=()):
+    """Yield the rows of sql as Records, [Database] fetch_size rows at a time"""
+    with cursor() as c:
+        c.execute(sql, params)
+        yield from iter_records(c, db_manager.get_fetch_size())
 
 def init_db():
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Create users table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            role TEXT NOT NULL,
-            is_active BOOLEAN NOT NULL DEFAULT 1,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create guests table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS guests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            id_type TEXT,
-            id_number TEXT,
-            dob TEXT,
-            nationality TEXT,
-            phone_code TEXT,
-            phone_number TEXT,
-            email TEXT,
-            address TEXT,
-            vip_status TEXT,
-            preferences TEXT,
-            company_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (company_id) REFERENCES company_accounts(id) ON DELETE SET NULL
-        )
-    ''')
+    with transaction() as c:
+        # Create users table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                role TEXT NOT NULL,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
     
-    # Create company_accounts table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS company_accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            address TEXT,
-            phone TEXT,
-            email TEXT,
-            tax_id TEXT,
-            billing_terms TEXT,
-            credit_limit DECIMAL(10,2),
-            payment_due_days INTEGER,
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        # Create guests table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS guests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                id_type TEXT,
+                id_number TEXT,
+                dob TEXT,
+                nationality TEXT,
+                phone_code TEXT,
+                phone_number TEXT,
+                email TEXT,
+                address TEXT,
+                vip_status TEXT,
+                preferences TEXT,
+                company_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (company_id) REFERENCES company_accounts(id) ON DELETE SET NULL
+            )
+        ''')
     
-    # Create company_charges table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS company_charges (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_id INTEGER NOT NULL,
-            checkin_id TEXT NOT NULL,
-            guest_id INTEGER NOT NULL,
-            charge_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            room_charges DECIMAL(10,2) DEFAULT 0,
-            service_charges DECIMAL(10,2) DEFAULT 0,
-            total_amount DECIMAL(10,2) NOT NULL,
-            is_paid BOOLEAN DEFAULT 0,
-            payment_date TIMESTAMP,
-            notes TEXT,
-            FOREIGN KEY (company_id) REFERENCES company_accounts(id),
-            FOREIGN KEY (checkin_id) REFERENCES check_ins(checkin_id),
-            FOREIGN KEY (guest_id) REFERENCES guests(id)
-        )
-    ''')
+        # Create company_accounts table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS company_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                address TEXT,
+                phone TEXT,
+                email TEXT,
+                tax_id TEXT,
+                billing_terms TEXT,
+                credit_limit MONEY,
+                payment_due_days INTEGER,
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                open_balance MONEY NOT NULL DEFAULT 0
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS rooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            number TEXT NOT NULL UNIQUE,
-            type TEXT,
-            beds INTEGER,
-            floor TEXT,
-            location TEXT,
-            status TEXT
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS check_ins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            checkin_id TEXT NOT NULL UNIQUE,
-            transaction_id TEXT NOT NULL,
-            guest_id INTEGER,
-            room_id INTEGER,
-            checkin_date TEXT NOT NULL,
-            arrival_date TEXT NOT NULL,
-            departure_date TEXT NOT NULL,
-            num_guests INTEGER,
-            total_paid REAL,
-            amount_due REAL,
-            payment_method TEXT,
-            status TEXT,
-            actual_departure TEXT,
-            FOREIGN KEY (guest_id) REFERENCES guests (id),
-            FOREIGN KEY (room_id) REFERENCES rooms (id)
-        )
-    ''')
+        # Create company_charges table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS company_charges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                checkin_id TEXT NOT NULL,
+                guest_id INTEGER NOT NULL,
+                charge_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                room_charges MONEY DEFAULT 0,
+                service_charges MONEY DEFAULT 0,
+                total_amount MONEY NOT NULL,
+                is_paid BOOLEAN DEFAULT 0,
+                payment_date TIMESTAMP,
+                notes TEXT,
+                FOREIGN KEY (company_id) REFERENCES company_accounts(id),
+                FOREIGN KEY (checkin_id) REFERENCES check_ins(checkin_id),
+                FOREIGN KEY (guest_id) REFERENCES guests(id)
+            )
+        ''')
     
-    # New tables for settings
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS hotel_settings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hotel_name TEXT,
-            hotel_address TEXT,
-            phone TEXT,
-            email TEXT,
-            website TEXT
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS rooms (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                number TEXT NOT NULL UNIQUE,
+                type TEXT,
+                beds INTEGER,
+                floor TEXT,
+                location TEXT,
+                status TEXT
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS check_ins (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                checkin_id TEXT NOT NULL UNIQUE,
+                transaction_id TEXT NOT NULL,
+                guest_id INTEGER,
+                room_id INTEGER,
+                checkin_date TEXT NOT NULL,
+                arrival_date TEXT NOT NULL,
+                departure_date TEXT NOT NULL,
+                num_guests INTEGER,
+                total_paid MONEY,
+                amount_due MONEY,
+                payment_method TEXT,
+                status TEXT,
+                actual_departure TEXT,
+                FOREIGN KEY (guest_id) REFERENCES guests (id),
+                FOREIGN KEY (room_id) REFERENCES rooms (id)
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS room_rates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_type TEXT NOT NULL UNIQUE,
-            night_rate REAL NOT NULL
-        )
-    ''')
+        # New tables for settings
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS hotel_settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hotel_name TEXT,
+                hotel_address TEXT,
+                phone TEXT,
+                email TEXT,
+                website TEXT
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS services (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            default_price REAL NOT NULL,
-            unit TEXT NOT NULL
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS room_rates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_type TEXT NOT NULL UNIQUE,
+                night_rate MONEY NOT NULL
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS booking_services (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER,
-            guest_id INTEGER,
-            service_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL DEFAULT 1,
-            unit_price_at_time_of_charge REAL NOT NULL,
-            total_charge REAL NOT NULL,
-            charge_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-            charged_by_user_id INTEGER,
-            notes TEXT,
-            is_paid INTEGER DEFAULT 0,
-            amount_paid REAL DEFAULT 0,
-            remaining_amount REAL DEFAULT 0,
-            payment_date TEXT,
-            FOREIGN KEY (booking_id) REFERENCES check_ins (id),
-            FOREIGN KEY (service_id) REFERENCES services (id),
-            FOREIGN KEY (charged_by_user_id) REFERENCES users (id)
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                default_price MONEY NOT NULL,
+                unit TEXT NOT NULL
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS tax_rates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            tax_type TEXT NOT NULL CHECK(tax_type IN ('percentage', 'fixed')),
-            percentage REAL,
-            amount REAL,
-            apply_to_rooms BOOLEAN NOT NULL DEFAULT 1,
-            apply_to_services BOOLEAN NOT NULL DEFAULT 1
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS booking_services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                booking_id INTEGER,
+                guest_id INTEGER,
+                service_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                unit_price_at_time_of_charge MONEY NOT NULL,
+                total_charge MONEY NOT NULL,
+                charge_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                charged_by_user_id INTEGER,
+                notes TEXT,
+                is_paid INTEGER DEFAULT 0,
+                amount_paid MONEY DEFAULT 0,
+                remaining_amount MONEY DEFAULT 0,
+                payment_date TEXT,
+                FOREIGN KEY (booking_id) REFERENCES check_ins (id),
+                FOREIGN KEY (service_id) REFERENCES services (id),
+                FOREIGN KEY (charged_by_user_id) REFERENCES users (id)
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS reservations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            reservation_id TEXT NOT NULL UNIQUE,
-            guest_first_name TEXT NOT NULL,
-            guest_last_name TEXT NOT NULL,
-            guest_email TEXT,
-            guest_phone TEXT,
-            arrival_date TEXT NOT NULL,
-            num_guests INTEGER NOT NULL,
-            room_id INTEGER,
-            room_type TEXT,
-            special_requests TEXT,
-            payment_method TEXT,
-            deposit_amount REAL,
-            amount_due REAL,
-            status TEXT NOT NULL,
-            created_on TEXT NOT NULL,
-            FOREIGN KEY (room_id) REFERENCES rooms (id)
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS tax_rates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                tax_type TEXT NOT NULL CHECK(tax_type IN ('percentage', 'fixed')),
+                percentage REAL,
+                amount MONEY,
+                apply_to_rooms BOOLEAN NOT NULL DEFAULT 1,
+                apply_to_services BOOLEAN NOT NULL DEFAULT 1
+            )
+        ''')
     
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS reservation_cancellations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            reservation_id TEXT NOT NULL,
-            cancellation_date TEXT NOT NULL,
-            reason TEXT NOT NULL,
-            refund_amount REAL,
-            notes TEXT,
-            cancelled_by TEXT,
-            FOREIGN KEY (reservation_id) REFERENCES reservations (reservation_id)
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                reservation_id TEXT NOT NULL UNIQUE,
+                guest_first_name TEXT NOT NULL,
+                guest_last_name TEXT NOT NULL,
+                guest_email TEXT,
+                guest_phone TEXT,
+                arrival_date TEXT NOT NULL,
+                departure_date TEXT,
+                num_guests INTEGER NOT NULL,
+                room_id INTEGER,
+                room_type TEXT,
+                special_requests TEXT,
+                payment_method TEXT,
+                deposit_amount MONEY,
+                amount_due MONEY,
+                status TEXT NOT NULL,
+                created_on TEXT NOT NULL,
+                FOREIGN KEY (room_id) REFERENCES rooms (id)
+            )
+        ''')
     
-    # Create invoices table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            invoice_number TEXT NOT NULL UNIQUE,
-            date_generated TEXT NOT NULL,
-            due_date TEXT,
-            customer_name TEXT NOT NULL,
-            customer_email TEXT,
-            customer_phone TEXT,
-            billing_address TEXT,
-            tax_id TEXT,
-            items TEXT NOT NULL, -- JSON string of items
-            subtotal REAL NOT NULL,
-            tax_amount REAL NOT NULL,
-            total_amount REAL NOT NULL,
-            amount_paid REAL DEFAULT 0,
-            balance_due REAL NOT NULL,
-            payment_terms TEXT,
-            special_instructions TEXT,
-            pdf_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS reservation_cancellations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                reservation_id TEXT NOT NULL,
+                cancellation_date TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                refund_amount MONEY,
+                notes TEXT,
+                cancelled_by TEXT,
+                FOREIGN KEY (reservation_id) REFERENCES reservations (reservation_id)
+            )
+        ''')
     
-    conn.commit()
-    conn.close()
+        # Create invoices table
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS invoices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_number TEXT NOT NULL UNIQUE,
+                date_generated TEXT NOT NULL,
+                due_date TEXT,
+                customer_name TEXT NOT NULL,
+                customer_email TEXT,
+                customer_phone TEXT,
+                billing_address TEXT,
+                tax_id TEXT,
+                subtotal MONEY NOT NULL,
+                tax_amount MONEY NOT NULL,
+                total_amount MONEY NOT NULL,
+                amount_paid MONEY DEFAULT 0,
+                balance_due MONEY NOT NULL,
+                payment_terms TEXT,
+                special_instructions TEXT,
+                pdf_path TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    # Bring the schema up to date (indexes, table rebuilds, ...)
+    migrate()
+    # Archive tables follow the live ones (see app/core/archive.py)
+    ensure_archive_schema()
+    # daily_stats starts out from the history already on record
+    with cursor() as c:
+        c.execute('SELECT EXISTS (SELECT 1 FROM daily_stats)')
+        stats_empty = not c.fetchone()[0]
+    if stats_empty:
+        rebuild_daily_stats()
+    ref_cache.invalidate()
+
+INSERT_GUEST_SQL = '''
+    INSERT INTO guests (
+        first_name, last_name, id_type, id_number, dob,
+        nationality, phone_code, phone_number, email,
+        address, vip_status, preferences, company_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _guest_params(guest):
+    return (
+        guest['first_name'],
+        guest['last_name'],
+        guest.get('id_type'),
+        guest.get('id_number'),
+        guest.get('dob'),
+        guest.get('nationality'),
+        guest.get('phone_code'),
+        guest.get('phone_number'),
+        guest.get('email'),
+        guest.get('address'),
+        guest.get('vip_status'),
+        guest.get('preferences'),
+        guest.get('company_id')
+    )
 
 def insert_guest(guest):
-    conn = get_connection()
-    c = conn.cursor()
     try:
+        with transaction() as c:
+            c.execute(INSERT_GUEST_SQL, _guest_params(guest))
+            return c.lastrowid
+    except sqlite3.IntegrityError as e:
+        if "UNIQUE constraint failed" in str(e):
+            raise ValueError("A guest with this ID number already exists")
+        raise
+
+def insert_guests_bulk(guests):
+    """Insert many guests in one transaction and return their ids"""
+    try:
+        with transaction() as c:
+            return _insert_many(c, INSERT_GUEST_SQL, map(_guest_params, guests))
+    except sqlite3.IntegrityError as e:
+        if "UNIQUE constraint failed" in str(e):
+            raise ValueError("A guest with this ID number already exists")
+        raise
+
+def update_guest(guest_id, guest):
+    """Update an existing guest record"""
+    with transaction() as c:
         c.execute('''
-            INSERT INTO guests (
-                first_name, last_name, id_type, id_number, dob,
-                nationality, phone_code, phone_number, email,
-                address, vip_status, preferences, company_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            UPDATE guests SET
+                first_name = ?,
+                last_name = ?,
+                id_type = ?,
+                id_number = ?,
+                dob = ?,
+                nationality = ?,
+                phone_code = ?,
+                phone_number = ?,
+                email = ?,
+                address = ?,
+                vip_status = ?,
+                preferences = ?,
+                company_id = ?
+            WHERE id = ?
         ''', (
             guest['first_name'],
             guest['last_name'],
@@ -264,582 +423,914 @@ def insert_guest(guest):
             guest.get('address'),
             guest.get('vip_status'),
             guest.get('preferences'),
-            guest.get('company_id')
+            guest.get('company_id'),
+            guest_id
         ))
-        conn.commit()
-        return c.lastrowid
-    except sqlite3.IntegrityError as e:
-        if "UNIQUE constraint failed" in str(e):
-            raise ValueError("A guest with this ID number already exists")
-        raise
-    finally:
-        conn.close()
-
-def update_guest(guest_id, guest):
-    """Update an existing guest record"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE guests SET
-            first_name = ?,
-            last_name = ?,
-            id_type = ?,
-            id_number = ?,
-            dob = ?,
-            nationality = ?,
-            phone_code = ?,
-            phone_number = ?,
-            email = ?,
-            address = ?,
-            vip_status = ?,
-            preferences = ?,
-            company_id = ?
-        WHERE id = ?
-    ''', (
-        guest['first_name'],
-        guest['last_name'],
-        guest.get('id_type'),
-        guest.get('id_number'),
-        guest.get('dob'),
-        guest.get('nationality'),
-        guest.get('phone_code'),
-        guest.get('phone_number'),
-        guest.get('email'),
-        guest.get('address'),
-        guest.get('vip_status'),
-        guest.get('preferences'),
-        guest.get('company_id'),
-        guest_id
-    ))
-    conn.commit()
-    conn.close()
 
 def delete_guest(guest_id):
     """Delete a guest record"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM guests WHERE id = ?', (guest_id,))
-    conn.commit()
-    conn.close()
+    try:
+        with transaction() as c:
+            c.execute('DELETE FROM guests WHERE id = ?', (guest_id,))
+    except sqlite3.IntegrityError:
+        raise ValueError("This guest has stays or charges on record and cannot be deleted")
 
 def get_all_guests():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM guests')
-    columns = [desc[0] for desc in c.description]
-    guests = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return guests
+    with cursor() as c:
+        c.execute('SELECT * FROM guests')
+        return fetch_all(c)
+
+def iter_guests():
+    """Stream every guest, by id"""
+    yield from _iter_rows('SELECT * FROM guests ORDER BY id')
+
+def get_guests_page(after=None, limit=PAGE_SIZE):
+    """One page of guests in insertion order; after is the previous page's last row"""
+    return _keyset_page('SELECT * FROM guests', 'id', after, limit, descending=False)
 
 # Rooms CRUD
 
+INSERT_ROOM_SQL = '''INSERT INTO rooms (number, type, beds, floor, location, status) VALUES (?, ?, ?, ?, ?, ?)'''
+
+def _room_params(room):
+    return (room['number'], room.get('type'), room.get('beds'), room.get('floor'), room.get('location'), room.get('status'))
+
+@ref_cache.invalidates('rooms')
 def insert_room(room):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO rooms (number, type, beds, floor, location, status) VALUES (?, ?, ?, ?, ?, ?)''',
-        (room['number'], room.get('type'), room.get('beds'), room.get('floor'), room.get('location'), room.get('status')))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute(INSERT_ROOM_SQL, _room_params(room))
+        _refresh_rooms_available(c)
+        return c.lastrowid
+
+@ref_cache.invalidates('rooms')
+def insert_rooms_bulk(rooms):
+    """Insert many rooms in one transaction and return their ids"""
+    with transaction() as c:
+        ids = _insert_many(c, INSERT_ROOM_SQL, map(_room_params, rooms))
+        _refresh_rooms_available(c)
+        return ids
+
+def _load_rooms():
+    with cursor() as c:
+        c.execute('''SELECT * FROM rooms''')
+        return fetch_all(c)
+
+ref_cache.register('rooms', _load_rooms)
 
 def get_all_rooms():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''SELECT * FROM rooms''')
-    columns = [desc[0] for desc in c.description]
-    rooms = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return rooms
+    return ref_cache.get('rooms')
 
-def update_room(room_id, room):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''UPDATE rooms SET number=?, type=?, beds=?, floor=?, location=?, status=? WHERE id=?''',
-        (room['number'], room.get('type'), room.get('beds'), room.get('floor'), room.get('location'), room.get('status'), room_id))
-    conn.commit()
-    conn.close()
+def room_by_id(room_id):
+    """Get a single room by ID from the reference cache, or None"""
+    return ref_cache.lookup('rooms', 'id', room_id)
 
+def get_room(room_id):
+    """Get a single room by ID"""
+    return room_by_id(room_id)
+
+@ref_cache.invalidates('rooms')
+def update_room(room_id, room):
+    with transaction() as c:
+        c.execute('''UPDATE rooms SET number=?, type=?, beds=?, floor=?, location=?, status=? WHERE id=?''',
+            (room['number'], room.get('type'), room.get('beds'), room.get('floor'), room.get('location'), room.get('status'), room_id))
+        _refresh_rooms_available(c)
+
+@ref_cache.invalidates('rooms')
+def update_room_status(room_id, status):
+    """Set only the status of a room; returns False if the room does not exist"""
+    with transaction() as c:
+        c.execute('UPDATE rooms SET status = ? WHERE id = ?', (status, room_id))
+        return c.rowcount > 0
+
+@ref_cache.invalidates('rooms')
 def delete_room(room_id):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM rooms WHERE id=?', (room_id,))
-    conn.commit()
-    conn.close()
+    try:
+        with transaction() as c:
+            c.execute('DELETE FROM rooms WHERE id=?', (room_id,))
+            _refresh_rooms_available(c)
+    except sqlite3.IntegrityError:
+        raise ValueError("This room has check-ins or reservations on record and cannot be deleted")
 
 def insert_checkin(checkin):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO check_ins (
-            checkin_id, transaction_id, guest_id, room_id, checkin_date, 
-            arrival_date, departure_date, num_guests, total_paid, 
-            amount_due, payment_method, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        checkin['checkin_id'],
-        checkin['transaction_id'],
-        checkin['guest_id'],
-        checkin['room_id'],
-        checkin['checkin_date'],
-        checkin['arrival_date'],
-        checkin['departure_date'],
-        checkin['num_guests'],
-        checkin['total_paid'],
-        checkin['amount_due'],
-        checkin['payment_method'],
-        checkin['status']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO check_ins (
+                checkin_id, transaction_id, guest_id, room_id, checkin_date,
+                arrival_date, departure_date, num_guests, total_paid,
+                amount_due, payment_method, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            checkin['checkin_id'],
+            checkin['transaction_id'],
+            checkin['guest_id'],
+            checkin['room_id'],
+            to_iso_datetime(checkin['checkin_date']),
+            to_iso_date(checkin['arrival_date']),
+            to_iso_date(checkin['departure_date']),
+            checkin['num_guests'],
+            to_cents(checkin['total_paid']),
+            to_cents(checkin['amount_due']),
+            checkin['payment_method'],
+            checkin['status']
+        ))
+        _refresh_stay_stats(c, checkin['checkin_id'])
+        _sync_checkin_nights(c, checkin['checkin_id'])
+
+SELECT_CHECKINS_SQL = '''
+    SELECT c.*, g.first_name, g.last_name, r.number as room_number, r.type as room_type
+    FROM check_ins c
+    LEFT JOIN guests g ON c.guest_id = g.id
+    LEFT JOIN rooms r ON c.room_id = r.id
+'''
 
 def get_all_checkins():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT c.*, g.first_name, g.last_name, r.number as room_number, r.type as room_type
-        FROM check_ins c
-        LEFT JOIN guests g ON c.guest_id = g.id
-        LEFT JOIN rooms r ON c.room_id = r.id
-        ORDER BY c.checkin_date DESC
-    ''')
-    columns = [desc[0] for desc in c.description]
-    checkins = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return checkins
+    with cursor() as c:
+        c.execute(SELECT_CHECKINS_SQL + 'ORDER BY c.checkin_date DESC')
+        return fetch_all(c)
+
+def iter_checkins():
+    """Stream every check-in with its guest and room, newest first"""
+    yield from _iter_rows(SELECT_CHECKINS_SQL + 'ORDER BY c.checkin_date DESC')
+
+def get_checkins_page(after=None, limit=PAGE_SIZE, search=None, arrival_from=None, departure_to=None,
+                      room_type=None):
+    """One page of check-ins, newest first; after is the previous page's last row.
+
+    The list can be narrowed to the check-ins whose guest matches search
+    (name, ID number, phone or email words) or whose number starts with it,
+    arriving on or after arrival_from, leaving on or before departure_to,
+    in a room of room_type.
+    """
+    filters, params = [], []
+    match = _fts_query(search)
+    if match:
+        filters.append(f"(c.guest_id IN ({_SEARCH_IDS_SQL}) OR c.checkin_id LIKE ? ESCAPE '\\')")
+        params += [match, SEARCH_KINDS['guest'], re.sub(r'([%_\\])', r'\\\1', search.strip()) + '%']
+    if arrival_from:
+        filters.append('c.arrival_date >= ?')
+        params.append(to_iso_date(arrival_from))
+    if departure_to:
+        filters.append('c.departure_date <= ?')
+        params.append(to_iso_date(departure_to))
+    if room_type:
+        filters.append('r.type = ?')
+        params.append(room_type)
+    return _keyset_page(SELECT_CHECKINS_SQL, 'c.id', after, limit,
+                        sort_column='c.checkin_date', sort_key='checkin_date',
+                        filters=filters, filter_params=params)
 
 def get_guest_id_by_name(first_name, last_name):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT id FROM guests WHERE first_name = ? AND last_name = ?', (first_name, last_name))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
+    with cursor() as c:
+        c.execute('SELECT id FROM guests WHERE first_name = ? AND last_name = ?', (first_name, last_name))
+        result = c.fetchone()
+        return result[0] if result else None
 
 def get_available_rooms_count():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT COUNT(*) FROM rooms WHERE status = "Vacant"')
-    count = c.fetchone()[0]
-    conn.close()
-    return count
+    with cursor() as c:
+        c.execute('SELECT COUNT(*) FROM rooms WHERE status = "Vacant"')
+        return c.fetchone()[0]
+
+# Dashboard
+DASHBOARD_COUNTS_SQL = '''
+    SELECT 'status' AS kind, status AS key, COUNT(*) AS n FROM rooms GROUP BY status
+    UNION ALL
+    SELECT 'arrivals', NULL, COUNT(*) FROM check_ins WHERE arrival_date = :today
+    UNION ALL
+    SELECT 'departures', NULL, COUNT(*) FROM check_ins WHERE departure_date = :today
+'''
+
+DASHBOARD_ROOMS_SQL = '''
+    SELECT r.id, r.number, r.type, r.status,
+        (SELECT g.first_name || ' ' || g.last_name
+         FROM check_ins c JOIN guests g ON g.id = c.guest_id
+         WHERE c.room_id = r.id AND IFNULL(c.status, '') != 'checked_out'
+         ORDER BY c.id DESC LIMIT 1) AS guest_name
+    FROM rooms r
+    ORDER BY r.id
+'''
+
+DASHBOARD_RESERVATIONS_SQL = '''
+    SELECT r.id, r.guest_first_name, r.guest_last_name, r.arrival_date, r.status,
+        rm.number AS room_number
+    FROM reservations r
+    LEFT JOIN rooms rm ON r.room_id = rm.id
+    WHERE r.arrival_date >= :today AND IFNULL(r.status, '') != 'Cancelled'
+    ORDER BY r.arrival_date, r.id
+    LIMIT :limit
+'''
+
+DASHBOARD_OCCUPANCY_SQL = '''
+    SELECT stat_date, SUM(rooms_sold), SUM(rooms_available)
+    FROM daily_stats
+    WHERE stat_date BETWEEN :history_start AND :today
+    GROUP BY stat_date
+'''
+
+def get_dashboard_snapshot(today=None, reservation_limit=5, history_days=7):
+    """Everything the dashboard shows, read from one consistent snapshot.
+
+    Counting happens in SQL: the room-status histogram and today's
+    arrivals/departures come back as a handful of aggregate rows, and the
+    room grid carries the current guest of each room. Rooms whose status is
+    anything but 'Vacant' count as occupied. occupancy_history is the
+    occupancy rate of the last history_days days, read from daily_stats.
+    """
+    today = to_iso_date(today or date.today())
+    days = [(_as_datetime(today) - timedelta(days=n)).strftime(DATE_FORMAT) for n in reversed(range(history_days))]
+    params = {'today': today, 'limit': reservation_limit, 'history_start': days[0]}
+    status_counts = {}
+    totals = {'arrivals': 0, 'departures': 0}
+    with snapshot() as c:
+        c.execute(DASHBOARD_COUNTS_SQL, params)
+        for kind, key, n in c.fetchall():
+            if kind == 'status':
+                status_counts[key] = n
+            else:
+                totals[kind] = n
+        c.execute(DASHBOARD_ROOMS_SQL)
+        rooms = fetch_all(c)
+        c.execute(DASHBOARD_RESERVATIONS_SQL, params)
+        reservations = fetch_all(c)
+        c.execute(DASHBOARD_OCCUPANCY_SQL, params)
+        history = {stat_date: (sold, available) for stat_date, sold, available in c.fetchall()}
+
+    total_rooms = sum(status_counts.values())
+    vacant = status_counts.get('Vacant', 0)
+    occupied = total_rooms - vacant
+    occupancy_history = []
+    for day in days:
+        # A day nothing happened on has no rows: no room sold
+        sold, available = history.get(day, (0, total_rooms))
+        occupancy_history.append((day, int(sold * 100 / available) if available else 0))
+    return {
+        'date': today,
+        'total_rooms': total_rooms,
+        'occupied_rooms': occupied,
+        'vacant_rooms': vacant,
+        'occupancy_rate': int(occupied * 100 / total_rooms) if total_rooms else 0,
+        'arrivals': totals['arrivals'],
+        'departures': totals['departures'],
+        'status_counts': status_counts,
+        'rooms': rooms,
+        'upcoming_reservations': reservations,
+        'occupancy_history': occupancy_history,
+    }
 
 def update_checkin(checkin_id, checkin):
     """Update an existing check-in record"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE check_ins SET
-            total_paid = ?,
-            amount_due = ?,
-            payment_method = ?,
-            status = ?,
-            actual_departure = ?
-        WHERE checkin_id = ?
-    ''', (
-        checkin['total_paid'],
-        checkin['amount_due'],
-        checkin['payment_method'],
-        checkin['status'],
-        checkin.get('actual_departure'),
-        checkin_id
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('SELECT IFNULL(actual_departure, departure_date) FROM check_ins WHERE checkin_id = ?',
+                  (checkin_id,))
+        departed = c.fetchone()
+        c.execute('''
+            UPDATE check_ins SET
+                total_paid = ?,
+                amount_due = ?,
+                payment_method = ?,
+                status = ?,
+                actual_departure = ?
+            WHERE checkin_id = ?
+        ''', (
+            to_cents(checkin['total_paid']),
+            to_cents(checkin['amount_due']),
+            checkin['payment_method'],
+            checkin['status'],
+            to_iso_date(checkin.get('actual_departure')),
+            checkin_id
+        ))
+        _refresh_stay_stats(c, checkin_id, departed and departed[0])
+        _sync_checkin_nights(c, checkin_id)
 
 # Hotel Settings CRUD
+def _load_hotel_settings():
+    with cursor() as c:
+        c.execute('SELECT id, hotel_name, hotel_address, phone, email, website FROM hotel_settings LIMIT 1')
+        return fetch_all(c)
+
+ref_cache.register('hotel_settings', _load_hotel_settings)
+
 def get_hotel_settings():
     """Get hotel settings from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM hotel_settings LIMIT 1')
-    settings = c.fetchone()
-    conn.close()
-    if settings:
-        return dict(zip(['id', 'hotel_name', 'hotel_address', 'phone', 'email', 'website'], settings))
-    return None
+    rows = ref_cache.get('hotel_settings')
+    return rows[0] if rows else None
 
+@ref_cache.invalidates('hotel_settings')
 def update_hotel_settings(settings):
     """Update hotel settings in database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT OR REPLACE INTO hotel_settings (
-            id, hotel_name, hotel_address, phone, email, website
-        ) VALUES (
-            (SELECT id FROM hotel_settings LIMIT 1),
-            ?, ?, ?, ?, ?
-        )
-    ''', (
-        settings['hotel_name'],
-        settings['hotel_address'],
-        settings['phone'],
-        settings['email'],
-        settings['website']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT OR REPLACE INTO hotel_settings (
+                id, hotel_name, hotel_address, phone, email, website
+            ) VALUES (
+                (SELECT id FROM hotel_settings LIMIT 1),
+                ?, ?, ?, ?, ?
+            )
+        ''', (
+            settings['hotel_name'],
+            settings['hotel_address'],
+            settings['phone'],
+            settings['email'],
+            settings['website']
+        ))
 
 # Room Rates CRUD
+def _load_room_rates():
+    with cursor() as c:
+        c.execute('SELECT * FROM room_rates')
+        return fetch_all(c)
+
+ref_cache.register('room_rates', _load_room_rates)
+
 def get_room_rates():
     """Get all room rates from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM room_rates')
-    columns = [desc[0] for desc in c.description]
-    rates = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return rates
+    return ref_cache.get('room_rates')
+
+def rate_for_room_type(room_type):
+    """Night rate of a room type, or None when it has no rate"""
+    rate = ref_cache.lookup('room_rates', 'room_type', room_type)
+    return rate['night_rate'] if rate is not None else None
 
+@ref_cache.invalidates('room_rates')
 def update_room_rate(room_type, night_rate):
     """Update room rate in database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT OR REPLACE INTO room_rates (room_type, night_rate)
-        VALUES (?, ?)
-    ''', (room_type, night_rate))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT OR REPLACE INTO room_rates (room_type, night_rate)
+            VALUES (?, ?)
+        ''', (room_type, to_cents(night_rate)))
 
 # Services CRUD
+def _load_services():
+    with cursor() as c:
+        c.execute('SELECT * FROM services')
+        return fetch_all(c)
+
+ref_cache.register('services', _load_services)
+
 def get_services():
     """Get all services from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM services')
-    columns = [desc[0] for desc in c.description]
-    services = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return services
+    return ref_cache.get('services')
 
+def service_by_id(service_id):
+    """Get a single service by ID from the reference cache, or None"""
+    return ref_cache.lookup('services', 'id', service_id)
+
+@ref_cache.invalidates('services')
 def add_service(service):
     """Add a new service to database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO services (name, default_price, unit)
-        VALUES (?, ?, ?)
-    ''', (
-        service['name'],
-        service['default_price'],
-        service['unit']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO services (name, default_price, unit)
+            VALUES (?, ?, ?)
+        ''', (
+            service['name'],
+            to_cents(service['default_price']),
+            service['unit']
+        ))
 
+@ref_cache.invalidates('services')
 def update_service(service_id, service):
     """Update service in database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE services SET name=?, default_price=?, unit=?
-        WHERE id=?
-    ''', (
-        service['name'],
-        service['default_price'],
-        service['unit'],
-        service_id
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            UPDATE services SET name=?, default_price=?, unit=?
+            WHERE id=?
+        ''', (
+            service['name'],
+            to_cents(service['default_price']),
+            service['unit'],
+            service_id
+        ))
 
+@ref_cache.invalidates('services')
 def delete_service(service_id):
     """Delete service from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM services WHERE id=?', (service_id,))
-    conn.commit()
-    conn.close()
+    try:
+        with transaction() as c:
+            c.execute('DELETE FROM services WHERE id=?', (service_id,))
+    except sqlite3.IntegrityError:
+        raise ValueError("This service has charges on record and cannot be deleted")
 
 # Tax Rates CRUD
+def _load_tax_rates():
+    with cursor() as c:
+        c.execute('SELECT * FROM tax_rates')
+        return fetch_all(c)
+
+ref_cache.register('tax_rates', _load_tax_rates)
+
 def get_tax_rates():
     """Get all tax rates from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM tax_rates')
-    columns = [desc[0] for desc in c.description]
-    rates = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return rates
+    return ref_cache.get('tax_rates')
 
+@ref_cache.invalidates('tax_rates')
 def add_tax_rate(tax_rate):
     """Add a new tax rate to database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO tax_rates (name, tax_type, percentage, amount, apply_to_rooms, apply_to_services)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (
-        tax_rate['name'],
-        tax_rate['tax_type'],
-        tax_rate['percentage'],
-        tax_rate['amount'],
-        tax_rate['apply_to_rooms'],
-        tax_rate['apply_to_services']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO tax_rates (name, tax_type, percentage, amount, apply_to_rooms, apply_to_services)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            tax_rate['name'],
+            tax_rate['tax_type'],
+            tax_rate['percentage'],
+            to_cents(tax_rate['amount']),
+            tax_rate['apply_to_rooms'],
+            tax_rate['apply_to_services']
+        ))
 
+@ref_cache.invalidates('tax_rates')
 def update_tax_rate(tax_rate_id, tax_rate):
     """Update tax rate in database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE tax_rates SET name=?, tax_type=?, percentage=?, amount=?, apply_to_rooms=?, apply_to_services=?
-        WHERE id=?
-    ''', (
-        tax_rate['name'],
-        tax_rate['tax_type'],
-        tax_rate['percentage'],
-        tax_rate['amount'],
-        tax_rate['apply_to_rooms'],
-        tax_rate['apply_to_services'],
-        tax_rate_id
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            UPDATE tax_rates SET name=?, tax_type=?, percentage=?, amount=?, apply_to_rooms=?, apply_to_services=?
+            WHERE id=?
+        ''', (
+            tax_rate['name'],
+            tax_rate['tax_type'],
+            tax_rate['percentage'],
+            to_cents(tax_rate['amount']),
+            tax_rate['apply_to_rooms'],
+            tax_rate['apply_to_services'],
+            tax_rate_id
+        ))
 
+@ref_cache.invalidates('tax_rates')
 def delete_tax_rate(tax_rate_id):
     """Delete tax rate from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM tax_rates WHERE id=?', (tax_rate_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('DELETE FROM tax_rates WHERE id=?', (tax_rate_id,))
 
 # Booking Services CRUD
-def add_booking_service(booking_service):
-    """Add a new service charge to a booking or guest"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO booking_services (
-            booking_id, guest_id, service_id, quantity, unit_price_at_time_of_charge,
-            total_charge, charge_date, charged_by_user_id, notes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+INSERT_BOOKING_SERVICE_SQL = '''
+    INSERT INTO booking_services (
+        booking_id, guest_id, service_id, quantity, unit_price_at_time_of_charge,
+        total_charge, charge_date, charged_by_user_id, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _booking_service_params(booking_service):
+    return (
         booking_service.get('booking_id'),
         booking_service.get('guest_id'),
         booking_service['service_id'],
         booking_service['quantity'],
-        booking_service['unit_price_at_time_of_charge'],
-        booking_service['total_charge'],
+        to_cents(booking_service['unit_price_at_time_of_charge']),
+        to_cents(booking_service['total_charge']),
         booking_service.get('charge_date'),
         booking_service.get('charged_by_user_id'),
         booking_service.get('notes')
-    ))
-    conn.commit()
-    conn.close()
-
-def get_booking_services(booking_id):
-    """Get all service charges for a booking"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
+    )
+
+def add_booking_service(booking_service):
+    """Add a new service charge to a booking or guest"""
+    with transaction() as c:
+        c.execute(INSERT_BOOKING_SERVICE_SQL, _booking_service_params(booking_service))
+        service_id = c.lastrowid
+        _refresh_charge_stats(c, service_id, service_id)
+        return service_id
+
+def add_booking_services_bulk(booking_services):
+    """Add many service charges in one transaction and return their ids"""
+    with transaction() as c:
+        ids = _insert_many(c, INSERT_BOOKING_SERVICE_SQL, map(_booking_service_params, booking_services))
+        if ids:
+            _refresh_charge_stats(c, ids[0], ids[-1])
+        return ids
+
+def _refresh_charge_stats(c, first_id, last_id):
+    """Refresh the dates charged by the booking_services rows first_id..last_id"""
+    c.execute('SELECT MIN(date(charge_date)), MAX(date(charge_date)) FROM booking_services WHERE id BETWEEN ? AND ?',
+              (first_id, last_id))
+    _refresh_daily_stats(c, *c.fetchone())
+
+def get_booking_services(booking_id, include_archive=False):
+    """Get all service charges for a booking (archived ones too if include_archive)"""
+    table = history_view('booking_services') if include_archive else 'booking_services'
+    with cursor() as c:
+        c.execute(f'''
+            SELECT bs.*, s.name as service_name, s.unit
+            FROM {table} bs
+            JOIN services s ON bs.service_id = s.id
+            WHERE bs.booking_id = ?
+            ORDER BY bs.charge_date DESC
+        ''', (booking_id,))
+        return fetch_all(c)
+
+def iter_booking_services(include_archive=False):
+    """Stream every service charge with its service name, by booking"""
+    table = history_view('booking_services') if include_archive else 'booking_services'
+    yield from _iter_rows(f'''
         SELECT bs.*, s.name as service_name, s.unit
-        FROM booking_services bs
+        FROM {table} bs
         JOIN services s ON bs.service_id = s.id
-        WHERE bs.booking_id = ?
-        ORDER BY bs.charge_date DESC
-    ''', (booking_id,))
-    columns = [desc[0] for desc in c.description]
-    services = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return services
+        ORDER BY bs.booking_id, bs.charge_date DESC
+    ''')
 
 def delete_booking_service(service_id):
     """Delete a service charge"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM booking_services WHERE id = ?', (service_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('SELECT date(charge_date) FROM booking_services WHERE id = ?', (service_id,))
+        charged = c.fetchone()
+        c.execute('DELETE FROM booking_services WHERE id = ?', (service_id,))
+        if charged:
+            _refresh_daily_stats(c, charged[0], charged[0])
+
+def get_unpaid_booking_charges(booking_id):
+    """Get the total of the unpaid service charges of a booking"""
+    with cursor() as c:
+        c.execute('''
+            SELECT COALESCE(SUM(total_charge), 0) AS "total [MONEY]"
+            FROM booking_services
+            WHERE booking_id = ? AND is_paid = 0
+        ''', (booking_id,))
+        return c.fetchone()[0]
+
+def settle_booking_services(booking_id, amount_paid, payment_date=None):
+    """Mark the unpaid services of a booking as paid or partly paid by
+    amount_paid, as mark_guest_services_paid does for a guest"""
+    amount_paid = Money.of(amount_paid)
+    if amount_paid <= Money(0):
+        return 0
+    if payment_date is None:
+        payment_date = datetime.now().strftime(DATETIME_FORMAT)
+    with transaction() as c:
+        remaining = get_unpaid_booking_charges(booking_id) - amount_paid
+        c.execute('''
+            UPDATE booking_services
+            SET is_paid = ?, amount_paid = ?, remaining_amount = ?, payment_date = ?
+            WHERE booking_id = ? AND is_paid = 0
+        ''', (int(remaining <= Money(1)), amount_paid, max(remaining, Money(0)), payment_date, booking_id))
+        return c.rowcount
 
 def get_total_booking_charges(booking_id):
     """Get the total amount of all service charges for a booking"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT COALESCE(SUM(total_charge), 0) as total
-        FROM booking_services
-        WHERE booking_id = ?
-    ''', (booking_id,))
-    total = c.fetchone()[0]
-    conn.close()
-    return total
+    with cursor() as c:
+        c.execute('''
+            SELECT COALESCE(SUM(total_charge), 0) AS "total [MONEY]"
+            FROM booking_services
+            WHERE booking_id = ?
+        ''', (booking_id,))
+        return c.fetchone()[0]
 
 def add_reservation(reservation):
     """Add a new reservation to the database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO reservations (
-            reservation_id, guest_first_name, guest_last_name, guest_email, guest_phone,
-            arrival_date, num_guests, room_id,
-            special_requests, payment_method, deposit_amount, amount_due, status, created_on
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        reservation['reservation_id'],
-        reservation['guest_first_name'],
-        reservation['guest_last_name'],
-        reservation.get('guest_email'),
-        reservation.get('guest_phone'),
-        reservation['arrival_date'],
-        int(reservation['num_guests']),
-        reservation.get('room_id'),
-        reservation.get('special_requests'),
-        reservation.get('payment_method'),
-        float(reservation.get('deposit_amount', 0)),
-        float(reservation.get('amount_due', 0)),
-        reservation['status'],
-        reservation['created_on']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO reservations (
+                reservation_id, guest_first_name, guest_last_name, guest_email, guest_phone,
+                arrival_date, departure_date, num_guests, room_id, room_type,
+                special_requests, payment_method, deposit_amount, amount_due, status, created_on
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            reservation['reservation_id'],
+            reservation['guest_first_name'],
+            reservation['guest_last_name'],
+            reservation.get('guest_email'),
+            reservation.get('guest_phone'),
+            to_iso_date(reservation['arrival_date']),
+            to_iso_date(reservation.get('departure_date')),
+            int(reservation['num_guests']),
+            reservation.get('room_id'),
+            reservation.get('room_type'),
+            reservation.get('special_requests'),
+            reservation.get('payment_method'),
+            to_cents(reservation.get('deposit_amount', 0)),
+            to_cents(reservation.get('amount_due', 0)),
+            reservation['status'],
+            to_iso_datetime(reservation['created_on'])
+        ))
+        _sync_reservation_nights(c, reservation['reservation_id'])
+
+# room_type repeats r.room_type, falling back to the room's type for rows
+# written without one; the later column is the one rows expose
+SELECT_RESERVATIONS_SQL = '''
+    SELECT r.*, rm.number as room_number, COALESCE(r.room_type, rm.type) AS room_type
+    FROM reservations r
+    LEFT JOIN rooms rm ON r.room_id = rm.id
+'''
 
 def get_reservations():
     """Get all reservations from the database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT r.*, rm.number as room_number 
-        FROM reservations r
-        LEFT JOIN rooms rm ON r.room_id = rm.id
-        ORDER BY r.created_on DESC
-    ''')
-    columns = [desc[0] for desc in c.description]
-    reservations = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return reservations
+    with cursor() as c:
+        c.execute(SELECT_RESERVATIONS_SQL + 'ORDER BY r.created_on DESC')
+        return fetch_all(c)
+
+def iter_reservations():
+    """Stream every reservation with its room number, newest first"""
+    yield from _iter_rows(SELECT_RESERVATIONS_SQL + 'ORDER BY r.created_on DESC')
+
+def get_reservations_page(after=None, limit=PAGE_SIZE, search=None, arrival_from=None, status=None):
+    """One page of reservations, newest first; after is the previous page's last row.
+
+    The list can be narrowed to the reservations matching search
+    (reservation number or guest name words), arriving on or after
+    arrival_from, with the given status.
+    """
+    filters, params = [], []
+    match = _fts_query(search)
+    if match:
+        filters.append(f'r.id IN ({_SEARCH_IDS_SQL})')
+        params += [match, SEARCH_KINDS['reservation']]
+    if arrival_from:
+        filters.append('r.arrival_date >= ?')
+        params.append(to_iso_date(arrival_from))
+    if status:
+        filters.append('r.status = ?')
+        params.append(status)
+    return _keyset_page(SELECT_RESERVATIONS_SQL, 'r.id', after, limit,
+                        sort_column='r.created_on', sort_key='created_on',
+                        filters=filters, filter_params=params)
 
 def update_reservation(reservation):
     """Update an existing reservation"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE reservations SET
-            guest_first_name = ?,
-            guest_last_name = ?,
-            guest_email = ?,
-            guest_phone = ?,
-            arrival_date = ?,
-            num_guests = ?,
-            room_id = ?,
-            room_type = ?,
-            special_requests = ?,
-            payment_method = ?,
-            deposit_amount = ?,
-            amount_due = ?,
-            status = ?
-        WHERE reservation_id = ?
-    ''', (
-        reservation['guest_first_name'],
-        reservation['guest_last_name'],
-        reservation.get('guest_email'),
-        reservation.get('guest_phone'),
-        reservation['arrival_date'],
-        int(reservation['num_guests']),
-        reservation.get('room_id'),
-        reservation['room_type'],
-        reservation.get('special_requests'),
-        reservation.get('payment_method'),
-        float(reservation.get('deposit_amount', 0)),
-        float(reservation.get('amount_due', 0)),
-        reservation['status'],
-        reservation['reservation_id']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            UPDATE reservations SET
+                guest_first_name = ?,
+                guest_last_name = ?,
+                guest_email = ?,
+                guest_phone = ?,
+                arrival_date = ?,
+                departure_date = ?,
+                num_guests = ?,
+                room_id = ?,
+                room_type = ?,
+                special_requests = ?,
+                payment_method = ?,
+                deposit_amount = ?,
+                amount_due = ?,
+                status = ?
+            WHERE reservation_id = ?
+        ''', (
+            reservation['guest_first_name'],
+            reservation['guest_last_name'],
+            reservation.get('guest_email'),
+            reservation.get('guest_phone'),
+            to_iso_date(reservation['arrival_date']),
+            to_iso_date(reservation.get('departure_date')),
+            int(reservation['num_guests']),
+            reservation.get('room_id'),
+            reservation['room_type'],
+            reservation.get('special_requests'),
+            reservation.get('payment_method'),
+            to_cents(reservation.get('deposit_amount', 0)),
+            to_cents(reservation.get('amount_due', 0)),
+            reservation['status'],
+            reservation['reservation_id']
+        ))
+        _sync_reservation_nights(c, reservation['reservation_id'])
 
 def delete_reservation(reservation_id):
-    """Delete a reservation"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('DELETE FROM reservations WHERE reservation_id = ?', (reservation_id,))
-    conn.commit()
-    conn.close()
-
+    """Delete a reservation along with its cancellation record, if any"""
+    with transaction() as c:
+        c.execute('''SELECT MIN(cancellation_date), MAX(cancellation_date)
+                     FROM reservation_cancellations WHERE reservation_id = ?''', (reservation_id,))
+        first, last = c.fetchone()
+        c.execute('DELETE FROM reservation_cancellations WHERE reservation_id = ?', (reservation_id,))
+        c.execute('DELETE FROM reservations WHERE reservation_id = ?', (reservation_id,))
+        # The cancellation no longer counts in the daily figures
+        _refresh_daily_stats(c, first, last)
+
+@ref_cache.invalidates('rooms')
 def cancel_reservation(reservation_id, cancellation_data):
     """Cancel a reservation and record the cancellation details"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    try:
-        # Start transaction
-        c.execute('BEGIN TRANSACTION')
-        
+    with transaction() as c:
         # Update reservation status
         c.execute('''
-            UPDATE reservations 
-            SET status = 'Cancelled' 
-            WHERE reservation_id = ?
+            UPDATE reservations
+            SET status = 'Cancelled'
+            WHERE reservation_id = ? AND IFNULL(status, '') != 'Cancelled'
         ''', (reservation_id,))
-        
+        if c.rowcount == 0:
+            raise ValueError(f"Reservation {reservation_id} does not exist or is already cancelled")
+
         # Insert cancellation record
+        cancelled_on = datetime.now()
         c.execute('''
             INSERT INTO reservation_cancellations (
-                reservation_id, cancellation_date, reason, 
+                reservation_id, cancellation_date, reason,
                 refund_amount, notes, cancelled_by
             ) VALUES (?, ?, ?, ?, ?, ?)
         ''', (
             reservation_id,
-            datetime.now().strftime('%Y-%m-%d %H:%M'),
+            cancelled_on.strftime(DATETIME_FORMAT),
             cancellation_data['reason'],
-            float(cancellation_data.get('refund_amount', 0)),
+            to_cents(cancellation_data.get('refund_amount', 0)),
             cancellation_data.get('notes', ''),
             cancellation_data.get('cancelled_by', 'System')
         ))
-        
+        _refresh_daily_stats(c, cancelled_on, cancelled_on)
+        _sync_reservation_nights(c, reservation_id)
+
         # Get the room_id from the reservation
         c.execute('SELECT room_id FROM reservations WHERE reservation_id = ?', (reservation_id,))
         room_id = c.fetchone()[0]
-        
+
         # Update room status to Vacant
         if room_id:
             c.execute('''
-                UPDATE rooms 
-                SET status = 'Vacant' 
+                UPDATE rooms
+                SET status = 'Vacant'
                 WHERE id = ?
             ''', (room_id,))
-        
-        # Commit transaction
-        conn.commit()
-        return True
-        
-    except Exception as e:
-        # Rollback on error
-        conn.rollback()
-        print(f"Error cancelling reservation: {e}")
-        return False
-        
-    finally:
-        conn.close()
+
+def check_in_reservation(reservation_id):
+    """Mark a Confirmed or Pending reservation Checked-in, giving back the
+    nights it holds so its guest's check-in can take them"""
+    with transaction() as c:
+        c.execute(f'''
+            UPDATE reservations SET status = 'Checked-in'
+            WHERE reservation_id = ? AND status IN ({', '.join('?' * len(ARRIVING_RESERVATION_STATUSES))})
+        ''', (reservation_id, *ARRIVING_RESERVATION_STATUSES))
+        if c.rowcount == 0:
+            raise ValueError(f"Reservation {reservation_id} is not awaiting check-in")
+        _sync_reservation_nights(c, reservation_id)
 
 def get_cancellation_details(reservation_id):
     """Get cancellation details for a reservation"""
-    conn = get_connection()
-    c = conn.cursor()
+    with cursor() as c:
+        c.execute('''
+            SELECT * FROM reservation_cancellations
+            WHERE reservation_id = ?
+        ''', (reservation_id,))
+        return fetch_one(c)
+
+# Room nights
+# room_nights holds one row per room and night taken by a reservation or an
+# open check-in (see migration 11). Its (room_id, night) primary key stops
+# two bookings of the same room and night, and answers availability with an
+# index range probe. A stay takes the nights from its arrival up to the day
+# before it leaves (at least one); a reservation gives them back once it is
+# cancelled or checked in, a check-in once it is checked out.
+
+RELEASED_RESERVATION_STATUSES = ('Cancelled', 'Checked-in')
+# Reservations whose guest is still to arrive
+ARRIVING_RESERVATION_STATUSES = ('Confirmed', 'Pending')
+
+class RoomUnavailableError(ValueError):
+    """The room is already taken on some of the nights asked for"""
+
+def _stay_end(arrival, departure):
+    """Departure as an ISO date, at least the day after arrival"""
+    arrival = to_iso_date(arrival)
+    departure = to_iso_date(departure)
+    next_day = (_as_datetime(arrival) + timedelta(days=1)).strftime(DATE_FORMAT)
+    return departure if departure and departure > arrival else next_day
+
+ROOM_OVERLAPS_SQL = '''
+    SELECT CASE WHEN n.reservation_id IS NOT NULL THEN 'reservation' ELSE 'check_in' END AS kind,
+           IFNULL(r.reservation_id, c.checkin_id) AS code,
+           MIN(n.night) AS first_night, MAX(n.night) AS last_night
+    FROM room_nights n
+    LEFT JOIN reservations r ON r.id = n.reservation_id
+    LEFT JOIN check_ins c ON c.id = n.checkin_id
+    WHERE n.room_id = :room_id AND n.night >= :arrival AND n.night < :departure
+    GROUP BY n.reservation_id, n.checkin_id
+    ORDER BY first_night
+'''
+
+def _overlaps(c, room_id, arrival, departure):
+    c.execute(ROOM_OVERLAPS_SQL, {'room_id': room_id, 'arrival': to_iso_date(arrival),
+                                  'departure': _stay_end(arrival, departure)})
+    return fetch_all(c)
+
+def _hold_nights(c, room_id, arrival, departure, reservation_id=None, checkin_id=None):
+    """Take the room's nights for one reservation or check-in (row ids), or raise RoomUnavailableError"""
+    overlaps = _overlaps(c, room_id, arrival, departure)
+    if overlaps:
+        room = room_by_id(room_id)
+        taken = '; '.join((f"on {o['first_night']}" if o['first_night'] == o['last_night']
+                           else f"from {o['first_night']} to {o['last_night']}")
+                          + f" by {o['kind'].replace('_', '-')} {o['code']}" for o in overlaps)
+        raise RoomUnavailableError(f"Room {room['number'] if room else room_id} is already taken: {taken}")
     c.execute('''
-        SELECT * FROM reservation_cancellations 
-        WHERE reservation_id = ?
-    ''', (reservation_id,))
-    columns = [desc[0] for desc in c.description]
-    cancellation = dict(zip(columns, c.fetchone())) if c.fetchone() else None
-    conn.close()
-    return cancellation 
+        WITH RECURSIVE nights(night) AS (
+            SELECT :arrival
+            UNION ALL
+            SELECT date(night, '+1 day') FROM nights WHERE date(night, '+1 day') < :departure
+        )
+        INSERT INTO room_nights (room_id, night, reservation_id, checkin_id)
+        SELECT :room_id, night, :reservation_id, :checkin_id FROM nights
+    ''', {'room_id': room_id, 'arrival': to_iso_date(arrival), 'departure': _stay_end(arrival, departure),
+          'reservation_id': reservation_id, 'checkin_id': checkin_id})
+
+def _sync_reservation_nights(c, reservation_id):
+    """Make the nights held by a reservation (by reservation code) match its row"""
+    c.execute('''SELECT id, room_id, arrival_date, departure_date, status
+                 FROM reservations WHERE reservation_id = ?''', (reservation_id,))
+    row = c.fetchone()
+    if row is None:
+        return
+    row_id, room_id, arrival, departure, status = row
+    c.execute('DELETE FROM room_nights WHERE reservation_id = ?', (row_id,))
+    if room_id is not None and status not in RELEASED_RESERVATION_STATUSES:
+        _hold_nights(c, room_id, arrival, departure, reservation_id=row_id)
+
+def _sync_checkin_nights(c, checkin_id):
+    """Make the nights held by a check-in (by check-in code) match its row"""
+    c.execute('''SELECT id, room_id, arrival_date, IFNULL(actual_departure, departure_date), status
+                 FROM check_ins WHERE checkin_id = ?''', (checkin_id,))
+    row = c.fetchone()
+    if row is None:
+        return
+    row_id, room_id, arrival, departure, status = row
+    c.execute('DELETE FROM room_nights WHERE checkin_id = ?', (row_id,))
+    if room_id is not None and status != 'checked_out':
+        _hold_nights(c, room_id, arrival, departure, checkin_id=row_id)
+
+def is_available(room_id, from_date, to_date=None):
+    """Whether the room is free every night from from_date up to the day before to_date"""
+    with cursor() as c:
+        c.execute('''
+            SELECT NOT EXISTS (SELECT 1 FROM room_nights WHERE room_id = ? AND night >= ? AND night < ?)
+        ''', (room_id, to_iso_date(from_date), _stay_end(from_date, to_date)))
+        return bool(c.fetchone()[0])
 
-def get_filtered_checkins(from_date, to_date, room_type=None, status=None):
-    conn = get_connection()
-    c = conn.cursor()
+def free_rooms(from_date, to_date=None, room_type=None, reservation_id=None):
+    """Rooms free every night from from_date up to the day before to_date, optionally of one type.
 
-    query = '''
+    The nights held by reservation_id (a reservation code) count as free,
+    for checking that reservation's guest in.
+    """
+    params = [to_iso_date(from_date), _stay_end(from_date, to_date)]
+    held_by = ''
+    if reservation_id is not None:
+        held_by = 'AND n.reservation_id IS NOT (SELECT id FROM reservations WHERE reservation_id = ?)'
+        params.append(reservation_id)
+    query = f'''
+        SELECT r.* FROM rooms r
+        WHERE NOT EXISTS (SELECT 1 FROM room_nights n
+                          WHERE n.room_id = r.id AND n.night >= ? AND n.night < ? {held_by})
+    '''
+    if room_type and room_type != "All":
+        query += " AND LOWER(r.type) = ?"
+        params.append(room_type.lower())
+    with cursor() as c:
+        c.execute(query + ' ORDER BY r.id', params)
+        return fetch_all(c)
+
+def find_overlaps(room_id, from_date, to_date=None):
+    """Reservations and check-ins holding the room between from_date and the day before to_date.
+
+    One row per booking: kind ('reservation' or 'check_in'), code (its
+    reservation_id or checkin_id), first_night and last_night.
+    """
+    with cursor() as c:
+        return _overlaps(c, room_id, from_date, to_date)
+
+def get_room_nights(from_date, to_date):
+    """Every held room night in [from_date, to_date) with the booking and guest holding it"""
+    with cursor() as c:
+        c.execute('''
+            SELECT n.room_id, n.night,
+                   CASE WHEN n.reservation_id IS NOT NULL THEN 'reservation' ELSE 'check_in' END AS kind,
+                   IFNULL(r.reservation_id, c.checkin_id) AS code,
+                   IFNULL(r.guest_first_name, g.first_name) AS guest_first_name,
+                   IFNULL(r.guest_last_name, g.last_name) AS guest_last_name,
+                   IFNULL(r.status, 'Occupied') AS status
+            FROM room_nights n
+            LEFT JOIN reservations r ON r.id = n.reservation_id
+            LEFT JOIN check_ins c ON c.id = n.checkin_id
+            LEFT JOIN guests g ON g.id = c.guest_id
+            WHERE n.night >= ? AND n.night < ?
+        ''', (to_iso_date(from_date), to_iso_date(to_date)))
+        return fetch_all(c)
+
+def get_reservation(reservation_id):
+    """Get one reservation by its reservation_id"""
+    with cursor() as c:
+        c.execute(SELECT_RESERVATIONS_SQL + 'WHERE r.reservation_id = ?', (reservation_id,))
+        return fetch_one(c)
+
+def find_arriving_reservation(first_name, last_name, on_date):
+    """The Confirmed or Pending reservation in a guest's name whose stay
+    covers on_date, earliest arrival first, or None"""
+    day = to_iso_date(on_date)
+    with cursor() as c:
+        c.execute(SELECT_RESERVATIONS_SQL + f'''
+            WHERE LOWER(r.guest_first_name) = LOWER(?) AND LOWER(r.guest_last_name) = LOWER(?)
+              AND r.status IN ({', '.join('?' * len(ARRIVING_RESERVATION_STATUSES))})
+              AND r.arrival_date <= ?
+              AND IFNULL(r.departure_date, date(r.arrival_date, '+1 day')) > ?
+            ORDER BY r.arrival_date, r.id
+            LIMIT 1
+        ''', (first_name, last_name, *ARRIVING_RESERVATION_STATUSES, day, day))
+        return fetch_one(c)
+
+# Report queries read the all_* views, which include archived history
+
+def _filtered_checkins_query(from_date, to_date, room_type=None, status=None):
+    query = f'''
         SELECT c.checkin_id, g.first_name || ' ' || g.last_name AS guest_name,
                g.id_number, r.number as room_number, c.arrival_date, c.departure_date, c.status
-        FROM check_ins c
+        FROM {history_view('check_ins')} c
         LEFT JOIN guests g ON c.guest_id = g.id
         LEFT JOIN rooms r ON c.room_id = r.id
-        WHERE date(c.arrival_date) BETWEEN ? AND ?
+        WHERE c.arrival_date >= ? AND c.arrival_date < ?
     '''
-    params = [from_date, to_date]
+    params = list(day_range(from_date, to_date))
 
     if room_type and room_type != "All":
         query += " AND LOWER(r.type) = ?"
@@ -850,25 +1341,26 @@ def get_filtered_checkins(from_date, to_date, room_type=None, status=None):
         params.append(status.lower())
 
     query += " ORDER BY c.arrival_date DESC"
+    return query, params
 
-    c.execute(query, params)
-    columns = [desc[0] for desc in c.description]
-    results = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return results
+def get_filtered_checkins(from_date, to_date, room_type=None, status=None):
+    with cursor() as c:
+        c.execute(*_filtered_checkins_query(from_date, to_date, room_type, status))
+        return fetch_all(c)
 
+def iter_filtered_checkins(from_date, to_date, room_type=None, status=None):
+    """Stream the rows of get_filtered_checkins"""
+    yield from _iter_rows(*_filtered_checkins_query(from_date, to_date, room_type, status))
 
-def get_filtered_reservations(from_date, to_date, room_type="All", status="All"):
-    conn = get_connection()
-    c = conn.cursor()
 
-    query = """
+def _filtered_reservations_query(from_date, to_date, room_type="All", status="All"):
+    query = f"""
         SELECT reservation_id, guest_first_name, guest_last_name, room_type,
                arrival_date, num_guests, deposit_amount, status, created_on
-        FROM reservations
-        WHERE date(arrival_date) BETWEEN ? AND ?
+        FROM {history_view('reservations')}
+        WHERE arrival_date >= ? AND arrival_date < ?
     """
-    params = [from_date, to_date]
+    params = list(day_range(from_date, to_date))
 
     if room_type != "All":
         query += " AND room_type = ?"
@@ -877,185 +1369,361 @@ def get_filtered_reservations(from_date, to_date, room_type="All", status="All")
     if status != "All":
         query += " AND status = ?"
         params.append(status)
+    return query, params
+
+def get_filtered_reservations(from_date, to_date, room_type="All", status="All"):
+    with cursor() as c:
+        c.execute(*_filtered_reservations_query(from_date, to_date, room_type, status))
+        return fetch_all(c)
 
-    c.execute(query, params)
-    columns = [desc[0] for desc in c.description]
-    results = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return results
+def iter_filtered_reservations(from_date, to_date, room_type="All", status="All"):
+    """Stream the rows of get_filtered_reservations"""
+    yield from _iter_rows(*_filtered_reservations_query(from_date, to_date, room_type, status))
 
 def get_all_reservations():
     """Get all reservations from the database"""
-    conn = get_connection()
-    c = conn.cursor()
+    with cursor() as c:
+        c.execute('''
+            SELECT r.*, rm.number as room_number
+            FROM reservations r
+            LEFT JOIN rooms rm ON r.room_id = rm.id
+            ORDER BY r.created_on DESC
+        ''')
+        return fetch_all(c)
+
+# Daily statistics
+# daily_stats holds one row per date and room type: rooms sold and
+# available, room and service revenue, arrivals, departures and
+# cancellations. Every writer of check-ins, service charges, cancellations
+# and rooms refreshes the dates it touched inside its own transaction, so
+# charts and revenue reports read O(days) rows. A stay's total_paid is
+# spread over its nights (the leftover centimes go to the first nights);
+# a stay sells its room from arrival to the night before it left, and a
+# same-day stay sells one night. rooms_available is the room count at the
+# time the row was last refreshed.
+
+DAILY_STATS_REFRESH_SQL = f'''
+    WITH RECURSIVE days(stat_date) AS (
+        SELECT :from_date
+        UNION ALL
+        SELECT date(stat_date, '+1 day') FROM days WHERE stat_date < :to_date
+    ),
+    stays(room_type, arrival, departure, nights, paid) AS (
+        SELECT IFNULL(r.type, ''), c.arrival_date, IFNULL(c.actual_departure, c.departure_date),
+               MAX(CAST(julianday(IFNULL(c.actual_departure, c.departure_date))
+                        - julianday(c.arrival_date) AS INTEGER), 1),
+               IFNULL(c.total_paid, 0)
+        FROM {history_view('check_ins')} c
+        LEFT JOIN rooms r ON r.id = c.room_id
+        -- Recent dates are the usual refresh, so the stays are found from
+        -- the departure side (the unary + keeps the planner off arrival_date)
+        WHERE +c.arrival_date <= :to_date
+          AND (c.departure_date >= :from_date OR c.actual_departure >= :from_date)
+          AND IFNULL(c.status, '') != 'Cancelled'
+    ),
+    nights(room_type, stat_date, night, nights, paid) AS (
+        SELECT room_type, arrival, 0, nights, paid FROM stays
+        UNION ALL
+        SELECT room_type, date(stat_date, '+1 day'), night + 1, nights, paid FROM nights
+        WHERE night + 1 < nights AND stat_date < :to_date
+    ),
+    events(stat_date, room_type, rooms_sold, room_revenue, service_revenue, arrivals, departures, cancellations) AS (
+        SELECT d.stat_date, t.room_type, 0, 0, 0, 0, 0, 0
+        FROM days d, (SELECT DISTINCT IFNULL(type, '') AS room_type FROM rooms) t
+        UNION ALL
+        SELECT stat_date, room_type, 1, paid / nights + (night < paid % nights), 0, 0, 0, 0
+        FROM nights WHERE stat_date >= :from_date
+        UNION ALL
+        SELECT arrival, room_type, 0, 0, 0, 1, 0, 0
+        FROM stays WHERE arrival >= :from_date
+        UNION ALL
+        SELECT departure, room_type, 0, 0, 0, 0, 1, 0
+        FROM stays WHERE departure BETWEEN :from_date AND :to_date
+        UNION ALL
+        SELECT date(bs.charge_date),
+               IFNULL((SELECT r.type FROM {history_view('check_ins')} c JOIN rooms r ON r.id = c.room_id
+                       WHERE c.id = bs.booking_id), ''),
+               0, 0, bs.total_charge, 0, 0, 0
+        FROM {history_view('booking_services')} bs
+        WHERE bs.charge_date >= :from_date AND bs.charge_date < date(:to_date, '+1 day')
+        UNION ALL
+        SELECT date(rc.cancellation_date),
+               IFNULL((SELECT IFNULL(rm.type, r.room_type) FROM {history_view('reservations')} r
+                       LEFT JOIN rooms rm ON rm.id = r.room_id
+                       WHERE r.reservation_id = rc.reservation_id), ''),
+               0, 0, 0, 0, 0, 1
+        FROM {history_view('reservation_cancellations')} rc
+        WHERE rc.cancellation_date >= :from_date AND rc.cancellation_date < date(:to_date, '+1 day')
+    )
+    INSERT INTO daily_stats (
+        stat_date, room_type, rooms_sold, rooms_available, room_revenue,
+        service_revenue, arrivals, departures, cancellations
+    )
+    SELECT e.stat_date, e.room_type, SUM(e.rooms_sold),
+           (SELECT COUNT(*) FROM rooms WHERE IFNULL(type, '') = e.room_type),
+           SUM(e.room_revenue), SUM(e.service_revenue), SUM(e.arrivals),
+           SUM(e.departures), SUM(e.cancellations)
+    FROM events e
+    GROUP BY e.stat_date, e.room_type
+'''
+
+def _refresh_daily_stats(c, from_date, to_date):
+    """Recompute daily_stats for from_date..to_date (inclusive) inside the caller's transaction"""
+    from_date, to_date = to_iso_date(from_date), to_iso_date(to_date)
+    if not from_date or not to_date:
+        return
+    if to_date < from_date:
+        from_date, to_date = to_date, from_date
+    c.execute('DELETE FROM daily_stats WHERE stat_date BETWEEN ? AND ?', (from_date, to_date))
+    c.execute(DAILY_STATS_REFRESH_SQL, {'from_date': from_date, 'to_date': to_date})
+
+def _refresh_stay_stats(c, checkin_id, departed=None):
+    """Refresh the dates of one stay; departed is a departure it had before an update"""
+    c.execute('SELECT arrival_date, IFNULL(actual_departure, departure_date) FROM check_ins WHERE checkin_id = ?',
+              (checkin_id,))
+    stay = c.fetchone()
+    if stay:
+        _refresh_daily_stats(c, stay[0], max(stay[1], departed or stay[1]))
+
+def _refresh_rooms_available(c):
+    """Bring rooms_available up to date for today and later after a room change"""
+    today = date.today().isoformat()
+    # A new room type gets rows next to the existing ones
+    c.execute('''
+        INSERT OR IGNORE INTO daily_stats (stat_date, room_type)
+        SELECT d.stat_date, t.room_type
+        FROM (SELECT DISTINCT stat_date FROM daily_stats WHERE stat_date >= :today) d,
+             (SELECT DISTINCT IFNULL(type, '') AS room_type FROM rooms) t
+    ''', {'today': today})
     c.execute('''
-        SELECT r.*, rm.number as room_number 
-        FROM reservations r
-        LEFT JOIN rooms rm ON r.room_id = rm.id
-        ORDER BY r.created_on DESC
+        UPDATE daily_stats
+        SET rooms_available = (SELECT COUNT(*) FROM rooms WHERE IFNULL(type, '') = daily_stats.room_type)
+        WHERE stat_date >= :today
+    ''', {'today': today})
+
+def _history_range(c):
+    """First and last date of any stay, service charge or cancellation, or (None, None)"""
+    c.execute(f'''
+        SELECT MIN(first), MAX(last) FROM (
+            SELECT MIN(arrival_date) AS first,
+                   MAX(IFNULL(MAX(departure_date), ''), IFNULL(MAX(actual_departure), '')) AS last
+            FROM {history_view('check_ins')}
+            UNION ALL
+            SELECT MIN(date(charge_date)), MAX(date(charge_date)) FROM {history_view('booking_services')}
+            UNION ALL
+            SELECT MIN(date(cancellation_date)), MAX(date(cancellation_date))
+            FROM {history_view('reservation_cancellations')}
+        )
     ''')
-    columns = [desc[0] for desc in c.description]
-    reservations = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return reservations
+    return c.fetchone()
+
+def rebuild_daily_stats(from_date=None, to_date=None):
+    """Recompute daily_stats from the stays, charges and cancellations on record.
+
+    The range defaults to the whole history; returns the number of rows written.
+    """
+    with transaction() as c:
+        first, last = _history_range(c)
+        from_date = to_iso_date(from_date) or first
+        to_date = to_iso_date(to_date) or last
+        if not from_date or not to_date:
+            return 0
+        _refresh_daily_stats(c, from_date, to_date)
+        c.execute('SELECT COUNT(*) FROM daily_stats WHERE stat_date BETWEEN ? AND ?', (from_date, to_date))
+        return c.fetchone()[0]
+
+DAILY_STATS_SQL = '''
+    SELECT stat_date,
+           SUM(rooms_sold) AS rooms_sold,
+           SUM(rooms_available) AS rooms_available,
+           SUM(room_revenue) AS "room_revenue [MONEY]",
+           SUM(service_revenue) AS "service_revenue [MONEY]",
+           SUM(arrivals) AS arrivals,
+           SUM(departures) AS departures,
+           SUM(cancellations) AS cancellations
+    FROM daily_stats
+    WHERE stat_date BETWEEN :from_date AND :to_date
+      AND (:room_type IS NULL OR LOWER(room_type) = :room_type)
+    GROUP BY stat_date
+    ORDER BY stat_date
+'''
+
+def get_daily_stats(from_date, to_date, room_type=None):
+    """Statistics per day, summed over room types unless room_type is given.
+
+    Each row also carries occupancy (percent of rooms sold), adr (average
+    room revenue per room sold) and revpar (room revenue per available room).
+    """
+    params = {
+        'from_date': to_iso_date(from_date),
+        'to_date': to_iso_date(to_date),
+        'room_type': room_type.lower() if room_type and room_type != "All" else None,
+    }
+    with cursor() as c:
+        c.execute(DAILY_STATS_SQL, params)
+        rows = fetch_all(c)
+    for row in rows:
+        sold, available = row['rooms_sold'], row['rooms_available']
+        row['occupancy'] = round(sold * 100 / available, 1) if available else 0
+        row['adr'] = row['room_revenue'] / sold if sold else Money(0)
+        row['revpar'] = row['room_revenue'] / available if available else Money(0)
+    return rows
 
 # User Authentication Functions
 def create_user(username, password_hash, first_name, last_name, role):
     """Create a new user in the database"""
-    conn = get_connection()
-    c = conn.cursor()
     try:
-        c.execute('''
-            INSERT INTO users (username, password_hash, first_name, last_name, role)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (username, password_hash, first_name, last_name, role))
-        conn.commit()
+        with transaction() as c:
+            c.execute('''
+                INSERT INTO users (username, password_hash, first_name, last_name, role)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (username, password_hash, first_name, last_name, role))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def get_user_by_username(username):
     """Get user by username"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username = ?', (username,))
-    columns = [desc[0] for desc in c.description]
-    user = c.fetchone()
-    conn.close()
-    return dict(zip(columns, user)) if user else None
+    with cursor() as c:
+        c.execute('SELECT * FROM users WHERE username = ?', (username,))
+        return fetch_one(c)
 
 def update_user_password(user_id, new_password_hash):
     """Update user's password"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_password_hash, user_id))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_password_hash, user_id))
 
 def deactivate_user(user_id):
     """Deactivate a user account"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
 
 def get_all_users():
     """Get all users from the database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT id, username, first_name, last_name, role, is_active, created_at FROM users')
-    columns = [desc[0] for desc in c.description]
-    users = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return users
+    with cursor() as c:
+        c.execute('SELECT id, username, first_name, last_name, role, is_active, created_at FROM users')
+        return fetch_all(c)
 
 # Company Accounts CRUD
+@ref_cache.invalidates('company_accounts')
 def add_company_account(company):
     """Add a new company account to database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO company_accounts (
-            name, address, phone, email, tax_id, billing_terms,
-            credit_limit, payment_due_days, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        company['name'],
-        company.get('address'),
-        company.get('phone'),
-        company.get('email'),
-        company.get('tax_id'),
-        company.get('billing_terms'),
-        company.get('credit_limit', 0),
-        company.get('payment_due_days', 30),
-        company.get('status', 'active')
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO company_accounts (
+                name, address, phone, email, tax_id, billing_terms,
+                credit_limit, payment_due_days, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            company['name'],
+            company.get('address'),
+            company.get('phone'),
+            company.get('email'),
+            company.get('tax_id'),
+            company.get('billing_terms'),
+            to_cents(company.get('credit_limit', 0)),
+            company.get('payment_due_days', 30),
+            company.get('status', 'active')
+        ))
+
+def _load_company_accounts():
+    with cursor() as c:
+        c.execute('SELECT * FROM company_accounts ORDER BY name')
+        return fetch_all(c)
+
+ref_cache.register('company_accounts', _load_company_accounts)
 
 def get_company_accounts():
     """Get all company accounts from database"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM company_accounts ORDER BY name')
-    columns = [desc[0] for desc in c.description]
-    companies = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return companies
+    return ref_cache.get('company_accounts')
 
 def get_company_account(company_id):
     """Get a specific company account by ID"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM company_accounts WHERE id = ?', (company_id,))
-    columns = [desc[0] for desc in c.description]
-    company = c.fetchone()
-    conn.close()
-    return dict(zip(columns, company)) if company else None
+    return ref_cache.lookup('company_accounts', 'id', company_id)
 
+@ref_cache.invalidates('company_accounts')
 def update_company_account(company):
     """Update an existing company account"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        UPDATE company_accounts SET
-            name = ?,
-            address = ?,
-            phone = ?,
-            email = ?,
-            tax_id = ?,
-            billing_terms = ?,
-            credit_limit = ?,
-            payment_due_days = ?,
-            status = ?
-        WHERE id = ?
-    ''', (
-        company['name'],
-        company.get('address'),
-        company.get('phone'),
-        company.get('email'),
-        company.get('tax_id'),
-        company.get('billing_terms'),
-        company.get('credit_limit', 0),
-        company.get('payment_due_days', 30),
-        company.get('status', 'active'),
-        company['id']
-    ))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute('''
+            UPDATE company_accounts SET
+                name = ?,
+                address = ?,
+                phone = ?,
+                email = ?,
+                tax_id = ?,
+                billing_terms = ?,
+                credit_limit = ?,
+                payment_due_days = ?,
+                status = ?
+            WHERE id = ?
+        ''', (
+            company['name'],
+            company.get('address'),
+            company.get('phone'),
+            company.get('email'),
+            company.get('tax_id'),
+            company.get('billing_terms'),
+            to_cents(company.get('credit_limit', 0)),
+            company.get('payment_due_days', 30),
+            company.get('status', 'active'),
+            company['id']
+        ))
 
 # Company Charges CRUD
-def add_company_charge(charge):
-    """Add a new company charge"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO company_charges (
-            company_id, checkin_id, guest_id, room_charges,
-            service_charges, total_amount, notes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
+INSERT_COMPANY_CHARGE_SQL = '''
+    INSERT INTO company_charges (
+        company_id, checkin_id, guest_id, room_charges,
+        service_charges, total_amount, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _company_charge_params(charge):
+    return (
         charge['company_id'],
         charge['checkin_id'],
         charge['guest_id'],
-        charge.get('room_charges', 0),
-        charge.get('service_charges', 0),
-        charge['total_amount'],
+        to_cents(charge.get('room_charges', 0)),
+        to_cents(charge.get('service_charges', 0)),
+        to_cents(charge['total_amount']),
         charge.get('notes')
-    ))
-    conn.commit()
-    conn.close()
+    )
+
+# company_accounts.open_balance is the sum of the company's unpaid charges.
+# Every writer below moves it by the amounts it adds or settles, inside the
+# same transaction, and invalidates the cached company rows that carry it.
+def _add_to_open_balances(c, amounts):
+    """Add {company_id: centimes} to the companies' open_balance"""
+    c.executemany('UPDATE company_accounts SET open_balance = open_balance + ? WHERE id = ?',
+                  [(amount, company_id) for company_id, amount in amounts.items() if amount])
+
+@ref_cache.invalidates('company_accounts')
+def add_company_charge(charge):
+    """Add a new company charge"""
+    params = _company_charge_params(charge)
+    with transaction() as c:
+        c.execute(INSERT_COMPANY_CHARGE_SQL, params)
+        charge_id = c.lastrowid
+        _add_to_open_balances(c, {params[0]: params[5]})
+        return charge_id
+
+@ref_cache.invalidates('company_accounts')
+def add_company_charges_bulk(charges):
+    """Add many company charges in one transaction and return their ids"""
+    rows = list(map(_company_charge_params, charges))
+    amounts = {}
+    for row in rows:
+        amounts[row[0]] = amounts.get(row[0], 0) + row[5]
+    with transaction() as c:
+        ids = _insert_many(c, INSERT_COMPANY_CHARGE_SQL, rows)
+        _add_to_open_balances(c, amounts)
+        return ids
 
 def get_company_charges(company_id=None, is_paid=None):
     """Get company charges, optionally filtered by company and payment status"""
-    conn = get_connection()
-    c = conn.cursor()
-    
     query = '''
         SELECT cc.*, g.first_name, g.last_name, ci.checkin_id, ci.arrival_date, ci.departure_date,
+               CAST(julianday(ci.departure_date) - julianday(ci.arrival_date) AS INTEGER) AS nights,
                r.number as room_number
         FROM company_charges cc
         JOIN guests g ON cc.guest_id = g.id
@@ -1063,7 +1731,7 @@ def get_company_charges(company_id=None, is_paid=None):
         LEFT JOIN rooms r ON ci.room_id = r.id
     '''
     params = []
-    
+
     if company_id is not None:
         query += ' WHERE cc.company_id = ?'
         params.append(company_id)
@@ -1073,139 +1741,343 @@ def get_company_charges(company_id=None, is_paid=None):
     elif is_paid is not None:
         query += ' WHERE cc.is_paid = ?'
         params.append(is_paid)
-    
+
     query += ' ORDER BY cc.charge_date DESC'
-    
-    c.execute(query, params)
-    columns = [desc[0] for desc in c.description]
-    charges = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return charges
 
+    with cursor() as c:
+        c.execute(query, params)
+        return fetch_all(c)
+
+@ref_cache.invalidates('company_accounts')
 def mark_company_charge_paid(charge_id, payment_date=None):
     """Mark a company charge as paid"""
-    conn = get_connection()
-    c = conn.cursor()
     if payment_date is None:
-        payment_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    c.execute('''
-        UPDATE company_charges SET
-            is_paid = 1,
-            payment_date = ?
-        WHERE id = ?
-    ''', (payment_date, charge_id))
-    conn.commit()
-    conn.close()
+        payment_date = datetime.now().strftime(DATETIME_FORMAT)
+
+    with transaction() as c:
+        c.execute('SELECT company_id, total_amount FROM company_charges WHERE id = ? AND is_paid = 0', (charge_id,))
+        unpaid = c.fetchone()
+        c.execute('''
+            UPDATE company_charges SET
+                is_paid = 1,
+                payment_date = ?
+            WHERE id = ?
+        ''', (payment_date, charge_id))
+        if unpaid:
+            _add_to_open_balances(c, {unpaid[0]: -unpaid[1].cents})
 
 def get_company_balance(company_id):
     """Get total unpaid balance for a company"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT SUM(total_amount) as balance
-        FROM company_charges
-        WHERE company_id = ? AND is_paid = 0
-    ''', (company_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result and result[0] is not None else 0
+    with cursor() as c:
+        c.execute('SELECT open_balance FROM company_accounts WHERE id = ?', (company_id,))
+        row = c.fetchone()
+        return row[0] if row else Money(0)
+
+@ref_cache.invalidates('company_accounts')
+def rebuild_company_balances():
+    """Recompute every open_balance from the unpaid charges, for charges
+    written without the functions above (bulk loads, manual fixes)"""
+    with transaction() as c:
+        c.execute('''
+            UPDATE company_accounts
+            SET open_balance = (SELECT IFNULL(SUM(total_amount), 0) FROM company_charges
+                                WHERE company_id = company_accounts.id AND is_paid = 0)
+        ''')
+
+def get_company_accounts_with_balances():
+    """Every company account, by name, with its open_balance, unpaid_count
+    and the date of its oldest_unpaid charge (None when nothing is owed)"""
+    with cursor() as c:
+        c.execute('''
+            SELECT ca.*, COUNT(cc.id) AS unpaid_count,
+                   MIN(cc.charge_date) AS oldest_unpaid
+            FROM company_accounts ca
+            LEFT JOIN company_charges cc ON cc.company_id = ca.id AND cc.is_paid = 0
+            GROUP BY ca.id
+            ORDER BY ca.name
+        ''')
+        return fetch_all(c)
 
 def get_guest(guest_id):
     """Get guest information by ID"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT * FROM guests WHERE id = ?
-    ''', (guest_id,))
-    guest = c.fetchone()
-    conn.close()
-    if guest:
-        return dict(zip([col[0] for col in c.description], guest))
-    return None
+    with cursor() as c:
+        c.execute('''
+            SELECT * FROM guests WHERE id = ?
+        ''', (guest_id,))
+        return fetch_one(c)
 
 def get_guest_services(guest_id):
     """Get all service charges for a guest (not just by booking)"""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        SELECT bs.*, s.name as service_name, s.unit
-        FROM booking_services bs
-        JOIN services s ON bs.service_id = s.id
-        WHERE bs.guest_id = ?
-        ORDER BY bs.charge_date DESC
-    ''', (guest_id,))
-    columns = [desc[0] for desc in c.description]
-    services = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return services
+    with cursor() as c:
+        c.execute('''
+            SELECT bs.*, s.name as service_name, s.unit
+            FROM booking_services bs
+            JOIN services s ON bs.service_id = s.id
+            WHERE bs.guest_id = ?
+            ORDER BY bs.charge_date DESC
+        ''', (guest_id,))
+        return fetch_all(c)
 
 def mark_guest_services_paid(guest_id, amount_paid, payment_date=None):
     """Mark all unpaid services for a guest as paid or partly paid."""
-    conn = get_connection()
-    c = conn.cursor()
-    # Get total unpaid for guest
-    c.execute('''SELECT SUM(total_charge) FROM booking_services WHERE guest_id = ? AND is_paid = 0''', (guest_id,))
-    total_unpaid = c.fetchone()[0] or 0
-    remaining = total_unpaid - amount_paid
-    is_full = int(remaining <= 0.01)
     if not payment_date:
-        from datetime import datetime
-        payment_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    c.execute('''
-        UPDATE booking_services
-        SET is_paid = ?, amount_paid = ?, remaining_amount = ?, payment_date = ?
-        WHERE guest_id = ? AND is_paid = 0
-    ''', (is_full, amount_paid, max(remaining, 0), payment_date, guest_id))
-    conn.commit()
-    conn.close()
+        payment_date = datetime.now().strftime(DATETIME_FORMAT)
+    with transaction() as c:
+        # Get total unpaid for guest
+        c.execute('''SELECT COALESCE(SUM(total_charge), 0) AS "total [MONEY]" FROM booking_services WHERE guest_id = ? AND is_paid = 0''', (guest_id,))
+        total_unpaid = c.fetchone()[0]
+        amount_paid = Money.of(amount_paid)
+        remaining = total_unpaid - amount_paid
+        is_full = int(remaining <= Money(1))
+        c.execute('''
+            UPDATE booking_services
+            SET is_paid = ?, amount_paid = ?, remaining_amount = ?, payment_date = ?
+            WHERE guest_id = ? AND is_paid = 0
+        ''', (is_full, amount_paid, max(remaining, Money(0)), payment_date, guest_id))
 
 # Invoices CRUD
 
+def _invoice_line_params(invoice_id, items):
+    for line_no, item in enumerate(items, 1):
+        quantity = item.get('quantity', 1)
+        unit_price = Money.of(item.get('unit_price') or 0)
+        line_total = item.get('line_total')
+        yield (
+            invoice_id,
+            line_no,
+            item.get('description') or '',
+            quantity,
+            unit_price,
+            to_cents(line_total) if line_total is not None else unit_price * quantity,
+        )
+
 def add_invoice(invoice):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO invoices (
-            invoice_number, date_generated, due_date, customer_name, customer_email, customer_phone, billing_address, tax_id, items, subtotal, tax_amount, total_amount, amount_paid, balance_due, payment_terms, special_instructions, pdf_path
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        invoice['invoice_number'],
-        invoice['date_generated'],
-        invoice.get('due_date'),
-        invoice['customer_name'],
-        invoice.get('customer_email'),
-        invoice.get('customer_phone'),
-        invoice.get('billing_address'),
-        invoice.get('tax_id'),
-        invoice['items'],
-        invoice['subtotal'],
-        invoice['tax_amount'],
-        invoice['total_amount'],
-        invoice.get('amount_paid', 0),
-        invoice['balance_due'],
-        invoice.get('payment_terms'),
-        invoice.get('special_instructions'),
-        invoice.get('pdf_path')
-    ))
-    conn.commit()
-    conn.close()
+    """Insert an invoice and its line items (invoice['items'], a list of dicts
+    with description, quantity, unit_price and line_total); return its id"""
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO invoices (
+                invoice_number, date_generated, due_date, customer_name, customer_email, customer_phone, billing_address, tax_id, subtotal, tax_amount, total_amount, amount_paid, balance_due, payment_terms, special_instructions, pdf_path
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            invoice['invoice_number'],
+            invoice['date_generated'],
+            invoice.get('due_date'),
+            invoice['customer_name'],
+            invoice.get('customer_email'),
+            invoice.get('customer_phone'),
+            invoice.get('billing_address'),
+            invoice.get('tax_id'),
+            to_cents(invoice['subtotal']),
+            to_cents(invoice['tax_amount']),
+            to_cents(invoice['total_amount']),
+            to_cents(invoice.get('amount_paid', 0)),
+            to_cents(invoice['balance_due']),
+            invoice.get('payment_terms'),
+            invoice.get('special_instructions'),
+            invoice.get('pdf_path')
+        ))
+        invoice_id = c.lastrowid
+        c.executemany('''
+            INSERT INTO invoice_lines (invoice_id, line_no, description, quantity, unit_price, line_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', _invoice_line_params(invoice_id, invoice.get('items') or []))
+        return invoice_id
 
 def get_invoices():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM invoices ORDER BY date_generated DESC')
-    columns = [desc[0] for desc in c.description]
-    invoices = [dict(zip(columns, row)) for row in c.fetchall()]
-    conn.close()
-    return invoices
+    with cursor() as c:
+        c.execute('SELECT * FROM invoices ORDER BY date_generated DESC')
+        return fetch_all(c)
+
+def iter_invoices():
+    """Stream every invoice header, newest first"""
+    yield from _iter_rows('SELECT * FROM invoices ORDER BY date_generated DESC')
+
+def get_invoices_page(after=None, limit=PAGE_SIZE):
+    """One page of invoice headers, newest first; after is the previous page's last row"""
+    return _keyset_page('SELECT * FROM invoices', 'id', after, limit,
+                        sort_column='date_generated', sort_key='date_generated')
 
 def get_invoice(invoice_id):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM invoices WHERE id=?', (invoice_id,))
-    row = c.fetchone()
-    columns = [desc[0] for desc in c.description]
-    invoice = dict(zip(columns, row)) if row else None
-    conn.close()
-    return invoice
+    with cursor() as c:
+        c.execute('SELECT * FROM invoices WHERE id=?', (invoice_id,))
+        return fetch_one(c)
+
+def get_invoice_lines(invoice_id):
+    """Line items of one invoice, in order"""
+    with cursor() as c:
+        c.execute('SELECT * FROM invoice_lines WHERE invoice_id = ? ORDER BY line_no', (invoice_id,))
+        return fetch_all(c)
+
+def get_invoice_item_revenue(from_date=None, to_date=None, description=None):
+    """Quantity and revenue per invoice line description, biggest earner first.
+
+    from_date / to_date bound the invoice date (inclusive); description
+    keeps the items starting with that text.
+    """
+    query = '''
+        SELECT l.description, SUM(l.quantity) AS quantity,
+               SUM(l.line_total) AS "revenue [MONEY]",
+               COUNT(DISTINCT l.invoice_id) AS invoices
+        FROM invoice_lines l
+        JOIN invoices i ON i.id = l.invoice_id
+        WHERE 1=1
+    '''
+    params = []
+    if from_date:
+        query += ' AND i.date_generated >= ?'
+        params.append(to_iso_date(from_date))
+    if to_date:
+        query += ' AND i.date_generated < ?'
+        params.append(day_range(to_date, to_date)[1])
+    if description:
+        query += " AND l.description LIKE ? ESCAPE '\\'"
+        params.append(re.sub(r'([%_\\])', r'\\\1', description) + '%')
+    query += ' GROUP BY l.description ORDER BY SUM(l.line_total) DESC'
+    with cursor() as c:
+        c.execute(query, params)
+        return fetch_all(c)
+
+# Search
+# Backed by the search_index FTS5 table that migration 5 keeps in sync
+# with guests, reservations, invoices and company accounts.
+SEARCH_LIMIT = 200
+
+# Extra columns and joins per kind, so search_rows returns the same shape
+# as the kind's regular list query
+_SEARCH_ROW_JOINS = {
+    'reservation': (', rm.number as room_number, COALESCE(t.room_type, rm.type) AS room_type',
+                    'LEFT JOIN rooms rm ON t.room_id = rm.id'),
+}
+
+_SEARCH_KIND_SQL = 'CASE rowid % 4 ' + ' '.join(
+    f"WHEN {code} THEN '{kind}'" for kind, code in SEARCH_KINDS.items()) + ' END'
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query where every word is a prefix"""
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+# Ids of one kind of entity matching an FTS query, for filtering a list
+# query; its parameters are the _fts_query and the SEARCH_KINDS code
+_SEARCH_IDS_SQL = 'SELECT rowid / 4 FROM search_index WHERE search_index MATCH ? AND rowid % 4 = ?'
+
+def search_entities(query, kinds=None, limit=50):
+    """Search every indexed entity, best match first.
+
+    kinds restricts the search to some of 'guest', 'reservation', 'invoice'
+    and 'company'. Each hit carries kind, entity_id, name and extra.
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+    codes = [SEARCH_KINDS[kind] for kind in (kinds or SEARCH_KINDS)]
+    placeholders = ', '.join('?' * len(codes))
+    with cursor() as c:
+        c.execute(f'''
+            SELECT {_SEARCH_KIND_SQL} AS kind, rowid / 4 AS entity_id, name, extra
+            FROM search_index
+            WHERE search_index MATCH ? AND rowid % 4 IN ({placeholders})
+            ORDER BY rank
+            LIMIT ?
+        ''', [match, *codes, limit])
+        return fetch_all(c)
+
+def search_rows(kind, query, limit=SEARCH_LIMIT):
+    """Full rows of one entity kind matching query, best match first"""
+    match = _fts_query(query)
+    if not match:
+        return []
+    table = SEARCH_SOURCES[kind][0]
+    columns, joins = _SEARCH_ROW_JOINS.get(kind, ('', ''))
+    with cursor() as c:
+        c.execute(f'''
+            SELECT t.*{columns}
+            FROM search_index s
+            JOIN {table} t ON t.id = s.rowid / 4
+            {joins}
+            WHERE s.search_index MATCH ? AND s.rowid % 4 = ?
+            ORDER BY s.rank
+            LIMIT ?
+        ''', (match, SEARCH_KINDS[kind], limit))
+        return fetch_all(c)
+
+# Guest services report
+
+# Service totals per guest of the `picked` CTE (id, rank). A partial payment
+# is stamped on every unpaid service of the guest (mark_guest_services_paid),
+# so it counts once: remaining = unpaid charges - that payment.
+_GUEST_SERVICE_TOTALS_SQL = '''
+    , totals AS (
+        SELECT bs.guest_id, COUNT(*) AS service_count, SUM(bs.total_charge) AS total,
+               MAX(SUM(CASE WHEN IFNULL(bs.is_paid, 0) = 0 THEN bs.total_charge ELSE 0 END)
+                   - MAX(CASE WHEN IFNULL(bs.is_paid, 0) = 0 THEN IFNULL(bs.amount_paid, 0) ELSE 0 END), 0)
+                   AS remaining
+        FROM picked p
+        JOIN booking_services bs ON bs.guest_id = p.id
+        GROUP BY bs.guest_id
+    )
+    SELECT g.*, IFNULL(t.service_count, 0) AS service_count,
+           IFNULL(t.total, 0) AS "total_amount [MONEY]",
+           IFNULL(t.total - t.remaining, 0) AS "total_paid [MONEY]",
+           IFNULL(t.remaining, 0) AS "total_remaining [MONEY]",
+           (SELECT r.number FROM check_ins c JOIN rooms r ON r.id = c.room_id
+            WHERE c.guest_id = g.id ORDER BY c.checkin_date DESC LIMIT 1) AS room_number
+    FROM picked p
+    JOIN guests g ON g.id = p.id
+    LEFT JOIN totals t ON t.guest_id = p.id
+    ORDER BY p.rank, p.id
+'''
+
+def get_guest_service_totals(search_text='', limit=SEARCH_LIMIT):
+    """Every guest, or the guests matching search_text (best match first),
+    with their service_count, total_amount, total_paid, total_remaining and
+    the room_number of their latest stay"""
+    match = _fts_query(search_text)
+    with cursor() as c:
+        if match:
+            c.execute(f'''
+                WITH picked AS (
+                    SELECT s.rowid / 4 AS id, s.rank AS rank
+                    FROM search_index s
+                    WHERE s.search_index MATCH ? AND s.rowid % 4 = ?
+                    ORDER BY s.rank
+                    LIMIT ?
+                )
+                {_GUEST_SERVICE_TOTALS_SQL}
+            ''', (match, SEARCH_KINDS['guest'], limit))
+        else:
+            c.execute(f'''
+                WITH picked AS (SELECT id, 0 AS rank FROM guests)
+                {_GUEST_SERVICE_TOTALS_SQL}
+            ''')
+        return fetch_all(c)
+
+def iter_guest_service_totals():
+    """Stream the totals of get_guest_service_totals for the guests with
+    services, by guest_id like iter_guest_service_lines"""
+    yield from _iter_rows(f'''
+        WITH picked AS (SELECT DISTINCT guest_id AS id, 0 AS rank FROM booking_services)
+        {_GUEST_SERVICE_TOTALS_SQL}
+    ''')
+
+def iter_guest_service_lines():
+    """Yield every service charge with its guest_name and service_name,
+    grouped by guest (ordered by guest_id, then newest charge first).
+
+    Payment columns are left out: a guest's payments are in
+    get_guest_service_totals.
+    """
+    yield from _iter_rows('''
+        SELECT bs.id, bs.guest_id, bs.booking_id, bs.service_id, bs.quantity,
+               bs.unit_price_at_time_of_charge, bs.total_charge, bs.charge_date, bs.is_paid, bs.notes,
+               g.first_name || ' ' || g.last_name AS guest_name, s.name AS service_name, s.unit
+        FROM booking_services bs
+        JOIN guests g ON g.id = bs.guest_id
+        JOIN services s ON s.id = bs.service_id
+        ORDER BY bs.guest_id, bs.charge_date DESC
+    ''')
+
+# Opt-in latency statistics for every query function above; see
+# app/core/instrumentation.py and Settings > Diagnostics
+instrument_module(globals(), exclude=('get_connection', 'to_iso_date', 'to_iso_datetime', 'day_range'))
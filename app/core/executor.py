@@ -0,0 +1,196 @@
+import threading
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from app.core.config_handler import app_config
+from app.core.connection import db_manager
+
+# The job running on each pool thread, for report_progress()
+_running = threading.local()
+
+
+class QueryHandle(QObject):
+    """The caller's view of a query submitted to the executor.
+
+    finished(result) or failed(exception) is emitted on the GUI thread once
+    the query is done, unless the handle was cancelled first; progress(value)
+    is emitted whenever the query calls report_progress(value).
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    progress = pyqtSignal(object)
+
+    def __init__(self, job):
+        super().__init__()
+        self._job = job
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        """Drop this caller's interest; the query itself stops once nobody waits for it"""
+        if not self.cancelled and not self.done:
+            self.cancelled = True
+            self._job.release(self)
+
+
+class _Job(QRunnable):
+    """One query run on a pool thread, shared by every coalesced handle"""
+
+    def __init__(self, executor, key, func, args, kwargs):
+        super().__init__()
+        # Python keeps the job alive until its result is delivered
+        self.setAutoDelete(False)
+        self.executor = executor
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.handles = []
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def release(self, handle):
+        self.handles.remove(handle)
+        if not self.handles:
+            self.executor._cancel(self)
+
+    def interrupt(self):
+        """Abort the statement currently running for this job, if any"""
+        with self._lock:
+            self.cancelled = True
+            if self._connection is not None:
+                self._connection.interrupt()
+
+    def run(self):
+        result = error = None
+        with self._lock:
+            if self.cancelled:
+                self.executor._relay.done.emit(self, None, None)
+                return
+            self._connection = db_manager.get_connection()
+        _running.job = self
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            _running.job = None
+            with self._lock:
+                self._connection = None
+        self.executor._relay.done.emit(self, result, error)
+
+
+class _Relay(QObject):
+    # Carries results from the pool threads back to the GUI thread
+    done = pyqtSignal(object, object, object)
+    progress = pyqtSignal(object, object)
+
+
+def report_progress(value):
+    """Emit progress(value) on the handles of the query running on this
+    thread; does nothing outside the executor (scripts, the GUI thread)"""
+    job = getattr(_running, 'job', None)
+    if job is not None and not job.cancelled:
+        job.executor._relay.progress.emit(job, value)
+
+
+def query_cancelled():
+    """Whether the query running on this thread has been cancelled, for
+    work that is not spent in a statement the interrupt would abort; always
+    False outside the executor"""
+    job = getattr(_running, 'job', None)
+    return job is not None and job.cancelled
+
+
+class QueryExecutor(QObject):
+    """Runs db.py functions on a small thread pool instead of the GUI thread.
+
+    Each pool thread reads through its own connection (see connection.py),
+    which WAL lets run alongside the GUI thread's writes. submit() returns a
+    QueryHandle straight away:
+
+    - an identical call (same function and arguments) that is still in
+      flight is shared instead of being run twice;
+    - a new submit() with the same group cancels the group's previous
+      handle, so a widget only ever waits for its latest filter;
+    - a cancelled query that is still queued never runs, and one already
+      running is interrupted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = None
+        self._relay = _Relay()
+        self._relay.done.connect(self._deliver, Qt.ConnectionType.QueuedConnection)
+        self._relay.progress.connect(self._report, Qt.ConnectionType.QueuedConnection)
+        self._jobs = set()
+        self._inflight = {}
+        self._groups = {}
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = QThreadPool(self)
+            self._pool.setMaxThreadCount(int(app_config.get('Database', 'worker_threads', '2')))
+            # Keep the threads, and with them their connections, for the
+            # lifetime of the application
+            self._pool.setExpiryTimeout(-1)
+        return self._pool
+
+    def submit(self, func, *args, group=None, **kwargs):
+        """Run func(*args, **kwargs) in the background and return a QueryHandle"""
+        key = (func, args, tuple(sorted(kwargs.items())))
+        try:
+            job = self._inflight.get(key)
+        except TypeError:
+            # Unhashable arguments, run it without coalescing
+            key = job = None
+        if job is None:
+            job = _Job(self, key, func, args, kwargs)
+            if key is not None:
+                self._inflight[key] = job
+            self._jobs.add(job)
+            self.pool.start(job)
+        handle = QueryHandle(job)
+        job.handles.append(handle)
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None:
+                previous.cancel()
+            self._groups[group] = handle
+        return handle
+
+    def wait(self, msecs=-1):
+        """Block until every queued query has run (for shutdown and scripts)"""
+        return self._pool is None or self._pool.waitForDone(msecs)
+
+    def _cancel(self, job):
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        job.interrupt()
+
+    def _report(self, job, value):
+        if job.cancelled:
+            return
+        for handle in list(job.handles):
+            handle.progress.emit(value)
+
+    def _deliver(self, job, result, error):
+        self._jobs.discard(job)
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        for handle in job.handles:
+            handle.done = True
+            for group, current in list(self._groups.items()):
+                if current is handle:
+                    del self._groups[group]
+        if job.cancelled:
+            return
+        for handle in list(job.handles):
+            if error is None:
+                handle.finished.emit(result)
+            else:
+                handle.failed.emit(error)
+
+
+# Singleton instance
+db_executor = QueryExecutor()
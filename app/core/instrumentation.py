@@ -0,0 +1,278 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import wraps
+from inspect import isfunction, isgeneratorfunction
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from app.core.config_handler import app_config
+from app.core.connection import db_manager
+
+# Settings read from the [Diagnostics] section of the config file
+DIAGNOSTICS_DEFAULTS = {
+    'query_stats': 'no',
+    'slow_query_ms': '200',
+    'slow_log_path': '',
+    'slow_log_max_bytes': '1048576',
+    'slow_log_backups': '3',
+}
+
+# Latency samples kept per function / statement for the percentiles
+SAMPLE_SIZE = 1000
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Stat:
+    __slots__ = ('count', 'rows', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, elapsed, rows):
+        self.count += 1
+        self.rows += rows
+        self.total += elapsed
+        self.samples.append(elapsed)
+
+    def summary(self, name):
+        ordered = sorted(self.samples)
+        return {
+            'name': name,
+            'calls': self.count,
+            'rows': self.rows,
+            'total_ms': self.total * 1000,
+            'p50_ms': _percentile(ordered, 50) * 1000,
+            'p95_ms': _percentile(ordered, 95) * 1000,
+            'p99_ms': _percentile(ordered, 99) * 1000,
+        }
+
+
+class QueryStats:
+    """Opt-in latency recorder for db.py functions and the SQL they run.
+
+    Disabled by default; while disabled the wrapped functions only pay one
+    attribute check and cursors are plain sqlite3 cursors.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = float(DIAGNOSTICS_DEFAULTS['slow_query_ms'])
+        self._lock = threading.Lock()
+        self.functions = {}
+        self.statements = {}
+        self._slow_log = None
+
+    def configure(self):
+        """Apply the [Diagnostics] config section"""
+        def setting(key):
+            return app_config.get('Diagnostics', key, DIAGNOSTICS_DEFAULTS[key])
+
+        self.slow_query_ms = float(setting('slow_query_ms'))
+        path = setting('slow_log_path') or str(Path(app_config.get_appdata_path()) / 'logs' / 'slow_queries.log')
+        self._slow_log = self._open_slow_log(path, int(setting('slow_log_max_bytes')), int(setting('slow_log_backups')))
+        if setting('query_stats').lower() in ('yes', 'true', 'on', '1'):
+            self.enable()
+
+    def _open_slow_log(self, path, max_bytes, backups):
+        logger = logging.getLogger('kissan.slow_queries')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+        except OSError:
+            logging.getLogger(__name__).warning(f"Slow query log disabled, cannot write to {path}")
+            return None
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        self.slow_log_path = path
+        return logger
+
+    def enable(self):
+        self.enabled = True
+        db_manager.cursor_class = InstrumentedCursor
+
+    def disable(self):
+        self.enabled = False
+        db_manager.cursor_class = sqlite3.Cursor
+
+    def reset(self):
+        with self._lock:
+            self.functions = {}
+            self.statements = {}
+
+    def record_function(self, name, elapsed, rows):
+        with self._lock:
+            stat = self.functions.get(name)
+            if stat is None:
+                stat = self.functions[name] = _Stat()
+            stat.add(elapsed, rows)
+
+    def record_statement(self, conn, sql, params, elapsed, rows):
+        key = ' '.join(sql.split())
+        with self._lock:
+            stat = self.statements.get(key)
+            if stat is None:
+                stat = self.statements[key] = _Stat()
+            stat.add(elapsed, rows)
+        if self._slow_log is not None and elapsed * 1000 >= self.slow_query_ms:
+            self._slow_log.info(json.dumps({
+                'ms': round(elapsed * 1000, 3),
+                'rows': rows,
+                'sql': key,
+                'params': [repr(p) for p in params] if isinstance(params, (list, tuple)) else repr(params),
+                'plan': self._explain(conn, sql, params),
+            }))
+
+    def _explain(self, conn, sql, params):
+        if params is None:
+            return None
+        try:
+            return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        except sqlite3.Error:
+            # DDL, PRAGMA and transaction statements have no plan
+            return None
+
+    def report(self):
+        """Per-function and per-statement summaries, slowest total first"""
+        with self._lock:
+            functions = [stat.summary(name) for name, stat in self.functions.items()]
+            statements = [stat.summary(sql) for sql, stat in self.statements.items()]
+        functions.sort(key=lambda s: s['total_ms'], reverse=True)
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {'functions': functions, 'statements': statements}
+
+    def dump_json(self, path):
+        """Write report() to a JSON file for offline analysis"""
+        data = dict(self.report(), generated=time.strftime('%Y-%m-%d %H:%M:%S'), slow_query_ms=self.slow_query_ms)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports every statement to query_stats.
+
+    sqlite3 does most of a SELECT's work while rows are fetched, so a
+    statement is timed from execute() until its rows are exhausted, the
+    next statement starts or the cursor closes.
+    """
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, time.perf_counter() - start, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        # No single parameter set to EXPLAIN with
+        query_stats.record_statement(self.connection, sql, None, time.perf_counter() - start, max(self.rowcount, 0))
+        return self
+
+    def _fetched(self, start, rows, done):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += time.perf_counter() - start
+            pending[3] += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, params, elapsed, rows = pending
+            if not rows and self.rowcount > 0:
+                rows = self.rowcount
+            query_stats.record_statement(self.connection, sql, params, elapsed, rows)
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None or isinstance(result, (bool, int, float)) else 1
+
+
+def instrumented(func):
+    """Record the wrapped function's latency and result size while enabled"""
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not query_stats.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        query_stats.record_function(name, time.perf_counter() - start, _row_count(result))
+        return result
+    return wrapper
+
+
+def instrument_module(namespace, exclude=()):
+    """Wrap every public function defined in a module's namespace.
+
+    Generator functions are left alone: they return before running their
+    query, whose statements the cursor still times.
+    """
+    module = namespace['__name__']
+    for name, obj in list(namespace.items()):
+        if (isfunction(obj) and not isgeneratorfunction(obj) and obj.__module__ == module
+                and not name.startswith('_') and name not in exclude):
+            namespace[name] = instrumented(obj)
+
+
+# Singleton instance
+query_stats = QueryStats()
+query_stats.configure()
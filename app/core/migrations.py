@@ -0,0 +1,510 @@
+import logging
+import re
+from app.core.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Ordered list of (version, description, function). The applied version is
+# stored in PRAGMA user_version; every migration runs in its own transaction
+# together with the version bump, so a failure leaves the schema untouched.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a schema migration"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def get_schema_version():
+    """Return the schema version recorded in PRAGMA user_version"""
+    with db_manager.cursor() as c:
+        c.execute('PRAGMA user_version')
+        return c.fetchone()[0]
+
+
+def migrate(target=None):
+    """Apply all pending migrations up to target (default: latest)"""
+    current = get_schema_version()
+    pending = [m for m in MIGRATIONS if m[0] > current and (target is None or m[0] <= target)]
+    if not pending:
+        return []
+
+    # Table rebuilds copy rows written before foreign keys were enforced, so
+    # enforcement is switched off while migrating (it cannot change inside a
+    # transaction) and restored afterwards. Legacy ALTER TABLE keeps the
+    # rename at the end of a rebuild from re-parsing views, which would fail
+    # on the archive's history views (see archive.py) while the old table is
+    # dropped or the archive tables do not exist yet.
+    conn = db_manager.get_connection()
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    legacy_alter_table = conn.execute('PRAGMA legacy_alter_table').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    applied = []
+    try:
+        for version, description, func in pending:
+            with db_manager.transaction() as c:
+                # Another terminal may have migrated while we waited for the lock
+                c.execute('PRAGMA user_version')
+                if c.fetchone()[0] >= version:
+                    continue
+                func(c)
+                c.execute(f'PRAGMA user_version = {int(version)}')
+            logger.info(f"Applied migration {version}: {description}")
+            applied.append(version)
+    finally:
+        conn.execute(f'PRAGMA foreign_keys = {foreign_keys}')
+        conn.execute(f'PRAGMA legacy_alter_table = {legacy_alter_table}')
+    return applied
+
+
+def rebuild_table(c, table, create_sql, columns, expressions=None):
+    """Recreate a table with a new definition, keeping its rows, indexes and triggers.
+
+    create_sql must create a table named <table>_new; columns lists the
+    columns copied from the old table. expressions optionally maps a column
+    to the SQL expression its new value is computed from.
+    """
+    c.execute("SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? "
+              "AND sql IS NOT NULL ORDER BY type", (table,))
+    index_sql = [row[0] for row in c.fetchall()]
+    c.execute(create_sql)
+    column_list = ', '.join(columns)
+    select_list = ', '.join((expressions or {}).get(column, column) for column in columns)
+    c.execute(f'INSERT INTO {table}_new ({column_list}) SELECT {select_list} FROM {table}')
+    c.execute(f'DROP TABLE {table}')
+    c.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    for sql in index_sql:
+        c.execute(sql)
+
+
+def _new_table_sql(c, table):
+    """The table's current CREATE TABLE statement, renamed to <table>_new for rebuild_table"""
+    c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return re.sub(r'^CREATE TABLE\s+"?\w+"?', f'CREATE TABLE {table}_new', c.fetchone()[0])
+
+
+def table_columns(c, table):
+    """Return {column name: PRAGMA table_info row} for a table"""
+    c.execute(f'PRAGMA table_info({table})')
+    return {row[1]: row for row in c.fetchall()}
+
+
+# Probe queries for the indexes db.py relies on: EXPLAIN QUERY PLAN must
+# resolve each one through the named index. The migrations below create the
+# indexes; this list only describes the current schema.
+INDEX_PROBES = [
+    ('idx_check_ins_status',
+     "SELECT id FROM check_ins WHERE status = 'checked_out'"),
+    ('idx_check_ins_room_id',
+     'SELECT id FROM check_ins WHERE room_id = 1'),
+    ('idx_check_ins_guest_id',
+     'SELECT id FROM check_ins WHERE guest_id = 1'),
+    ('idx_check_ins_checkin_date',
+     'SELECT * FROM check_ins ORDER BY checkin_date DESC'),
+    ('idx_check_ins_arrival_date',
+     "SELECT COUNT(*) FROM check_ins WHERE arrival_date = '2025-01-01'"),
+    ('idx_check_ins_departure_date',
+     "SELECT COUNT(*) FROM check_ins WHERE departure_date = '2025-01-01'"),
+    ('idx_check_ins_actual_departure',
+     "SELECT COUNT(*) FROM check_ins WHERE actual_departure >= '2025-01-01'"),
+    ('idx_booking_services_booking_id',
+     'SELECT * FROM booking_services WHERE booking_id = 1'),
+    ('idx_booking_services_guest_id',
+     'SELECT SUM(total_charge) FROM booking_services WHERE guest_id = 1 AND is_paid = 0'),
+    ('idx_booking_services_charge_date',
+     "SELECT SUM(total_charge) FROM booking_services WHERE charge_date >= '2025-01-01'"),
+    ('idx_company_charges_company_paid',
+     'SELECT COUNT(*), MIN(charge_date) FROM company_charges WHERE company_id = 1 AND is_paid = 0'),
+    ('idx_company_charges_is_paid',
+     'SELECT * FROM company_charges WHERE is_paid = 0 ORDER BY charge_date DESC'),
+    ('idx_reservations_arrival_date',
+     "SELECT * FROM reservations WHERE arrival_date >= '2025-01-01'"),
+    ('idx_reservations_created_on',
+     'SELECT * FROM reservations ORDER BY created_on DESC'),
+    ('idx_reservation_cancellations_date',
+     "SELECT COUNT(*) FROM reservation_cancellations WHERE cancellation_date >= '2025-01-01'"),
+    ('idx_invoices_date_generated',
+     'SELECT * FROM invoices ORDER BY date_generated DESC, id DESC LIMIT 100'),
+    ('idx_guests_name',
+     "SELECT id FROM guests WHERE first_name = 'A' AND last_name = 'B'"),
+]
+
+
+def explain_indexes(probes=INDEX_PROBES):
+    """Run each probe through EXPLAIN QUERY PLAN.
+
+    Returns a list of (index name, used, plan text) tuples.
+    """
+    results = []
+    with db_manager.cursor() as c:
+        for name, probe in probes:
+            c.execute(f'EXPLAIN QUERY PLAN {probe}')
+            plan = ' | '.join(row[-1] for row in c.fetchall())
+            results.append((name, name in plan, plan))
+    return results
+
+
+BOOKING_SERVICES_COLUMNS = [
+    'id', 'booking_id', 'guest_id', 'service_id', 'quantity', 'unit_price_at_time_of_charge',
+    'total_charge', 'charge_date', 'charged_by_user_id', 'notes', 'is_paid', 'amount_paid',
+    'remaining_amount', 'payment_date',
+]
+
+
+@migration(1, "Allow NULL booking_id in booking_services")
+def _nullable_booking_id(c):
+    # Replaces scripts/allow_null_booking_id.py; databases created by the
+    # current init_db() already have the nullable columns.
+    columns = table_columns(c, 'booking_services')
+    if not columns['booking_id'][3]:
+        return
+    rebuild_table(c, 'booking_services', '''
+        CREATE TABLE booking_services_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER,
+            guest_id INTEGER,
+            service_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            unit_price_at_time_of_charge REAL NOT NULL,
+            total_charge REAL NOT NULL,
+            charge_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            charged_by_user_id INTEGER,
+            notes TEXT,
+            is_paid INTEGER DEFAULT 0,
+            amount_paid REAL DEFAULT 0,
+            remaining_amount REAL DEFAULT 0,
+            payment_date TEXT,
+            FOREIGN KEY (booking_id) REFERENCES check_ins (id),
+            FOREIGN KEY (service_id) REFERENCES services (id),
+            FOREIGN KEY (charged_by_user_id) REFERENCES users (id)
+        )
+    ''', [name for name in BOOKING_SERVICES_COLUMNS if name in columns])
+
+
+@migration(2, "Index pack for hot lookup columns")
+def _create_lookup_indexes(c):
+    for sql in (
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_status ON check_ins (status)',
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_room_id ON check_ins (room_id)',
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_guest_id ON check_ins (guest_id)',
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_checkin_date ON check_ins (checkin_date)',
+        'CREATE INDEX IF NOT EXISTS idx_booking_services_booking_id ON booking_services (booking_id)',
+        'CREATE INDEX IF NOT EXISTS idx_booking_services_guest_id ON booking_services (guest_id, is_paid)',
+        'CREATE INDEX IF NOT EXISTS idx_company_charges_company_paid ON company_charges (company_id, is_paid)',
+        'CREATE INDEX IF NOT EXISTS idx_company_charges_is_paid ON company_charges (is_paid, charge_date)',
+        'CREATE INDEX IF NOT EXISTS idx_reservations_arrival_date ON reservations (arrival_date)',
+        'CREATE INDEX IF NOT EXISTS idx_reservations_created_on ON reservations (created_on)',
+        'CREATE INDEX IF NOT EXISTS idx_guests_name ON guests (last_name, first_name)',
+    ):
+        c.execute(sql)
+
+
+@migration(3, "Index check-in arrival and departure dates for the dashboard")
+def _create_stay_date_indexes(c):
+    for sql in (
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_arrival_date ON check_ins (arrival_date)',
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_departure_date ON check_ins (departure_date)',
+    ):
+        c.execute(sql)
+
+
+@migration(4, "Index invoices by date for the paged history list")
+def _create_invoice_date_index(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_invoices_date_generated ON invoices (date_generated)')
+
+
+# Full-text search. One FTS5 table covers every searchable entity; its rowid
+# packs the entity id and kind (id * 4 + kind code) so the sync triggers
+# replace a row by rowid instead of scanning the index. Each source lists
+# the columns that feed the index and the name/extra expressions, written
+# against a {r} row alias (new/old inside triggers, the table otherwise).
+SEARCH_KINDS = {'guest': 0, 'reservation': 1, 'invoice': 2, 'company': 3}
+
+SEARCH_SOURCES = {
+    'guest': ('guests', 'first_name, last_name, id_number, phone_code, phone_number, email',
+              "{r}.first_name || ' ' || {r}.last_name",
+              "IFNULL({r}.id_number, '') || ' ' || IFNULL({r}.phone_code, '') || ' ' || "
+              "IFNULL({r}.phone_number, '') || ' ' || IFNULL({r}.email, '')"),
+    'reservation': ('reservations', 'reservation_id, guest_first_name, guest_last_name',
+                    "{r}.guest_first_name || ' ' || {r}.guest_last_name",
+                    "{r}.reservation_id"),
+    'invoice': ('invoices', 'invoice_number, customer_name',
+                "{r}.customer_name",
+                "{r}.invoice_number"),
+    'company': ('company_accounts', 'name, email, phone, tax_id',
+                "{r}.name",
+                "IFNULL({r}.email, '') || ' ' || IFNULL({r}.phone, '') || ' ' || IFNULL({r}.tax_id, '')"),
+}
+
+
+def _search_index_insert(kind, r):
+    _table, _columns, name, extra = SEARCH_SOURCES[kind]
+    return (f'INSERT INTO search_index (rowid, name, extra) '
+            f'VALUES ({r}.id * 4 + {SEARCH_KINDS[kind]}, {name.format(r=r)}, {extra.format(r=r)});')
+
+
+@migration(5, "FTS5 search index over guests, reservations, invoices and companies")
+def _create_search_index(c):
+    c.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            name, extra, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    ''')
+    for kind, (table, columns, name, extra) in SEARCH_SOURCES.items():
+        code = SEARCH_KINDS[kind]
+        delete_old = f'DELETE FROM search_index WHERE rowid = old.id * 4 + {code};'
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN
+                {_search_index_insert(kind, 'new')}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF id, {columns} ON {table} BEGIN
+                {delete_old}
+                {_search_index_insert(kind, 'new')}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN
+                {delete_old}
+            END
+        ''')
+        c.execute(f'INSERT INTO search_index (rowid, name, extra) '
+                  f'SELECT id * 4 + {code}, {name.format(r=table)}, {extra.format(r=table)} FROM {table}')
+
+
+# Date columns and the canonical form each one is normalized to
+DATE_COLUMNS = [
+    ('check_ins', 'arrival_date', 'date'),
+    ('check_ins', 'departure_date', 'date'),
+    ('check_ins', 'actual_departure', 'date'),
+    ('reservations', 'arrival_date', 'date'),
+    ('check_ins', 'checkin_date', 'datetime'),
+    ('reservations', 'created_on', 'datetime'),
+    ('reservation_cancellations', 'cancellation_date', 'datetime'),
+]
+
+
+@migration(6, "Normalize stored dates to ISO 'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS'")
+def _normalize_dates(c):
+    # Values SQLite cannot parse are left as they are
+    for table, column, func in DATE_COLUMNS:
+        if column not in table_columns(c, table):
+            continue
+        c.execute(f'''
+            UPDATE {table} SET {column} = {func}({column})
+            WHERE {func}({column}) IS NOT NULL AND {column} != {func}({column})
+        ''')
+
+
+# Change tracking for terminals sharing one database file. Every write to a
+# tracked table appends (table_name, row_id, op) to change_log; seq orders
+# the entries across all terminals. See app/core/change_tracker.py.
+CHANGE_TRACKED_TABLES = [
+    'guests', 'rooms', 'check_ins', 'reservations', 'reservation_cancellations',
+    'booking_services', 'company_accounts', 'company_charges', 'invoices',
+    'services', 'room_rates', 'tax_rates', 'hotel_settings',
+]
+
+
+@migration(7, "change_log table fed by triggers on the tracked tables")
+def _create_change_log(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D'))
+        )
+    ''')
+    for table in CHANGE_TRACKED_TABLES:
+        for suffix, event, op, row in (('ai', 'INSERT', 'I', 'new'), ('au', 'UPDATE', 'U', 'new'),
+                                       ('ad', 'DELETE', 'D', 'old')):
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_changes_{suffix} AFTER {event} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.rowid, '{op}');
+                END
+            ''')
+
+
+# Money columns, stored as integer centimes and declared MONEY so they are
+# read back as app.core.money.Money values
+MONEY_COLUMNS = {
+    'check_ins': ['total_paid', 'amount_due'],
+    'room_rates': ['night_rate'],
+    'services': ['default_price'],
+    'booking_services': ['unit_price_at_time_of_charge', 'total_charge', 'amount_paid', 'remaining_amount'],
+    'tax_rates': ['amount'],
+    'reservations': ['deposit_amount', 'amount_due'],
+    'reservation_cancellations': ['refund_amount'],
+    'invoices': ['subtotal', 'tax_amount', 'total_amount', 'amount_paid', 'balance_due'],
+    'company_accounts': ['credit_limit'],
+    'company_charges': ['room_charges', 'service_charges', 'total_amount'],
+}
+
+
+@migration(8, "Store money as integer centimes in MONEY columns")
+def _money_to_centimes(c):
+    for table, money_columns in MONEY_COLUMNS.items():
+        columns = table_columns(c, table)
+        pending = [name for name in money_columns if name in columns and columns[name][2].upper() != 'MONEY']
+        if not pending:
+            continue
+        create_sql = _new_table_sql(c, table)
+        for name in pending:
+            create_sql = re.sub(rf'\b({name}\s+)(REAL|DECIMAL\s*\(\s*\d+\s*,\s*\d+\s*\)|\w+)',
+                                r'\1MONEY', create_sql, count=1)
+        rebuild_table(c, table, create_sql, list(columns),
+                      {name: f'CAST(ROUND({name} * 100) AS INTEGER)' for name in pending})
+
+
+# Invoice line items, one row per line instead of the JSON array the
+# invoices.items column used to hold. description is NOCASE so grouping and
+# prefix searches (LIKE 'abc%') ignore case and can use the index.
+@migration(9, "Move invoices.items JSON into an indexed invoice_lines table")
+def _create_invoice_lines(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS invoice_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL REFERENCES invoices (id) ON DELETE CASCADE,
+            line_no INTEGER NOT NULL,
+            description TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+            quantity REAL NOT NULL DEFAULT 1,
+            unit_price MONEY NOT NULL DEFAULT 0,
+            line_total MONEY NOT NULL DEFAULT 0,
+            UNIQUE (invoice_id, line_no)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_invoice_lines_description ON invoice_lines (description)')
+
+    columns = table_columns(c, 'invoices')
+    if 'items' not in columns:
+        return
+    # Amounts in the JSON are dirhams; line_total is recomputed when missing
+    c.execute('''
+        INSERT INTO invoice_lines (invoice_id, line_no, description, quantity, unit_price, line_total)
+        SELECT i.id, item.key + 1,
+               IFNULL(json_extract(item.value, '$.description'), ''),
+               IFNULL(json_extract(item.value, '$.quantity'), 1),
+               CAST(ROUND(IFNULL(json_extract(item.value, '$.unit_price'), 0) * 100) AS INTEGER),
+               CAST(ROUND(IFNULL(json_extract(item.value, '$.line_total'),
+                                 IFNULL(json_extract(item.value, '$.quantity'), 1)
+                                 * IFNULL(json_extract(item.value, '$.unit_price'), 0)) * 100) AS INTEGER)
+        FROM invoices i, json_each(i.items) item
+        WHERE json_valid(i.items) AND json_type(i.items) = 'array'
+    ''')
+    create_sql = re.sub(r'\s*\bitems\s+TEXT[^,]*,[^\n]*', '', _new_table_sql(c, 'invoices'), count=1)
+    rebuild_table(c, 'invoices', create_sql, [name for name in columns if name != 'items'])
+
+
+# Per day and room type statistics, kept up to date by the db.py writers
+# and filled from the whole history by rebuild_daily_stats() (see db.py).
+# The indexes let a refresh find the stays, charges and cancellations of a
+# date range without scanning the history.
+@migration(10, "daily_stats table and the date indexes that maintain it")
+def _create_daily_stats(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            stat_date TEXT NOT NULL,
+            room_type TEXT NOT NULL DEFAULT '',
+            rooms_sold INTEGER NOT NULL DEFAULT 0,
+            rooms_available INTEGER NOT NULL DEFAULT 0,
+            room_revenue MONEY NOT NULL DEFAULT 0,
+            service_revenue MONEY NOT NULL DEFAULT 0,
+            arrivals INTEGER NOT NULL DEFAULT 0,
+            departures INTEGER NOT NULL DEFAULT 0,
+            cancellations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stat_date, room_type)
+        ) WITHOUT ROWID
+    ''')
+    for sql in (
+        'CREATE INDEX IF NOT EXISTS idx_check_ins_actual_departure ON check_ins (actual_departure)',
+        'CREATE INDEX IF NOT EXISTS idx_booking_services_charge_date ON booking_services (charge_date)',
+        'CREATE INDEX IF NOT EXISTS idx_reservation_cancellations_date '
+        'ON reservation_cancellations (cancellation_date)',
+    ):
+        c.execute(sql)
+
+
+# Room nights: one row per room and night held by a reservation or an open
+# check-in. The primary key makes a second booking of the same room and
+# night impossible, and availability questions become index range probes.
+# db.py keeps the rows in step with reservations and check-ins; a
+# reservation without a departure date holds its arrival night only.
+@migration(11, "reservations.departure_date and the room_nights occupancy index")
+def _create_room_nights(c):
+    if 'departure_date' not in table_columns(c, 'reservations'):
+        c.execute('ALTER TABLE reservations ADD COLUMN departure_date TEXT')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS room_nights (
+            room_id INTEGER NOT NULL REFERENCES rooms (id),
+            night TEXT NOT NULL,
+            reservation_id INTEGER REFERENCES reservations (id) ON DELETE CASCADE,
+            checkin_id INTEGER REFERENCES check_ins (id) ON DELETE CASCADE,
+            CHECK ((reservation_id IS NULL) != (checkin_id IS NULL)),
+            PRIMARY KEY (room_id, night)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_room_nights_night ON room_nights (night)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_room_nights_reservation_id ON room_nights (reservation_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_room_nights_checkin_id ON room_nights (checkin_id)')
+
+    # Guests already in their rooms go first; where older bookings overlap,
+    # the earlier one keeps the night and the conflict is logged
+    c.execute('''
+        WITH RECURSIVE stays(room_id, night, departure, reservation_id, checkin_id, priority, id) AS (
+            SELECT room_id, arrival_date, IFNULL(actual_departure, departure_date), NULL, id, 0, id
+            FROM check_ins
+            WHERE room_id IS NOT NULL AND IFNULL(status, '') != 'checked_out'
+            UNION ALL
+            SELECT room_id, arrival_date, departure_date, id, NULL, 1, id
+            FROM reservations
+            WHERE room_id IS NOT NULL AND IFNULL(status, '') NOT IN ('Cancelled', 'Checked-in')
+            UNION ALL
+            SELECT room_id, date(night, '+1 day'), departure, reservation_id, checkin_id, priority, id
+            FROM stays WHERE date(night, '+1 day') < departure
+        )
+        INSERT OR IGNORE INTO room_nights (room_id, night, reservation_id, checkin_id)
+        SELECT room_id, night, reservation_id, checkin_id FROM stays
+        WHERE night IS NOT NULL
+        ORDER BY priority, id, night
+    ''')
+    c.execute('''
+        SELECT COUNT(*) FROM check_ins c
+        WHERE c.room_id IS NOT NULL AND IFNULL(c.status, '') != 'checked_out'
+          AND (SELECT COUNT(*) FROM room_nights WHERE checkin_id = c.id)
+              < MAX(IFNULL(julianday(IFNULL(c.actual_departure, c.departure_date)) - julianday(c.arrival_date), 1), 1)
+    ''')
+    short = c.fetchone()[0]
+    c.execute('''
+        SELECT COUNT(*) FROM reservations r
+        WHERE r.room_id IS NOT NULL AND IFNULL(r.status, '') NOT IN ('Cancelled', 'Checked-in')
+          AND (SELECT COUNT(*) FROM room_nights WHERE reservation_id = r.id)
+              < MAX(IFNULL(julianday(r.departure_date) - julianday(r.arrival_date), 1), 1)
+    ''')
+    short += c.fetchone()[0]
+    if short:
+        logger.warning(f"{short} overlapping check-in(s) or reservation(s) could not hold all their room nights")
+
+
+# Company balances: open_balance holds the sum of each company's unpaid
+# charges and db.py moves it with every charge added or settled, so reading
+# a balance no longer sums company_charges. The company index gains
+# charge_date, which makes the unpaid count and oldest unpaid date of
+# get_company_accounts_with_balances index-only.
+@migration(12, "company_accounts.open_balance and charge_date in the company charges index")
+def _company_open_balance(c):
+    if 'open_balance' not in table_columns(c, 'company_accounts'):
+        c.execute('ALTER TABLE company_accounts ADD COLUMN open_balance MONEY NOT NULL DEFAULT 0')
+    c.execute('''
+        UPDATE company_accounts
+        SET open_balance = (SELECT IFNULL(SUM(total_amount), 0) FROM company_charges
+                            WHERE company_id = company_accounts.id AND is_paid = 0)
+    ''')
+    c.execute('DROP INDEX IF EXISTS idx_company_charges_company_paid')
+    c.execute('CREATE INDEX idx_company_charges_company_paid ON company_charges (company_id, is_paid, charge_date)')
@@ -0,0 +1,166 @@
+import sqlite3
+from decimal import Decimal, ROUND_HALF_UP
+from functools import total_ordering
+
+CENT = Decimal('0.01')
+
+
+def _cents(value):
+    """Convert an amount in dirhams (int, float, str, Decimal or Money) to whole centimes"""
+    if isinstance(value, Money):
+        return value.cents
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        # repr() is the shortest string that round-trips, so 0.285 stays 0.285
+        value = repr(value)
+    elif isinstance(value, str):
+        value = value.replace('MAD', '').replace(' ', '').replace(',', '.').strip() or '0'
+    return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@total_ordering
+class Money:
+    """An amount of money held as integer centimes.
+
+    Sums and comparisons are plain integer operations. Multiplying or
+    dividing by a number (a quantity, a rate) rounds half-up to the centime
+    once, at the end. str() gives '1234.50' and format specs such as
+    ':.2f' or ',.2f' work as for numbers, so amounts read from the database
+    can be printed, summed and compared the way the old floats were.
+    """
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = int(cents)
+
+    @classmethod
+    def of(cls, value):
+        """Money from an amount in dirhams; None stays None"""
+        if value is None or isinstance(value, Money):
+            return value
+        return cls(_cents(value))
+
+    def to_decimal(self):
+        return Decimal(self.cents).scaleb(-2)
+
+    def _scale(self, factor):
+        if isinstance(factor, float):
+            factor = Decimal(repr(factor))
+        elif not isinstance(factor, Decimal):
+            factor = Decimal(factor)
+        return Money(int((self.cents * factor).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    def percent(self, rate):
+        """rate percent of this amount (rate may be a float), rounded once"""
+        if isinstance(rate, float):
+            rate = repr(rate)
+        return self._scale(Decimal(rate) / 100)
+
+    def __add__(self, other):
+        try:
+            return Money(self.cents + _cents(other))
+        except (TypeError, ArithmeticError, ValueError):
+            return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        try:
+            return Money(self.cents - _cents(other))
+        except (TypeError, ArithmeticError, ValueError):
+            return NotImplemented
+
+    def __rsub__(self, other):
+        try:
+            return Money(_cents(other) - self.cents)
+        except (TypeError, ArithmeticError, ValueError):
+            return NotImplemented
+
+    def __mul__(self, factor):
+        if isinstance(factor, Money):
+            return NotImplemented
+        if isinstance(factor, int):
+            return Money(self.cents * factor)
+        return self._scale(factor)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, divisor):
+        if isinstance(divisor, Money):
+            # Ratio of two amounts, e.g. the paid fraction of a bill
+            return self.cents / divisor.cents
+        if isinstance(divisor, float):
+            divisor = Decimal(repr(divisor))
+        return self._scale(1 / Decimal(divisor))
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __abs__(self):
+        return Money(abs(self.cents))
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def _comparable(self, other):
+        # A float compares by its shortest repr, so Money('0.05') == 0.05
+        if isinstance(other, float):
+            return Decimal(repr(other))
+        if isinstance(other, (int, Decimal)) and not isinstance(other, bool):
+            return other
+        return None
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        other = self._comparable(other)
+        return NotImplemented if other is None else self.to_decimal() == other
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        other = self._comparable(other)
+        return NotImplemented if other is None else self.to_decimal() < other
+
+    def __hash__(self):
+        return hash(self.to_decimal())
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __round__(self, ndigits=None):
+        return round(self.to_decimal(), ndigits)
+
+    def __str__(self):
+        return str(self.to_decimal().quantize(CENT))
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        return format(self.to_decimal(), spec) if spec else str(self)
+
+
+def to_cents(value):
+    """Integer centimes for storing an amount; None stays None"""
+    return None if value is None else _cents(value)
+
+
+def _from_column(raw):
+    try:
+        return Money(int(raw))
+    except ValueError:
+        # A fractional value bound without going through to_cents()
+        return Money(round(float(raw)))
+
+
+# Money binds as its centimes, and columns declared MONEY (or selected
+# AS "name [MONEY]") come back as Money on connections opened with
+# detect_types (see connection.py). Dates are kept as ISO text (see db.py),
+# so the stock DATE / TIMESTAMP converters, which detect_types would also
+# apply, are removed.
+sqlite3.register_adapter(Money, lambda money: money.cents)
+sqlite3.register_converter('MONEY', _from_column)
+for _name in ('DATE', 'TIMESTAMP'):
+    sqlite3.converters.pop(_name, None)
@@ -0,0 +1,256 @@
+from app.core.archive import history_view
+from app.core.connection import db_manager
+from app.core.db import (
+    cursor, day_range, get_all_guests, get_daily_stats, get_filtered_checkins, get_filtered_reservations,
+    iter_filtered_checkins, iter_filtered_reservations, iter_guests
+)
+from app.core.instrumentation import instrument_module
+from app.core.rows import fetch_all, iter_records
+
+# Report queries. Each report is one statement over the all_* history views
+# (live and archived rows): service charges are joined to their stays and
+# summed with GROUP BY instead of being fetched stay by stay. Charges are
+# gathered in a subquery joining the stays of the period to their charges,
+# which SQLite resolves per archive branch through the booking_id indexes.
+
+# Service charges of the stays arriving in [:from_date, :to_date), optionally
+# for one room type
+_PERIOD_CHARGES_SQL = f'''
+    SELECT bs.booking_id, bs.service_id, bs.quantity, bs.total_charge
+    FROM {history_view('check_ins')} s
+    JOIN {history_view('booking_services')} bs ON bs.booking_id = s.id
+    LEFT JOIN rooms sr ON sr.id = s.room_id
+    WHERE s.arrival_date >= :from_date AND s.arrival_date < :to_date
+      AND (:room_type IS NULL OR LOWER(sr.type) = :room_type)
+'''
+
+REVENUE_BY_STAY_SQL = f'''
+    SELECT c.checkin_id, g.first_name || ' ' || g.last_name AS guest_name, r.type AS room_type,
+           c.arrival_date, c.departure_date, c.total_paid,
+           IFNULL(SUM(bs.total_charge), 0) AS "services_revenue [MONEY]"
+    FROM {history_view('check_ins')} c
+    LEFT JOIN guests g ON g.id = c.guest_id
+    LEFT JOIN rooms r ON r.id = c.room_id
+    LEFT JOIN ({_PERIOD_CHARGES_SQL}) bs ON bs.booking_id = c.id
+    WHERE c.arrival_date >= :from_date AND c.arrival_date < :to_date
+      AND (:room_type IS NULL OR LOWER(r.type) = :room_type)
+    GROUP BY c.id
+    ORDER BY c.arrival_date DESC
+'''
+
+SERVICE_USAGE_SQL = f'''
+    SELECT sv.id, sv.name, sv.default_price, sv.unit,
+           COUNT(bs.booking_id) AS charges,
+           IFNULL(SUM(bs.quantity), 0) AS total_usage,
+           IFNULL(SUM(bs.total_charge), 0) AS "total_revenue [MONEY]"
+    FROM services sv
+    LEFT JOIN ({_PERIOD_CHARGES_SQL}) bs ON bs.service_id = sv.id
+    GROUP BY sv.id
+    ORDER BY sv.id
+'''
+
+# Stays checked out in the period, by the day they actually left
+CHECKOUTS_SQL = f'''
+    SELECT c.checkin_id, g.first_name || ' ' || g.last_name AS guest_name,
+           g.id_number, r.number AS room_number, c.arrival_date, c.departure_date,
+           c.actual_departure, c.status
+    FROM {history_view('check_ins')} c
+    LEFT JOIN guests g ON g.id = c.guest_id
+    LEFT JOIN rooms r ON r.id = c.room_id
+    WHERE c.actual_departure >= :from_date AND c.actual_departure < :to_date
+      AND c.status = 'checked_out'
+      AND (:room_type IS NULL OR LOWER(r.type) = :room_type)
+    ORDER BY c.actual_departure DESC
+'''
+
+
+def _params(from_date, to_date, room_type=None):
+    from_date, to_date = day_range(from_date, to_date)
+    return {
+        'from_date': from_date,
+        'to_date': to_date,
+        'room_type': room_type.lower() if room_type and room_type != "All" else None,
+    }
+
+
+def _iter(sql, params):
+    with cursor() as c:
+        c.execute(sql, params)
+        yield from iter_records(c, db_manager.get_fetch_size())
+
+
+def revenue_by_stay(from_date, to_date, room_type=None):
+    """Stays arriving in the period with their room revenue (total_paid) and
+    the sum of their service charges (services_revenue)"""
+    with cursor() as c:
+        c.execute(REVENUE_BY_STAY_SQL, _params(from_date, to_date, room_type))
+        return fetch_all(c)
+
+
+def iter_revenue_by_stay(from_date, to_date, room_type=None):
+    """Stream the rows of revenue_by_stay"""
+    yield from _iter(REVENUE_BY_STAY_SQL, _params(from_date, to_date, room_type))
+
+
+def service_usage(from_date, to_date, room_type=None):
+    """Every service with the number of charges, quantity (total_usage) and
+    revenue (total_revenue) booked on the stays arriving in the period"""
+    with cursor() as c:
+        c.execute(SERVICE_USAGE_SQL, _params(from_date, to_date, room_type))
+        return fetch_all(c)
+
+
+def checkins_list(from_date, to_date, room_type=None, status=None):
+    """Stays arriving in the period"""
+    return get_filtered_checkins(from_date, to_date, room_type, status)
+
+
+def checkouts_list(from_date, to_date, room_type=None):
+    """Stays checked out in the period"""
+    with cursor() as c:
+        c.execute(CHECKOUTS_SQL, _params(from_date, to_date, room_type))
+        return fetch_all(c)
+
+
+def iter_checkouts_list(from_date, to_date, room_type=None):
+    """Stream the rows of checkouts_list"""
+    yield from _iter(CHECKOUTS_SQL, _params(from_date, to_date, room_type))
+
+
+# Cell text helpers for the report columns; each returns row -> str
+def _text(key):
+    return lambda row: str(row.get(key) if row.get(key) is not None else "")
+
+
+def _money(key):
+    return lambda row: f"${row.get(key) or 0:.2f}"
+
+
+def _name(first_key, last_key):
+    return lambda row: f"{row.get(first_key) or ''} {row.get(last_key) or ''}".strip()
+
+
+class Report:
+    """A report type: its query, the columns shown for its rows and the
+    statuses its Status filter offers (none when the filter does not apply).
+
+    query is called as query(from_date, to_date, room_type, status) and
+    columns is a list of (header, cell) where cell(row) gives the cell text.
+    stream takes the same arguments and yields the rows instead, for
+    exports; reports without one (a row per day or per service) stream
+    the list query returns.
+    """
+    __slots__ = ('name', 'query', 'columns', 'statuses', 'stream')
+
+    def __init__(self, name, query, columns, statuses=(), stream=None):
+        self.name = name
+        self.query = query
+        self.columns = columns
+        self.statuses = list(statuses)
+        self.stream = stream
+
+    @property
+    def headers(self):
+        return [header for header, _cell in self.columns]
+
+    def cells(self, row):
+        """The text of every column for one row"""
+        return [cell(row) for _header, cell in self.columns]
+
+
+_CHECKIN_COLUMNS = [
+    ("Check-in ID", _text('checkin_id')),
+    ("Guest Name", _text('guest_name')),
+    ("ID/Passport", _text('id_number')),
+    ("Room", _text('room_number')),
+    ("Arrival", _text('arrival_date')),
+    ("Departure", _text('departure_date')),
+    ("Status", _text('status')),
+]
+
+REPORTS = {report.name: report for report in [
+    Report("Reservations",
+           lambda from_date, to_date, room_type, status:
+               get_filtered_reservations(from_date, to_date, room_type, status),
+           [("Reservation ID", _text('reservation_id')),
+            ("Guest Name", _name('guest_first_name', 'guest_last_name')),
+            ("Room Type", _text('room_type')),
+            ("Arrival", _text('arrival_date')),
+            ("Guests", _text('num_guests')),
+            ("Deposit", _money('deposit_amount')),
+            ("Status", _text('status')),
+            ("Created On", _text('created_on'))],
+           statuses=["All", "Confirmed", "Pending", "Cancelled"],
+           stream=lambda from_date, to_date, room_type, status:
+               iter_filtered_reservations(from_date, to_date, room_type, status)),
+    Report("Check-ins",
+           lambda from_date, to_date, room_type, status: checkins_list(from_date, to_date, room_type, status),
+           _CHECKIN_COLUMNS,
+           statuses=["All", "Checked-in", "Cancelled"],
+           stream=lambda from_date, to_date, room_type, status:
+               iter_filtered_checkins(from_date, to_date, room_type, status)),
+    Report("Check-outs",
+           lambda from_date, to_date, room_type, status: checkouts_list(from_date, to_date, room_type),
+           _CHECKIN_COLUMNS[:5] + [("Departure", _text('actual_departure')), ("Status", _text('status'))],
+           stream=lambda from_date, to_date, room_type, status: iter_checkouts_list(from_date, to_date, room_type)),
+    Report("Guests",
+           lambda from_date, to_date, room_type, status: get_all_guests(),
+           [("ID", _text('id')),
+            ("Name", _name('first_name', 'last_name')),
+            ("ID Type", _text('id_type')),
+            ("ID Number", _text('id_number')),
+            ("Phone", _name('phone_code', 'phone_number')),
+            ("Email", _text('email')),
+            ("Nationality", _text('nationality')),
+            ("VIP Status", _text('vip_status'))],
+           stream=lambda from_date, to_date, room_type, status: iter_guests()),
+    Report("Revenue",
+           lambda from_date, to_date, room_type, status: revenue_by_stay(from_date, to_date, room_type),
+           [("Booking ID", _text('checkin_id')),
+            ("Guest Name", _text('guest_name')),
+            ("Room Type", _text('room_type')),
+            ("Check-in Date", _text('arrival_date')),
+            ("Check-out Date", _text('departure_date')),
+            ("Room Revenue", _money('total_paid')),
+            ("Services Revenue", _money('services_revenue'))],
+           stream=lambda from_date, to_date, room_type, status: iter_revenue_by_stay(from_date, to_date, room_type)),
+    Report("Daily Revenue",
+           # One row per day from daily_stats, however many stays it covers
+           lambda from_date, to_date, room_type, status: get_daily_stats(from_date, to_date, room_type),
+           [("Date", _text('stat_date')),
+            ("Rooms Sold", _text('rooms_sold')),
+            ("Rooms Available", _text('rooms_available')),
+            ("Occupancy", lambda row: f"{row['occupancy']:.1f}%"),
+            ("ADR", _money('adr')),
+            ("Room Revenue", _money('room_revenue')),
+            ("Services Revenue", _money('service_revenue')),
+            ("Arrivals", _text('arrivals')),
+            ("Departures", _text('departures')),
+            ("Cancellations", _text('cancellations'))]),
+    Report("Services",
+           lambda from_date, to_date, room_type, status: service_usage(from_date, to_date, room_type),
+           [("Service ID", _text('id')),
+            ("Service Name", _text('name')),
+            ("Default Price", _money('default_price')),
+            ("Unit", _text('unit')),
+            ("Total Usage", _text('total_usage')),
+            ("Total Revenue", _money('total_revenue'))]),
+]}
+
+
+def run_report(report_type, from_date, to_date, room_type="All", status="All"):
+    """Rows of one report; runs on a db_executor thread"""
+    return REPORTS[report_type].query(from_date, to_date, room_type, status)
+
+
+def iter_report(report_type, from_date, to_date, room_type="All", status="All"):
+    """Stream the rows of one report, for exports"""
+    report = REPORTS[report_type]
+    if report.stream is None:
+        yield from report.query(from_date, to_date, room_type, status)
+    else:
+        yield from report.stream(from_date, to_date, room_type, status)
+
+
+# Latency statistics alongside the db.py functions (see instrumentation.py)
+instrument_module(globals())
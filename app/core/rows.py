@@ -0,0 +1,129 @@
+from collections.abc import MutableMapping
+from functools import lru_cache
+
+
+class Record(MutableMapping):
+    """Dict-style view over one result row.
+
+    A subclass is generated once per column set (see record_class), so every
+    row of a result shares the same name -> position index and only costs a
+    small slotted object wrapping the tuple sqlite3 already returned. Rows
+    stay mutable like the dicts they replace: assigned columns copy the
+    values on first write, and adding or deleting a key moves the row to
+    the class of its new column set, so a lookup is always one index probe.
+    """
+    __slots__ = ('_values',)
+    _columns = ()
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __setitem__(self, key, value):
+        values = self._values
+        if type(values) is tuple:
+            values = self._values = list(values)
+        i = self._index.get(key)
+        if i is None:
+            self.__class__ = record_class(self._columns + (key,))
+            values.append(value)
+        else:
+            values[i] = value
+
+    def __delitem__(self, key):
+        if key not in self._index:
+            raise KeyError(key)
+        keep = [i for i, name in enumerate(self._columns) if name != key]
+        self.__class__ = record_class(tuple(self._columns[i] for i in keep))
+        self._values = [self._values[i] for i in keep]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def copy(self):
+        return dict(self.items())
+
+    def frozen(self):
+        """A read-only row with the same columns and values"""
+        return record_class(self._columns, FrozenRecord)(tuple(self._values))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class FrozenRecord(Record):
+    """Read-only Record, safe to share between callers (see ReferenceCache).
+
+    copy() or dict(row) gives an editable dict.
+    """
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        raise TypeError(f"{type(self).__name__} is read-only; copy() it to make changes")
+
+    def __delitem__(self, key):
+        raise TypeError(f"{type(self).__name__} is read-only; copy() it to make changes")
+
+    def frozen(self):
+        return self
+
+
+@lru_cache(maxsize=512)
+def record_class(columns, base=Record):
+    """Return the subclass of base (Record or FrozenRecord) for a tuple of
+    column names.
+
+    Duplicate names resolve to the last occurrence, as dict(zip(...)) did.
+    """
+    index = {}
+    for i, name in enumerate(columns):
+        index[name] = i
+    return type(base.__name__, (base,), {'__slots__': (), '_columns': columns, '_index': index})
+
+
+def columns_of(cursor):
+    """Column names of the cursor's current result set"""
+    return tuple(desc[0] for desc in cursor.description)
+
+
+def fetch_all(cursor):
+    """Fetch every remaining row of the cursor as Record objects"""
+    return list(map(record_class(columns_of(cursor)), cursor.fetchall()))
+
+
+def fetch_one(cursor):
+    """Fetch the next row as a Record, or None when there is none"""
+    row = cursor.fetchone()
+    return record_class(columns_of(cursor))(row) if row is not None else None
+
+
+def iter_records(cursor, size):
+    """Yield the cursor's remaining rows as Record objects, fetching size rows
+    at a time so a large result never sits in memory whole"""
+    make = record_class(columns_of(cursor))
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from map(make, rows)
@@ -0,0 +1,51 @@
+import logging
+from typing import Dict, Optional
+from app.core.db import (
+    transaction, update_room_status, insert_checkin, update_checkin, check_in_reservation,
+    add_company_charge, get_unpaid_booking_charges, settle_booking_services
+)
+from app.core.money import Money
+
+logger = logging.getLogger(__name__)
+
+class CheckInService:
+    """Runs the check-in and check-out sequences as single transactions.
+
+    Each step reuses the regular db.py functions; they join the outer
+    transaction, so either every write lands with one commit or none does.
+    """
+
+    def perform_check_in(self, checkin: Dict, company_charge: Optional[Dict] = None,
+                         reservation_id: Optional[str] = None) -> str:
+        """Occupy the room, record the check-in and post the company charge.
+
+        reservation_id is the reservation the guest arrives on: it is marked
+        Checked-in and gives back its nights before the check-in takes them.
+        """
+        with transaction():
+            if reservation_id:
+                check_in_reservation(reservation_id)
+            if not update_room_status(checkin['room_id'], 'Occupied'):
+                raise ValueError(f"Room not found for ID: {checkin['room_id']}")
+            insert_checkin(checkin)
+            if company_charge:
+                add_company_charge(company_charge)
+        logger.info(f"Check-in {checkin['checkin_id']} completed for room {checkin['room_id']}")
+        return checkin['checkin_id']
+
+    def perform_check_out(self, checkin: Dict, room_status: str = 'Needs Cleaning') -> str:
+        """Release the room, close the check-in and settle its service folio.
+
+        final_payment covers the room and tax first and the unpaid services
+        last, so the services are only settled by what is left of it; any
+        shortfall stays on them as the remaining amount.
+        """
+        with transaction():
+            if not update_room_status(checkin['room_id'], room_status):
+                raise ValueError(f"Room not found for ID: {checkin['room_id']}")
+            update_checkin(checkin['checkin_id'], checkin)
+            unpaid = get_unpaid_booking_charges(checkin['id'])
+            shortfall = Money.of(checkin.get('total_charges') or 0) - Money.of(checkin.get('final_payment') or 0)
+            settle_booking_services(checkin['id'], unpaid - min(max(shortfall, Money(0)), unpaid))
+        logger.info(f"Check-out {checkin['checkin_id']} completed for room {checkin['room_id']}")
+        return checkin['checkin_id']
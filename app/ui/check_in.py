@@ -7,12 +7,16 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QDate, QSize, pyqtSignal, QMutex, QStringListModel, QFile
 from PyQt6.QtGui import QIcon, QPixmap, QFont, QColor, QPainter
 from app.core.db import (
-    get_all_guests, get_all_rooms, update_room, get_guest_id_by_name,
-    insert_checkin, get_all_checkins, update_checkin, get_booking_services,
-    get_total_booking_charges, get_room_rates, get_tax_rates,
-    get_company_account, add_company_charge, get_guest
+    get_all_guests, get_all_rooms, get_guest_id_by_name,
+    get_all_checkins, get_checkins_page, get_booking_services,
+    get_total_booking_charges, get_tax_rates,
+    get_company_account, get_guest, get_room, search_rows,
+    rate_for_room_type, room_by_id, free_rooms, find_arriving_reservation
 )
+from app.core.money import Money
+from app.services.checkin_service import CheckInService
 from app.ui.dialogs.add_extra_charge import AddExtraChargeDialog
+from app.ui.widgets.paged_table import TablePager, date_filter, date_filter_value
 import uuid
 from datetime import datetime
 import os
@@ -58,9 +62,11 @@ class CheckInWidget(QWidget):
         self.checkin_id = str(uuid.uuid4())[:8]  # Initialize check-in ID
         self.checkin_date = datetime.now().strftime('%Y-%m-%d %H:%M')
         self.selected_room_id = None  # Ensure this is always initialized
+        self.reservation = None  # Reservation the selected guest arrives on, if any
         self.current_checkout = None  # Added for checkout functionality
         self.room_mutex = QMutex()  # Mutex for thread-safe room selection
         self.payment_mutex = QMutex()  # Mutex for thread-safe payment processing
+        self.checkin_service = CheckInService()
         
         # Initialize guests_data to prevent reference errors
         self.guests_data = []
@@ -187,6 +193,7 @@ class CheckInWidget(QWidget):
             self.transaction_id = str(uuid.uuid4())[:8]  # reset each time
             self.checkin_id = str(uuid.uuid4())[:8]
             self.selected_room_id = None
+            self.reservation = None
             self.reload_guests_for_search()
             # Populate room types before loading room grid
             self.populate_room_types()
@@ -208,19 +215,16 @@ class CheckInWidget(QWidget):
         filter_layout.setSpacing(10)  # Add consistent spacing
         
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search by guest, check-in #, date...")
+        self.search_input.setPlaceholderText("Search by guest or check-in #...")
         self.search_input.textChanged.connect(self.filter_checkin_list)
         filter_layout.addWidget(self.search_input)
         
-        self.filter_arrival = QDateEdit()
-        self.filter_arrival.setCalendarPopup(True)
-        self.filter_arrival.setDisplayFormat("yyyy-MM-dd")
+        # Earliest arrival and latest departure, Any by default
+        self.filter_arrival = date_filter()
         self.filter_arrival.dateChanged.connect(self.filter_checkin_list)
         filter_layout.addWidget(self.filter_arrival)
         
-        self.filter_departure = QDateEdit()
-        self.filter_departure.setCalendarPopup(True)
-        self.filter_departure.setDisplayFormat("yyyy-MM-dd")
+        self.filter_departure = date_filter()
         self.filter_departure.dateChanged.connect(self.filter_checkin_list)
         filter_layout.addWidget(self.filter_departure)
         
@@ -247,6 +251,8 @@ class CheckInWidget(QWidget):
         self.checkin_table.setAlternatingRowColors(True)
         self.checkin_table.verticalHeader().setDefaultSectionSize(50)
         layout.addWidget(self.checkin_table)
+        self.checkin_pager = TablePager(self.checkin_table, get_checkins_page, self.add_checkin_row,
+                                        filters=self.checkin_filters)
 
     def populate_guest_combo(self):
         """Populate guest selection combo box"""
@@ -369,12 +375,19 @@ class CheckInWidget(QWidget):
         company_layout.addWidget(self.guest_company_label)
         company_layout.addStretch()
 
+        self.guest_reservation_label = QLabel()
+        reservation_layout = QHBoxLayout()
+        reservation_layout.addWidget(QLabel("Reservation:"))
+        reservation_layout.addWidget(self.guest_reservation_label)
+        reservation_layout.addStretch()
+
         # Add the horizontal layouts to the main layout
         s1_layout.addLayout(first_name_layout)
         s1_layout.addLayout(last_name_layout)
         s1_layout.addLayout(id_number_layout)
         s1_layout.addLayout(nationality_layout)
         s1_layout.addLayout(company_layout)
+        s1_layout.addLayout(reservation_layout)
         
         self.wizard.addWidget(step1)
 
@@ -970,33 +983,32 @@ class CheckInWidget(QWidget):
             return
 
         # Get room rate from database based on room type
-        rates = get_room_rates()
-        room_rate_value = next((r['night_rate'] for r in rates if r['room_type'] == checkin['room_type']), None)
+        room_rate_value = rate_for_room_type(checkin['room_type'])
         if room_rate_value is None:
             QMessageBox.warning(self, "Error", "Room rate not found for this room type.")
             return
-        room_rate = Decimal(str(room_rate_value)) # Convert to Decimal
+        room_rate = Money.of(room_rate_value)
 
         # Check if guest was marked for company billing during check-in
         guest_data = get_guest(checkin['guest_id'])
         is_company_billing = guest_data and guest_data.get('company_id') and checkin.get('bill_to_company', False)
         
         # Set room charges to 0 if company billing, otherwise calculate normally
-        room_charges = Decimal('0') if is_company_billing else Decimal(nights) * room_rate
+        room_charges = Money(0) if is_company_billing else room_rate * nights
         self.checkout_room_charges.setText(f"MAD {room_charges:.2f}")
         
         # Load extra charges
         self.charges_table.setRowCount(0)
         extra_charges = get_booking_services(checkin['id'])
-        total_extra_charges = Decimal('0') # Initialize as Decimal
+        total_extra_charges = Money(0)
         for charge in extra_charges:
             row = self.charges_table.rowCount()
             self.charges_table.insertRow(row)
             self.charges_table.setItem(row, 0, QTableWidgetItem(charge['service_name']))
             self.charges_table.setItem(row, 1, QTableWidgetItem(str(charge['quantity'])))
-            self.charges_table.setItem(row, 2, QTableWidgetItem(f"MAD {Decimal(str(charge['unit_price_at_time_of_charge'])):.2f}"))
-            self.charges_table.setItem(row, 3, QTableWidgetItem(f"MAD {Decimal(str(charge['total_charge'])):.2f}"))
-            total_extra_charges += Decimal(str(charge['total_charge'])) # Add as Decimal
+            self.charges_table.setItem(row, 2, QTableWidgetItem(f"MAD {charge['unit_price_at_time_of_charge']:.2f}"))
+            self.charges_table.setItem(row, 3, QTableWidgetItem(f"MAD {charge['total_charge']:.2f}"))
+            total_extra_charges += charge['total_charge']
         
         self.checkout_additional_charges.setText(f"MAD {total_extra_charges:.2f}")
         self.update_checkout_total()
@@ -1013,15 +1025,15 @@ class CheckInWidget(QWidget):
                                                        'checkout_tax_amount_display', 'checkout_total_amount']):
                 return
 
-            # Get base amounts as Decimal
-            room_charges = Decimal(self.checkout_room_charges.text().replace('MAD ', '').strip() or '0')
-            additional_charges = Decimal(self.checkout_additional_charges.text().replace('MAD ', '').strip() or '0')
+            # Get base amounts
+            room_charges = Money.of(self.checkout_room_charges.text())
+            additional_charges = Money.of(self.checkout_additional_charges.text())
             
             # Get selected tax data
             selected_tax = self.checkout_tax_select.currentData()
             
-            tax_amount = Decimal('0')
-            taxable_base = Decimal('0')
+            tax_amount = Money(0)
+            taxable_base = Money(0)
 
             if selected_tax:
                 # Determine taxable base
@@ -1031,10 +1043,9 @@ class CheckInWidget(QWidget):
                     taxable_base += additional_charges
 
                 if selected_tax['tax_type'] == 'percentage':
-                    percentage = Decimal(str(selected_tax.get('percentage', 0))) / Decimal('100')
-                    tax_amount = taxable_base * percentage
+                    tax_amount = taxable_base.percent(selected_tax.get('percentage') or 0)
                 elif selected_tax['tax_type'] == 'fixed':
-                    tax_amount = Decimal(str(selected_tax.get('amount', 0)))
+                    tax_amount = Money.of(selected_tax.get('amount') or 0)
             
             # Update tax display
             self.checkout_tax_amount_display.setText(f"{tax_amount:.2f}")
@@ -1062,9 +1073,9 @@ class CheckInWidget(QWidget):
     def update_checkout_amount_due(self):
         """Update amount due based on total and amount paid"""
         try:
-            total = Decimal(self.checkout_total_amount.text().replace('MAD ', '').strip() or '0')
-            paid = Decimal(self.checkout_amount_paid.text().strip() or '0')
-            due = max(total - paid, Decimal('0'))
+            total = Money.of(self.checkout_total_amount.text())
+            paid = Money.of(self.checkout_amount_paid.text())
+            due = max(total - paid, Money(0))
             self.checkout_amount_due.setText(f"MAD {due:.2f}")
         except Exception:
             self.checkout_amount_due.setText(self.checkout_total_amount.text())
@@ -1094,19 +1105,6 @@ class CheckInWidget(QWidget):
             return
             
         try:
-            # Update room status
-            rooms = get_all_rooms()
-            room_info = next((r for r in rooms if r['id'] == self.current_checkout['room_id']), None)
-            if room_info:
-                room_info = dict(room_info)
-                room_info['status'] = 'Needs Cleaning'  # Mark as needs cleaning after checkout
-                update_room(self.current_checkout['room_id'], room_info)
-                self.room_status_changed.emit()  # Emit signal for room status change
-            else:
-                logger.error(f"Room not found for ID: {self.current_checkout['room_id']}")
-                QMessageBox.warning(self, "Warning", "Room status could not be updated.")
-                return
-            
             # Update check-in status
             self.current_checkout['status'] = 'checked_out'
             self.current_checkout['actual_departure'] = self.checkout_actual_departure.date().toString('yyyy-MM-dd')
@@ -1114,7 +1112,15 @@ class CheckInWidget(QWidget):
             self.current_checkout['final_payment'] = float(self.checkout_amount_paid.text() or 0)
             self.current_checkout['payment_method'] = self.checkout_payment_method.currentText()
             
-            update_checkin(self.current_checkout['checkin_id'], self.current_checkout)
+            # Room status, check-in and folio are written in one transaction
+            # (the room is marked as needing cleaning after checkout)
+            try:
+                self.checkin_service.perform_check_out(self.current_checkout)
+            except ValueError as e:
+                logger.error(str(e))
+                QMessageBox.warning(self, "Warning", "Room status could not be updated.")
+                return
+            self.room_status_changed.emit()  # Emit signal for room status change
             
             # Generate checkout receipt
             pdf_path = self.generate_checkout_receipt()
@@ -1363,8 +1369,7 @@ class CheckInWidget(QWidget):
         departure = self.departure_date.selectedDate().toString('yyyy-MM-dd')
         num_guests = self.num_guests.text()
         room = self.selected_room_id
-        rooms = get_all_rooms()
-        room_info = next((r for r in rooms if r['id'] == room), {})
+        room_info = room_by_id(room) or {}
         room_number = room_info.get('number', '')
         room_type = room_info.get('type', '')
         total_paid = self.total_paid.text()
@@ -1441,17 +1446,10 @@ class CheckInWidget(QWidget):
                 guest_id = guest_data.get('id')
 
             # Calculate total amount
-            total_amount = Decimal(self.payment_amount.text().replace('MAD ', '').strip() or '0')
+            total_amount = Money.of(self.payment_amount.text())
             
-            # Update room status to occupied
-            rooms = get_all_rooms()
-            room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
-            if room_info:
-                room_info = dict(room_info)
-                room_info['status'] = 'Occupied'
-                update_room(self.selected_room_id, room_info)
-                self.room_status_changed.emit()  # Emit signal for room status change
-            else:
+            room_info = get_room(self.selected_room_id)
+            if not room_info:
                 logger.error(f"Room not found for ID: {self.selected_room_id}")
                 QMessageBox.warning(self, "Warning", "Room status could not be updated.")
                 return
@@ -1466,16 +1464,14 @@ class CheckInWidget(QWidget):
                 'arrival_date': self.arrival_date.selectedDate().toString('yyyy-MM-dd'),
                 'departure_date': self.departure_date.selectedDate().toString('yyyy-MM-dd'),
                 'num_guests': int(self.num_guests.text()),
-                'total_paid': float(self.total_paid.text().replace('MAD ', '').strip() or '0'),
-                'amount_due': float(self.amount_due.text().replace('MAD ', '').strip() or '0'),
+                'total_paid': Money.of(self.total_paid.text()),
+                'amount_due': Money.of(self.amount_due.text()),
                 'payment_method': self.payment_method.currentText(),
                 'status': self.payment_status_label.text()
             }
 
-            # Insert check-in record
-            insert_checkin(checkin_data)
-
             # If guest has company and company billing is selected, create company charge
+            company_charge = None
             if guest_data and guest_data.get('company_id') and self.bill_to_company.isChecked():
                 # Calculate room charges
                 arrival = self.arrival_date.selectedDate().toPyDate()
@@ -1483,24 +1479,26 @@ class CheckInWidget(QWidget):
                 nights = (departure - arrival).days
                 if nights < 0:
                     nights = 0
-                room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
-                room_rate = 0
-                if room_info:
-                    room_rates = get_room_rates()
-                    room_rate = next((rate['night_rate'] for rate in room_rates if rate['room_type'] == room_info['type']), 0)
-                room_charges = float(room_rate) * nights
+                room_rate = rate_for_room_type(room_info['type']) or Money(0)
+                room_charges = room_rate * nights
                 # If you have extra services, calculate service_charges here. For now, set to 0.
-                service_charges = 0.0
+                service_charges = Money(0)
                 company_charge = {
                     'company_id': guest_data['company_id'],
                     'checkin_id': checkin_data['checkin_id'],
                     'guest_id': guest_id,
                     'room_charges': room_charges,
                     'service_charges': service_charges,
-                    'total_amount': float(total_amount),
+                    'total_amount': total_amount,
                     'notes': f"Check-in {self.checkin_id} - {self.guest_first_name_label.text()} {self.guest_last_name_label.text()}"
                 }
-                add_company_charge(company_charge)
+
+            # Occupy the room, insert the check-in and post the company charge
+            # in a single transaction
+            self.checkin_service.perform_check_in(
+                checkin_data, company_charge,
+                reservation_id=self.reservation['reservation_id'] if self.reservation else None)
+            self.room_status_changed.emit()  # Emit signal for room status change
 
             # Show success message with details
             success_msg = f"""
@@ -1553,6 +1551,8 @@ class CheckInWidget(QWidget):
             
             # Reset room selection
             self.selected_room_id = None
+            self.reservation = None
+            self.guest_reservation_label.setText("")
             self.load_room_grid()
             
             # Reset payment fields
@@ -1572,45 +1572,21 @@ class CheckInWidget(QWidget):
             logger.error(traceback.format_exc())
             QMessageBox.critical(self, "Error", "Failed to reset form fields")
 
+    def checkin_filters(self):
+        """The search text and filters, as get_checkins_page arguments"""
+        room_type = self.filter_room_type.currentText()
+        return {
+            'search': self.search_input.text().strip() or None,
+            'arrival_from': date_filter_value(self.filter_arrival),
+            'departure_to': date_filter_value(self.filter_departure),
+            'room_type': None if room_type == "All Room Types" else room_type,
+        }
+
     def filter_checkin_list(self):
-        """Filter check-in list based on search criteria"""
+        """Reload the check-in list with the current search criteria; they are
+        applied by the page queries, so rows loaded later match them too"""
         try:
-            search_text = self.search_input.text().lower()
-            arrival_date = self.filter_arrival.date()
-            departure_date = self.filter_departure.date()
-            room_type = self.filter_room_type.currentText()
-            
-            for row in range(self.checkin_table.rowCount()):
-                show_row = True
-                
-                # Check search text against all columns
-                if search_text:
-                    text_match = False
-                    for col in range(self.checkin_table.columnCount() - 1):  # Exclude actions column
-                        item = self.checkin_table.item(row, col)
-                        if item and search_text in item.text().lower():
-                            text_match = True
-                            break
-                    show_row = show_row and text_match
-                
-                # Check date range
-                if show_row and (arrival_date.isValid() or departure_date.isValid()):
-                    checkin_arrival = QDate.fromString(self.checkin_table.item(row, 2).text(), 'yyyy-MM-dd')
-                    checkin_departure = QDate.fromString(self.checkin_table.item(row, 3).text(), 'yyyy-MM-dd')
-                    
-                    if arrival_date.isValid() and checkin_arrival < arrival_date:
-                        show_row = False
-                    if departure_date.isValid() and checkin_departure > departure_date:
-                        show_row = False
-                
-                # Check room type
-                if show_row and room_type != "All Room Types":
-                    room_info = self.checkin_table.item(row, 4).text()
-                    if room_type not in room_info:
-                        show_row = False
-                
-                self.checkin_table.setRowHidden(row, not show_row)
-                
+            self.load_checkin_list()
         except Exception as e:
             logger.error(f"Error filtering check-in list: {str(e)}")
             logger.error(traceback.format_exc())
@@ -1618,18 +1594,15 @@ class CheckInWidget(QWidget):
 
     def filter_guest_dropdown(self):
         """Filter the guest dropdown based on search text"""
-        search_text = self.guest_select_combo.currentText().lower()
+        search_text = self.guest_select_combo.currentText().strip()
         self.guest_select_combo.clear()
         
         # Add the "--Select guest--" option at the beginning
         self.guest_select_combo.addItem("--Select guest--", None)
 
         # Create a list of matching guests
-        matching_guests = []
-        for guest in self.guests_data:
-            full_name = f"{guest['first_name']} {guest['last_name']}"
-            if search_text in full_name.lower():
-                matching_guests.append((full_name, guest))
+        guests = search_rows('guest', search_text) if search_text else self.guests_data
+        matching_guests = [(f"{guest['first_name']} {guest['last_name']}", guest) for guest in guests]
         
         # Sort matching guests by name
         matching_guests.sort(key=lambda x: x[0].lower())
@@ -1665,6 +1638,7 @@ class CheckInWidget(QWidget):
                     self.guest_company_label.setText('')
                     self.bill_to_company.setEnabled(False)
                     self.bill_to_company.setChecked(False)
+                self.load_guest_reservation(guest)
             else:
                 self.guest_first_name_label.setText("")
                 self.guest_last_name_label.setText("")
@@ -1673,10 +1647,34 @@ class CheckInWidget(QWidget):
                 self.guest_company_label.setText("")
                 self.bill_to_company.setEnabled(False)
                 self.bill_to_company.setChecked(False)
+                self.load_guest_reservation(None)
         
         # Update the wizard UI to reflect the change in guest selection
         self.update_wizard_ui()
 
+    def load_guest_reservation(self, guest):
+        """Take the dates and room of the reservation the guest arrives on
+        today, if any; finishing the wizard then checks that reservation in"""
+        self.reservation = None
+        if guest:
+            self.reservation = find_arriving_reservation(guest.get('first_name', ''), guest.get('last_name', ''),
+                                                         QDate.currentDate().toString('yyyy-MM-dd'))
+        if self.reservation is None:
+            self.guest_reservation_label.setText("")
+            return
+        reservation = self.reservation
+        self.guest_reservation_label.setText(
+            f"#{reservation['reservation_id']} - Room {reservation.get('room_number') or 'N/A'}, "
+            f"{reservation['arrival_date']} to {reservation.get('departure_date') or ''}")
+        self.arrival_date.setSelectedDate(QDate.fromString(reservation['arrival_date'], 'yyyy-MM-dd'))
+        if reservation.get('departure_date'):
+            self.departure_date.setSelectedDate(QDate.fromString(reservation['departure_date'], 'yyyy-MM-dd'))
+        self.num_guests.setValue(int(reservation.get('num_guests') or 1))
+        self.load_room_grid()
+        room = room_by_id(reservation.get('room_id'))
+        if room:
+            self.select_room(room)
+
     def update_payment_status(self):
         try:
             total = Decimal(self.payment_amount.text().replace('MAD ', '').strip() or '0')
@@ -1711,44 +1709,44 @@ class CheckInWidget(QWidget):
         return lbl 
 
     def load_checkin_list(self):
-        """Load and display check-ins in the list"""
-        self.checkin_table.setRowCount(0)  # Clear existing rows
-        checkins = get_all_checkins()
-        
-        for checkin in checkins:
-            row = self.checkin_table.rowCount()
-            self.checkin_table.insertRow(row)
-            
-            # Add data to columns
-            self.checkin_table.setItem(row, 0, QTableWidgetItem(checkin['checkin_id']))
-            self.checkin_table.setItem(row, 1, QTableWidgetItem(f"{checkin['first_name']} {checkin['last_name']}"))
-            self.checkin_table.setItem(row, 2, QTableWidgetItem(checkin['arrival_date']))
-            self.checkin_table.setItem(row, 3, QTableWidgetItem(checkin['departure_date']))
-            self.checkin_table.setItem(row, 4, QTableWidgetItem(f"{checkin['room_type']} #{checkin['room_number']}"))
-            self.checkin_table.setItem(row, 5, QTableWidgetItem(checkin.get('status', 'N/A')))
-            
-            # Add action buttons
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            actions_layout.setSpacing(5)
-            actions_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)  # Center the buttons
-            
-            view_btn = QPushButton("View")
-            view_btn.setObjectName("tableActionButton")
-            view_btn.setProperty("action", "view")
-            view_btn.setFixedWidth(80)
-            view_btn.clicked.connect(lambda _, c=checkin: self.view_checkin(c))
-            
-            extra_btn = QPushButton("Extra")
-            extra_btn.setObjectName("tableActionButton")
-            extra_btn.setProperty("action", "extra")
-            extra_btn.setFixedWidth(80)
-            extra_btn.clicked.connect(lambda _, c=checkin: self.add_extra_charge(c))
-            
-            actions_layout.addWidget(view_btn)
-            actions_layout.addWidget(extra_btn)
-            self.checkin_table.setCellWidget(row, 6, actions_widget)
+        """Load the first page of check-ins; later pages load on scroll"""
+        self.checkin_pager.reset()
+
+    def add_checkin_row(self, checkin):
+        """Append one check-in to the list"""
+        row = self.checkin_table.rowCount()
+        self.checkin_table.insertRow(row)
+        
+        # Add data to columns
+        self.checkin_table.setItem(row, 0, QTableWidgetItem(checkin['checkin_id']))
+        self.checkin_table.setItem(row, 1, QTableWidgetItem(f"{checkin['first_name']} {checkin['last_name']}"))
+        self.checkin_table.setItem(row, 2, QTableWidgetItem(checkin['arrival_date']))
+        self.checkin_table.setItem(row, 3, QTableWidgetItem(checkin['departure_date']))
+        self.checkin_table.setItem(row, 4, QTableWidgetItem(f"{checkin['room_type']} #{checkin['room_number']}"))
+        self.checkin_table.setItem(row, 5, QTableWidgetItem(checkin.get('status', 'N/A')))
+        
+        # Add action buttons
+        actions_widget = QWidget()
+        actions_layout = QHBoxLayout(actions_widget)
+        actions_layout.setContentsMargins(0, 0, 0, 0)
+        actions_layout.setSpacing(5)
+        actions_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)  # Center the buttons
+        
+        view_btn = QPushButton("View")
+        view_btn.setObjectName("tableActionButton")
+        view_btn.setProperty("action", "view")
+        view_btn.setFixedWidth(80)
+        view_btn.clicked.connect(lambda _, c=checkin: self.view_checkin(c))
+        
+        extra_btn = QPushButton("Extra")
+        extra_btn.setObjectName("tableActionButton")
+        extra_btn.setProperty("action", "extra")
+        extra_btn.setFixedWidth(80)
+        extra_btn.clicked.connect(lambda _, c=checkin: self.add_extra_charge(c))
+        
+        actions_layout.addWidget(view_btn)
+        actions_layout.addWidget(extra_btn)
+        self.checkin_table.setCellWidget(row, 6, actions_widget)
 
     def view_checkin(self, checkin):
         """View details of a specific check-in"""
@@ -2004,31 +2002,30 @@ class CheckInWidget(QWidget):
                 for service in extra_services:
                     pdf.cell(service_col_width, 8, service['service_name'], 1, 0, "L")
                     pdf.cell(quantity_col_width, 8, str(service['quantity']), 1, 0, "C")
-                    pdf.cell(unit_price_col_width, 8, f"{format_number_with_spaces(float(Decimal(str(service['unit_price_at_time_of_charge']))))}", 1, 0, "R")
-                    pdf.cell(total_service_col_width, 8, f"{format_number_with_spaces(float(Decimal(str(service['total_charge']))))}", 1, 1, "R")
+                    pdf.cell(unit_price_col_width, 8, f"{format_number_with_spaces(float(service['unit_price_at_time_of_charge']))}", 1, 0, "R")
+                    pdf.cell(total_service_col_width, 8, f"{format_number_with_spaces(float(service['total_charge']))}", 1, 1, "R")
                 pdf.ln(2)
 
             # --- Totals (Right Aligned Below Tables) ---
-            additional_charges = Decimal(self.checkout_additional_charges.text().replace('MAD ', '').strip() or '0')
+            additional_charges = Money.of(self.checkout_additional_charges.text())
             # subtotal = room_charges + additional_charges  # Exclude room_charges
             subtotal = additional_charges  # Only services
             
             # Get selected tax details for display and calculation
             selected_tax = self.checkout_tax_select.currentData()
-            tax_amount = Decimal('0')
+            tax_amount = Money(0)
 
             if selected_tax:
-                taxable_base = Decimal('0')
+                taxable_base = Money(0)
                 # if selected_tax.get('apply_to_rooms', False):
                 #     taxable_base += room_charges  # Exclude room_charges
                 if selected_tax.get('apply_to_services', False):
                     taxable_base += additional_charges
 
                 if selected_tax['tax_type'] == 'percentage':
-                    percentage = Decimal(str(selected_tax.get('percentage', 0))) / Decimal('100')
-                    tax_amount = taxable_base * percentage
+                    tax_amount = taxable_base.percent(selected_tax.get('percentage') or 0)
                 elif selected_tax['tax_type'] == 'fixed':
-                    tax_amount = Decimal(str(selected_tax.get('amount', 0)))
+                    tax_amount = Money.of(selected_tax.get('amount') or 0)
             
             total_amount = subtotal + tax_amount
 
@@ -2157,14 +2154,12 @@ class CheckInWidget(QWidget):
                 self.payment_amount.setText("MAD 0.00")
                 return
                 
-            rooms = get_all_rooms()
-            room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
+            room_info = room_by_id(self.selected_room_id)
             if not room_info or not room_info.get('type'):
                 self.payment_amount.setText("MAD 0.00")
                 return
                 
-            room_rates = get_room_rates()
-            room_rate = next((rate['night_rate'] for rate in room_rates if rate['room_type'] == room_info['type']), 0)
+            room_rate = rate_for_room_type(room_info['type']) or 0
             
             # Calculate number of nights
             arrival = self.arrival_date.selectedDate().toPyDate()
@@ -2199,12 +2194,11 @@ class CheckInWidget(QWidget):
                 self.amount_due.setText("MAD 0.00")
                 return
             
-            # Convert to Decimal for precise calculation
-            total = Decimal(total_str)
-            paid = Decimal(paid_str or '0')
+            total = Money.of(total_str)
+            paid = Money.of(paid_str)
             
             # Calculate amount due
-            due = max(total - paid, Decimal('0'))
+            due = max(total - paid, Money(0))
             
             # Update amount due field with MAD prefix
             self.amount_due.setText(f"MAD {due:.2f}")
@@ -2242,6 +2236,13 @@ class CheckInWidget(QWidget):
 
             # Get all rooms
             rooms = get_all_rooms()
+            # Rooms no reservation or stay holds on the chosen nights, but for
+            # the reservation being checked in
+            reservation_id = self.reservation['reservation_id'] if self.reservation else None
+            free = {room['id'] for room in free_rooms(self.arrival_date.selectedDate().toString('yyyy-MM-dd'),
+                                                      self.departure_date.selectedDate().toString('yyyy-MM-dd'),
+                                                      reservation_id=reservation_id)}
+            reserved_room_id = self.reservation.get('room_id') if self.reservation else None
             
             # Get selected room type filter
             selected_type = self.room_type.currentData()
@@ -2311,7 +2312,8 @@ class CheckInWidget(QWidget):
                     room_btn.setStyleSheet(style)
                     
                     # Only disable rooms that are not available
-                    is_available = room.get('status') in ["Available", "Vacant"]
+                    is_available = (room.get('status') in ["Available", "Vacant"]
+                                    or room['id'] == reserved_room_id) and room['id'] in free
                     room_btn.setEnabled(is_available)
                     
                     # Connect the clicked signal using a lambda that captures the room data
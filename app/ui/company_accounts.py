@@ -10,12 +10,12 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal, QResource, QFile
 from PyQt6.QtGui import QIcon
 from app.core.db import (
-    add_company_account, get_company_accounts, get_company_account,
+    add_company_account, get_company_accounts_with_balances, get_company_account,
     update_company_account, get_company_charges, mark_company_charge_paid,
-    get_company_balance, get_tax_rates
+    get_tax_rates
 )
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from fpdf import FPDF
 import traceback
 import logging
@@ -110,7 +110,7 @@ class CompanyAccountDialog(QDialog):
         self.email.setText(self.company_data.get('email', ''))
         self.tax_id.setText(self.company_data.get('tax_id', ''))
         self.billing_terms.setText(self.company_data.get('billing_terms', ''))
-        self.credit_limit.setValue(self.company_data.get('credit_limit', 0))
+        self.credit_limit.setValue(float(self.company_data.get('credit_limit') or 0))
         self.payment_due_days.setValue(self.company_data.get('payment_due_days', 30))
     
     def validate_and_accept(self):
@@ -171,7 +171,7 @@ class CompanyAccountsWidget(QWidget):
     
     def load_companies(self):
         """Load company accounts into the table"""
-        companies = get_company_accounts()
+        companies = get_company_accounts_with_balances()
         self.company_table.setRowCount(len(companies))
         
         for row, company in enumerate(companies):
@@ -197,10 +197,12 @@ class CompanyAccountsWidget(QWidget):
             self.company_table.setItem(row, 5, QTableWidgetItem(credit_limit))
             
             # Balance
-            balance = get_company_balance(company['id'])
+            balance = company['open_balance']
             balance_text = f"{balance:.2f} MAD"
             balance_item = QTableWidgetItem(balance_text)
             balance_item.setForeground(Qt.GlobalColor.red if balance > 0 else Qt.GlobalColor.green)
+            if company['unpaid_count']:
+                balance_item.setToolTip(f"{company['unpaid_count']} unpaid charge(s) since {company['oldest_unpaid'][:10]}")
             self.company_table.setItem(row, 6, balance_item)
             
             # Actions
@@ -615,16 +617,17 @@ class CompanyChargesDialog(QDialog):
             write_row(pdf, headers, widths, alignments, lang, is_header=True)
 
             # Sort charges by check-in date (most recent first)
-            sorted_charges = sorted(charges, key=lambda x: datetime.strptime(x['arrival_date'], '%Y-%m-%d'), reverse=True)
+            # ISO dates sort chronologically as strings
+            sorted_charges = sorted(charges, key=lambda x: x['arrival_date'], reverse=True)
             
             # Add all charges
             total_amount = 0
             row_index = 1
 
             for charge in sorted_charges:
-                arrival = datetime.strptime(charge['arrival_date'], '%Y-%m-%d')
-                departure = datetime.strptime(charge['departure_date'], '%Y-%m-%d')
-                nights = (departure - arrival).days
+                arrival = date.fromisoformat(charge['arrival_date'])
+                departure = date.fromisoformat(charge['departure_date'])
+                nights = charge['nights']
                 night_rate = float(charge['room_charges']) / nights if nights > 0 else 0
 
                 room_number = charge.get('room_number', '-')
@@ -657,7 +660,7 @@ class CompanyChargesDialog(QDialog):
 
             # --- Totals (Right Aligned) ---
             num_stays = len(sorted_charges)
-            total_nights = sum((datetime.strptime(charge['departure_date'], '%Y-%m-%d') - datetime.strptime(charge['arrival_date'], '%Y-%m-%d')).days for charge in sorted_charges)
+            total_nights = sum(charge['nights'] for charge in sorted_charges)
             totals_left_col_width = checkin_col_width + checkout_col_width + nights_col_width + room_col_width
             totals_right_col_width = rate_col_width + total_col_width
             totals_x = pdf.l_margin + index_col_width + guest_col_width
@@ -7,8 +7,8 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QDateTime, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QPainter, QIcon
 from PyQt6.QtCharts import QChart, QChartView, QLineSeries, QPieSeries
-from app.core.db import get_all_rooms, get_available_rooms_count, get_reservations, get_all_checkins, update_room
-from datetime import datetime
+from app.core.db import get_all_rooms, get_dashboard_snapshot, update_room_status
+from app.core.executor import db_executor
 
 class KPIWidget(QFrame):
     """Widget for displaying KPI metrics"""
@@ -207,7 +207,7 @@ class DashboardWidget(QWidget):
         kpi_layout.setSpacing(15)
         self.occupancy_kpi = KPIWidget("Occupancy Rate", "0", "%", ":/icons/occupancy.png")
         kpi_layout.addWidget(self.occupancy_kpi)
-        self.available_rooms_kpi = KPIWidget("Available Rooms", str(get_available_rooms_count()), "", ":/icons/available_rooms.png")
+        self.available_rooms_kpi = KPIWidget("Available Rooms", "0", "", ":/icons/available_rooms.png")
         kpi_layout.addWidget(self.available_rooms_kpi)
         self.arrivals_kpi = KPIWidget("Arrivals Today", "0", "", ":/icons/arrivals.png")
         kpi_layout.addWidget(self.arrivals_kpi)
@@ -256,14 +256,14 @@ class DashboardWidget(QWidget):
         
         left_sidebar_layout.addWidget(quick_actions_frame)
         
-        # Recent Reservations Section
+        # Upcoming Reservations Section
         reservations_frame = QFrame()
         reservations_frame.setObjectName("reservationsFrame")
         reservations_frame.setFrameShape(QFrame.Shape.StyledPanel)
         reservations_layout = QVBoxLayout(reservations_frame)
         reservations_layout.setContentsMargins(10, 10, 10, 10)
         
-        reservations_title = QLabel("Recent Reservations")
+        reservations_title = QLabel("Upcoming Reservations")
         reservations_title.setObjectName("sectionTitle")
         reservations_title.setContentsMargins(0, 0, 0, 0)  # Remove margins from title
         reservations_layout.addWidget(reservations_title)
@@ -427,8 +427,7 @@ class DashboardWidget(QWidget):
         dashboard_row.addWidget(activity_frame, 1) # Recent activity keeps 20% of remaining space
 
         main_layout.addLayout(dashboard_row)
-        self.load_room_grid()
-        self.load_recent_reservations()
+        self.refresh_dashboard()
         
     def update_time(self):
         """Update the current date and time display"""
@@ -444,7 +443,7 @@ class DashboardWidget(QWidget):
         
         series = QLineSeries()
         
-        # Sample data will be loaded later
+        # Filled from daily_stats by load_occupancy_chart
         
         chart.addSeries(series)
         chart.createDefaultAxes()
@@ -452,18 +451,17 @@ class DashboardWidget(QWidget):
         
         return chart
         
-    def load_sample_data(self):
-        """Load sample data for the dashboard"""
-        # Occupancy rate data for the last 7 days
-        occupancy_data = [65, 70, 68, 72, 75, 78, 75]
-        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    def load_occupancy_chart(self, snapshot):
+        """Plot the occupancy rate of the last days from the snapshot"""
         occupancy_series = QLineSeries()
-        for i, value in enumerate(occupancy_data):
-            occupancy_series.append(i, value)
+        for i, (_day, rate) in enumerate(snapshot['occupancy_history']):
+            occupancy_series.append(i, rate)
         self.occupancy_chart.removeAllSeries()
         self.occupancy_chart.addSeries(occupancy_series)
         self.occupancy_chart.createDefaultAxes()
-        
+
+    def load_sample_data(self):
+        """Load sample data for the dashboard"""
         # Recent activity data
         activities = [
             {
@@ -515,17 +513,29 @@ class DashboardWidget(QWidget):
         # Add stretch at the end
         self.activity_container_layout.addStretch()
 
-    def load_room_grid(self):
-        rooms = get_all_rooms()
+    def refresh_dashboard(self):
+        """Fetch one dashboard snapshot in the background and render it when it arrives"""
+        job = db_executor.submit(get_dashboard_snapshot, group=(self, 'snapshot'))
+        job.finished.connect(self.show_snapshot)
+        job.failed.connect(lambda e: QMessageBox.warning(self, "Error", str(e)))
+
+    def show_snapshot(self, snapshot):
+        """Render every section from one get_dashboard_snapshot result"""
+        self.load_room_grid(snapshot)
+        self.update_occupancy_kpi(snapshot)
+        self.load_occupancy_chart(snapshot)
+        self.update_available_rooms(snapshot)
+        self.update_arrivals_departures(snapshot)
+        self.load_recent_reservations(snapshot)
+
+    def load_room_grid(self, snapshot):
+        rooms = snapshot['rooms']
         cols = 3 if len(rooms) < 12 else 8
         for i in reversed(range(self.room_grid.count())):
             widget = self.room_grid.itemAt(i).widget()
             if widget:
                 widget.setParent(None)
         
-        # Get all check-ins to find guest information for occupied rooms
-        checkins = get_all_checkins()
-        
         for idx, room in enumerate(rooms):
             btn = QPushButton(f"{room['number']}\n{room.get('type','')}")
             btn.setMinimumSize(80, 60)
@@ -602,17 +612,8 @@ class DashboardWidget(QWidget):
             tooltip = f"Room {room['number']}\nType: {room.get('type','')}\nStatus: {status}"
             
             # Add guest information for occupied rooms
-            if status == "Occupied":
-                # Find the active check-in for this room
-                active_checkin = next(
-                    (c for c in checkins 
-                     if c['room_id'] == room['id'] 
-                     and c['status'] == 'checked_in'),
-                    None
-                )
-                if active_checkin:
-                    guest_name = f"{active_checkin['first_name']} {active_checkin['last_name']}"
-                    tooltip += f"\nGuest: {guest_name}"
+            if status == "Occupied" and room['guest_name']:
+                tooltip += f"\nGuest: {room['guest_name']}"
             
             btn.setToolTip(tooltip)
             btn.setStyleSheet(btn.styleSheet() + """
@@ -627,42 +628,17 @@ class DashboardWidget(QWidget):
             btn.setEnabled(False)  # Disable clicking
             self.room_grid.addWidget(btn, idx // cols, idx % cols)
 
-    def update_occupancy_kpi(self):
-        rooms = get_all_rooms()
-        total_rooms = len(rooms)
-        occupied_rooms = sum(1 for r in rooms if r.get('status') != 'Vacant')
-        occupancy_rate = int((occupied_rooms / total_rooms) * 100) if total_rooms > 0 else 0
-        self.occupancy_kpi.update_value(str(occupancy_rate), "%")
+    def update_occupancy_kpi(self, snapshot):
+        self.occupancy_kpi.update_value(str(snapshot['occupancy_rate']), "%")
 
-    def update_arrivals_departures(self):
+    def update_arrivals_departures(self, snapshot):
         """Update arrivals and departures counts based on today's check-ins and check-outs"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        arrivals_count = 0
-        departures_count = 0
-        
-        # Get all check-ins
-        checkins = get_all_checkins()
-        
-        for checkin in checkins:
-            # Count arrivals (check-ins) for today
-            if checkin['arrival_date'] == today:
-                arrivals_count += 1
-                
-            # Count departures (check-outs) for today
-            if checkin['departure_date'] == today:
-                departures_count += 1
-        
-        # Update KPI widgets
-        self.arrivals_kpi.update_value(str(arrivals_count))
-        self.departures_kpi.update_value(str(departures_count))
+        self.arrivals_kpi.update_value(str(snapshot['arrivals']))
+        self.departures_kpi.update_value(str(snapshot['departures']))
 
-    def load_recent_reservations(self):
-        """Load and display recent reservations"""
-        # Get all reservations
-        reservations = get_reservations()
-        
-        # Sort reservations by arrival date (most recent first)
-        reservations.sort(key=lambda x: datetime.strptime(x['arrival_date'], '%Y-%m-%d'), reverse=True)
+    def load_recent_reservations(self, snapshot):
+        """Display the next upcoming reservations"""
+        reservations = snapshot['upcoming_reservations']
         
         # Clear existing reservations
         while self.reservations_container_layout.count():
@@ -684,11 +660,11 @@ class DashboardWidget(QWidget):
             """)
             self.reservations_container_layout.addWidget(no_reservations_label)
         else:
-            # Add new reservation cards (limit to 5 most recent)
-            for reservation in reservations[:5]:
+            # The snapshot already holds the next 5 arrivals
+            for reservation in reservations:
                 guest_name = f"{reservation['guest_first_name']} {reservation['guest_last_name']}"
                 arrival_date = reservation['arrival_date']
-                room_number = reservation['room_id']
+                room_number = reservation['room_number']
                 
                 card = ReservationCard(guest_name, arrival_date, room_number)
                 self.reservations_container_layout.addWidget(card)
@@ -699,16 +675,11 @@ class DashboardWidget(QWidget):
     def showEvent(self, event):
         """Handle show event"""
         super().showEvent(event)
-        self.load_room_grid()
-        self.update_occupancy_kpi()
-        self.update_available_rooms()
-        self.update_arrivals_departures()
-        self.load_recent_reservations()
+        self.refresh_dashboard()
         
-    def update_available_rooms(self):
+    def update_available_rooms(self, snapshot):
         """Update the available rooms count"""
-        available_count = get_available_rooms_count()
-        self.available_rooms_kpi.update_value(str(available_count))
+        self.available_rooms_kpi.update_value(str(snapshot['vacant_rooms']))
 
     def show_update_room_status_dialog(self):
         """Show dialog to update room status from needs cleaning to vacant"""
@@ -769,11 +740,7 @@ class DashboardWidget(QWidget):
             updated_count = 0
             for room_id, checkbox in room_checkboxes.items():
                 if checkbox.isChecked():
-                    room = next((r for r in rooms if r['id'] == room_id), None)
-                    if room:
-                        updated_room = dict(room)
-                        updated_room['status'] = 'Vacant'
-                        update_room(room_id, updated_room)
+                    if update_room_status(room_id, 'Vacant'):
                         updated_count += 1
             
             # Show success message
@@ -781,8 +748,7 @@ class DashboardWidget(QWidget):
                 QMessageBox.information(self, "Success", 
                                       f"Successfully updated {updated_count} room(s) to Vacant status.")
                 # Refresh room grid and KPIs
-                self.load_room_grid()
-                self.update_available_rooms()
+                self.refresh_dashboard()
             else:
                 QMessageBox.information(self, "No Changes", 
                                       "No rooms were selected for status update.")
\ No newline at end of file
@@ -3,7 +3,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from app.core.db import get_all_checkins, get_booking_services, get_guest_services, mark_guest_services_paid
-from decimal import Decimal
+from app.core.money import Money
 import os
 from fpdf import FPDF
 from datetime import datetime
@@ -53,22 +53,22 @@ class ViewGuestServicesDialog(QDialog):
 
     def display_services(self, services):
         self.services_table.setRowCount(len(services))
-        total = Decimal('0')
+        total = Money(0)
         for row, s in enumerate(services):
             self.services_table.setItem(row, 0, QTableWidgetItem(s.get('charge_date', '')))
             self.services_table.setItem(row, 1, QTableWidgetItem(s.get('service_name', '')))
             self.services_table.setItem(row, 2, QTableWidgetItem(str(s.get('quantity', ''))))
-            self.services_table.setItem(row, 3, QTableWidgetItem(f"MAD {Decimal(str(s.get('unit_price_at_time_of_charge', 0))):.2f}"))
-            self.services_table.setItem(row, 4, QTableWidgetItem(f"MAD {Decimal(str(s.get('total_charge', 0))):.2f}"))
-            total += Decimal(str(s.get('total_charge', 0)))
+            self.services_table.setItem(row, 3, QTableWidgetItem(f"MAD {s['unit_price_at_time_of_charge']:.2f}"))
+            self.services_table.setItem(row, 4, QTableWidgetItem(f"MAD {s['total_charge']:.2f}"))
+            total += s['total_charge']
             # Payment status visual cue
             status = "Unpaid"
             color = Qt.GlobalColor.red
             if s.get('is_paid', 0):
                 status = "Paid"
                 color = Qt.GlobalColor.green
-            elif Decimal(str(s.get('amount_paid', 0))) > 0:
-                status = f"Partly Paid ({Decimal(str(s.get('remaining_amount', 0))):.2f} left)"
+            elif s.get('amount_paid'):
+                status = f"Partly Paid ({s.get('remaining_amount') or Money(0):.2f} left)"
                 color = Qt.GlobalColor.darkYellow
             status_item = QTableWidgetItem(status)
             status_item.setForeground(color)
@@ -116,8 +116,8 @@ class ViewGuestServicesDialog(QDialog):
             pdf.cell(60, 8, s.get('charge_date', ''), 1, 0, "L")
             pdf.cell(60, 8, s.get('service_name', ''), 1, 0, "L")
             pdf.cell(25, 8, str(s.get('quantity', '')), 1, 0, "C")
-            pdf.cell(25, 8, f"{Decimal(str(s.get('unit_price_at_time_of_charge', 0))):.2f}", 1, 0, "R")
-            pdf.cell(25, 8, f"{Decimal(str(s.get('total_charge', 0))):.2f}", 1, 1, "R")
+            pdf.cell(25, 8, f"{s['unit_price_at_time_of_charge']:.2f}", 1, 0, "R")
+            pdf.cell(25, 8, f"{s['total_charge']:.2f}", 1, 1, "R")
         pdf.ln(2)
         pdf.set_font('Arial', 'B', 12)
         pdf.cell(170, 8, "Total:", 1, 0, "R")
@@ -134,10 +134,10 @@ class ViewGuestServicesDialog(QDialog):
 
     def pay_for_services(self):
         # Calculate remaining amount (total - amount already paid)
-        total_unpaid = Decimal('0')
+        total_unpaid = Money(0)
         for service in self.services:
             if not service.get('is_paid', 0):  # Only unpaid services
-                total_unpaid += Decimal(str(service.get('total_charge', 0)))
+                total_unpaid += service['total_charge']
         
         # If all services are already paid, show message
         if total_unpaid <= 0:
@@ -145,15 +145,15 @@ class ViewGuestServicesDialog(QDialog):
             return
         
         # Calculate remaining amount to pay
-        amount_already_paid = Decimal('0')
+        amount_already_paid = Money(0)
         if self.services:
             # Get amount already paid from first service (all services have same payment info)
-            amount_already_paid = Decimal(str(self.services[0].get('amount_paid', 0)))
+            amount_already_paid = self.services[0].get('amount_paid') or Money(0)
         
         remaining_to_pay = total_unpaid - amount_already_paid
         
         # Ensure remaining is not negative
-        remaining_to_pay = max(Decimal('0'), remaining_to_pay)
+        remaining_to_pay = max(Money(0), remaining_to_pay)
         
         # If nothing remaining to pay, show message
         if remaining_to_pay <= 0:
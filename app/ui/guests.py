@@ -7,7 +7,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QDate, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QPainter, QIcon
-from app.core.db import insert_guest, get_all_guests, update_guest, delete_guest
+from app.core.db import insert_guest, get_guests_page, search_rows, update_guest, delete_guest
+from app.ui.widgets.paged_table import TablePager
 
 class GuestProfileDialog(QDialog):
     """Dialog for adding/editing guest profiles"""
@@ -342,6 +343,7 @@ class GuestsWidget(QWidget):
             self.guest_table.horizontalHeader().setSectionResizeMode(i, QHeaderView.ResizeMode.Stretch)
         self.guest_table.verticalHeader().setDefaultSectionSize(50)  # Make rows thicker
         main_layout.addWidget(self.guest_table)
+        self.guest_pager = TablePager(self.guest_table, get_guests_page, self.add_guest_row)
         
         # Connect signals
         self.search_input.textChanged.connect(self.search_guests)
@@ -350,42 +352,46 @@ class GuestsWidget(QWidget):
         self.load_guests()
     
     def load_guests(self):
-        guests = get_all_guests()
-        self.guest_table.setRowCount(len(guests))
-        for row, guest in enumerate(guests):
-            name = f"{guest['first_name']} {guest['last_name']}"
-            self.guest_table.setItem(row, 0, QTableWidgetItem(name))
-            self.guest_table.setItem(row, 1, QTableWidgetItem(guest.get('id_number') or ""))
-            self.guest_table.setItem(row, 2, QTableWidgetItem(guest.get('nationality') or ""))
-            phone = f"{guest.get('phone_code') or ''} {guest.get('phone_number') or ''}"
-            self.guest_table.setItem(row, 3, QTableWidgetItem(phone.strip()))
-            self.guest_table.setItem(row, 4, QTableWidgetItem(guest.get('email') or ""))
-            self.guest_table.setItem(row, 5, QTableWidgetItem(guest.get('vip_status') or ""))
-            self.guest_table.setItem(row, 6, QTableWidgetItem("-"))  # Last Stay placeholder
-            
-            # Create action buttons widget
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 0, 5, 0)
-            actions_layout.setSpacing(10)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.setObjectName("tableActionButton")
-            edit_btn.setProperty("action", "edit")
-            edit_btn.setFixedWidth(80)
-            edit_btn.clicked.connect(lambda _, g=guest: self.edit_guest(g))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.setObjectName("tableActionButton")
-            delete_btn.setProperty("action", "delete")
-            delete_btn.setFixedWidth(80)
-            delete_btn.clicked.connect(lambda _, g=guest: self.delete_guest(g))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            
-            self.guest_table.setCellWidget(row, 7, actions_widget)
+        """Load the first page of guests; later pages load on scroll"""
+        self.guest_pager.reset()
+
+    def add_guest_row(self, guest):
+        """Append one guest to the table"""
+        row = self.guest_table.rowCount()
+        self.guest_table.insertRow(row)
+        name = f"{guest['first_name']} {guest['last_name']}"
+        self.guest_table.setItem(row, 0, QTableWidgetItem(name))
+        self.guest_table.setItem(row, 1, QTableWidgetItem(guest.get('id_number') or ""))
+        self.guest_table.setItem(row, 2, QTableWidgetItem(guest.get('nationality') or ""))
+        phone = f"{guest.get('phone_code') or ''} {guest.get('phone_number') or ''}"
+        self.guest_table.setItem(row, 3, QTableWidgetItem(phone.strip()))
+        self.guest_table.setItem(row, 4, QTableWidgetItem(guest.get('email') or ""))
+        self.guest_table.setItem(row, 5, QTableWidgetItem(guest.get('vip_status') or ""))
+        self.guest_table.setItem(row, 6, QTableWidgetItem("-"))  # Last Stay placeholder
+        
+        # Create action buttons widget
+        actions_widget = QWidget()
+        actions_layout = QHBoxLayout(actions_widget)
+        actions_layout.setContentsMargins(5, 0, 5, 0)
+        actions_layout.setSpacing(10)
+        
+        edit_btn = QPushButton("Edit")
+        edit_btn.setObjectName("tableActionButton")
+        edit_btn.setProperty("action", "edit")
+        edit_btn.setFixedWidth(80)
+        edit_btn.clicked.connect(lambda _, g=guest: self.edit_guest(g))
+        
+        delete_btn = QPushButton("Delete")
+        delete_btn.setObjectName("tableActionButton")
+        delete_btn.setProperty("action", "delete")
+        delete_btn.setFixedWidth(80)
+        delete_btn.clicked.connect(lambda _, g=guest: self.delete_guest(g))
+        
+        actions_layout.addWidget(edit_btn)
+        actions_layout.addWidget(delete_btn)
+        actions_layout.addStretch()
+        
+        self.guest_table.setCellWidget(row, 7, actions_widget)
 
     def add_new_guest(self):
         dialog = GuestProfileDialog(self)
@@ -441,60 +447,29 @@ class GuestsWidget(QWidget):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            delete_guest(guest['id'])
+            try:
+                delete_guest(guest['id'])
+            except ValueError as e:
+                QMessageBox.warning(self, "Error", str(e))
+                return
             self.load_guests()
             self.guest_data_changed.emit()
 
     def search_guests(self):
         """Search guests based on input"""
-        search_text = self.search_input.text().lower()
-        
-        # Get all guests from the database
-        all_guests = get_all_guests()
+        search_text = self.search_input.text().strip()
+        if not search_text:
+            self.load_guests()
+            return
         
-        # Filter guests based on search text
-        filtered_guests = []
-        for guest in all_guests:
-            full_name = f"{guest['first_name']} {guest['last_name']}".lower()
-            if search_text in full_name:
-                filtered_guests.append(guest)
+        # Prefix search on name, ID number, phone and email
+        filtered_guests = search_rows('guest', search_text)
         
         # Update the table with filtered results
-        self.guest_table.setRowCount(len(filtered_guests))
-        for row, guest in enumerate(filtered_guests):
-            name = f"{guest['first_name']} {guest['last_name']}"
-            self.guest_table.setItem(row, 0, QTableWidgetItem(name))
-            self.guest_table.setItem(row, 1, QTableWidgetItem(guest.get('id_number') or ""))
-            self.guest_table.setItem(row, 2, QTableWidgetItem(guest.get('nationality') or ""))
-            phone = f"{guest.get('phone_code') or ''} {guest.get('phone_number') or ''}"
-            self.guest_table.setItem(row, 3, QTableWidgetItem(phone.strip()))
-            self.guest_table.setItem(row, 4, QTableWidgetItem(guest.get('email') or ""))
-            self.guest_table.setItem(row, 5, QTableWidgetItem(guest.get('vip_status') or ""))
-            self.guest_table.setItem(row, 6, QTableWidgetItem("-"))  # Last Stay placeholder
-            
-            # Create action buttons widget
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 0, 5, 0)
-            actions_layout.setSpacing(10)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.setObjectName("tableActionButton")
-            edit_btn.setProperty("action", "edit")
-            edit_btn.setFixedWidth(80)
-            edit_btn.clicked.connect(lambda _, g=guest: self.edit_guest(g))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.setObjectName("tableActionButton")
-            delete_btn.setProperty("action", "delete")
-            delete_btn.setFixedWidth(80)
-            delete_btn.clicked.connect(lambda _, g=guest: self.delete_guest(g))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            
-            self.guest_table.setCellWidget(row, 7, actions_widget)
+        self.guest_pager.stop()
+        self.guest_table.setRowCount(0)
+        for guest in filtered_guests:
+            self.add_guest_row(guest)
 
     def on_guest_selected(self):
         """Handle guest selection"""
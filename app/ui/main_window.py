@@ -6,6 +6,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import QIcon, QFont
 from PyQt6.QtCore import Qt, QSize
+from app.core.backup import backup_scheduler
+from app.core.change_tracker import change_tracker
 from app.core.config_handler import app_config
 from app.core.db import (
     get_hotel_settings, update_hotel_settings, get_room_rates, update_room_rate,
@@ -43,7 +45,9 @@ class MainWindow(QMainWindow):
         self.setup_ui()
         self.load_styles()
         self.guests_widget.guest_data_changed.connect(self.checkin_widget.reload_guests_for_search)
-
+        self.setup_change_tracking()
+        backup_scheduler.failed.connect(lambda error: self.status_bar.showMessage(f"Backup failed: {error}", 10000))
+        backup_scheduler.start()
         
     def setup_ui(self):
         # Set window properties
@@ -299,6 +303,43 @@ class MainWindow(QMainWindow):
     def on_room_status_changed(self):
         """Handle room status changes"""
         self.room_status_changed.emit()
+
+    def setup_change_tracking(self):
+        """Refresh the views of tables that another terminal changed"""
+        self.table_refreshers = {
+            'rooms': [self.refresh_dashboard_if_visible, self.checkin_widget.load_room_grid,
+                      self.reservations_widget.load_room_grid, self.room_management_widget.load_rooms],
+            'room_rates': [self.room_management_widget.load_room_rates],
+            'check_ins': [self.refresh_dashboard_if_visible, self.checkin_widget.load_checkin_list,
+                          self.checkin_widget.load_checked_in_guests],
+            'reservations': [self.refresh_dashboard_if_visible, self.reservations_widget.load_reservations,
+                             self.reservations_widget.load_cancellations_table],
+            'guests': [self.guests_widget.search_guests, self.checkin_widget.reload_guests_for_search],
+            'company_accounts': [self.company_accounts_widget.load_companies],
+            'company_charges': [self.company_accounts_widget.load_companies],
+            'invoices': [self.invoices_widget.load_invoices],
+            'services': [self.load_services],
+            'tax_rates': [self.settings_widget.load_tax_rates],
+            'hotel_settings': [self.settings_widget.load_hotel_info],
+        }
+        change_tracker.changes.connect(self.on_external_changes)
+        change_tracker.start()
+
+    def on_external_changes(self, changes):
+        """Run each affected view's refresh once per batch of changes"""
+        refreshers = []
+        for table in changes:
+            for refresh in self.table_refreshers.get(table, ()):
+                if refresh not in refreshers:
+                    refreshers.append(refresh)
+        for refresh in refreshers:
+            refresh()
+        self.status_bar.showMessage("Updated with changes from another terminal", 3000)
+
+    def refresh_dashboard_if_visible(self):
+        """The dashboard also refreshes itself whenever it is shown"""
+        if self.dashboard_widget.isVisible():
+            self.dashboard_widget.refresh_dashboard()
         
     def load_styles(self):
         """Load the application styles"""
@@ -400,7 +441,7 @@ class MainWindow(QMainWindow):
         price.setRange(0, 10000)
         price.setDecimals(2)
         price.setPrefix("MAD ")
-        price.setValue(service['default_price'])
+        price.setValue(float(service['default_price']))
         form.addRow("Default Price:", price)
         unit = QComboBox()
         unit.addItems(["per item", "per kg", "per hour", "per day", "per service"])
@@ -439,7 +480,11 @@ class MainWindow(QMainWindow):
             self.load_services()
 
     def delete_service(self, service):
-        delete_service(service['id'])
+        try:
+            delete_service(service['id'])
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
         self.load_services()
 
     def handle_logout(self):
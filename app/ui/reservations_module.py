@@ -5,7 +5,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QDate, pyqtSignal, QStringListModel
 from PyQt6.QtGui import QIcon, QColor, QTextCharFormat, QFont
-from app.core.db import get_all_guests, get_all_rooms, update_room, get_reservations, add_reservation, update_reservation, delete_reservation, get_room_rates
+from app.core.db import get_all_guests, get_all_rooms, update_room, get_reservations, get_reservations_page, search_rows, add_reservation, update_reservation, delete_reservation, rate_for_room_type, room_by_id, free_rooms, get_room_nights, get_reservation
+from app.ui.widgets.paged_table import TablePager, date_filter, date_filter_value
 from datetime import datetime
 import uuid
 from fpdf import FPDF
@@ -120,14 +121,11 @@ class ReservationsWidget(QWidget):
         
         # Search input
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Search by guest, reservation #, date...")
+        self.search_input.setPlaceholderText("Search by guest or reservation #...")
         filter_layout.addWidget(self.search_input)
         
-        # Arrival date filter
-        self.filter_arrival = QDateEdit()
-        self.filter_arrival.setCalendarPopup(True)
-        self.filter_arrival.setDisplayFormat("yyyy-MM-dd")
-        self.filter_arrival.setDate(QDate.currentDate())
+        # Arrival date filter (earliest arrival, Any by default)
+        self.filter_arrival = date_filter()
         filter_layout.addWidget(QLabel("Arrival:"))
         filter_layout.addWidget(self.filter_arrival)
         
@@ -156,6 +154,8 @@ class ReservationsWidget(QWidget):
         self.reservations_table.setHorizontalHeaderLabels([
             "Reservation #", "Guest Name", "Arrival", "Room Type", "Status", "Created On", "Actions"
         ])
+        self.reservations_pager = TablePager(self.reservations_table, get_reservations_page, self.add_reservation_row,
+                                             filters=self.reservation_filters)
         
         # CRITICAL FIX: Set proper size policies and constraints
         self.reservations_table.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
@@ -178,122 +178,81 @@ class ReservationsWidget(QWidget):
         # Clear search text
         self.search_input.clear()
         
-        # Reset date filters to current date
-        current_date = QDate.currentDate()
-        self.filter_arrival.setDate(current_date)
+        # Reset the date filter to Any
+        self.filter_arrival.setDate(self.filter_arrival.minimumDate())
         
         # Reset combo boxes to first item
         self.filter_status.setCurrentIndex(0)
         
-        # Show all rows
-        for row in range(self.reservations_table.rowCount()):
-            self.reservations_table.setRowHidden(row, False)
-        
         # Reload all reservations to ensure we have the complete dataset
         self.load_reservations()
 
     def load_reservations(self):
-        """Load reservations from database and display in table"""
-        # Clear existing rows
-        self.reservations_table.setRowCount(0)
+        """Load the first page of reservations matching the filters; later
+        pages load on scroll"""
+        self.reservations_pager.reset()
+
+    def reservation_filters(self):
+        """The search text and filters, as get_reservations_page arguments"""
+        status = self.filter_status.currentText()
+        return {
+            'search': self.search_input.text().strip() or None,
+            'arrival_from': date_filter_value(self.filter_arrival),
+            'status': None if status == "All Statuses" else status,
+        }
+
+    def add_reservation_row(self, reservation):
+        """Append one reservation to the table"""
+        row = self.reservations_table.rowCount()
+        self.reservations_table.insertRow(row)
         
-        # Get reservations from database
-        reservations = get_reservations()
-        rooms = {str(room['id']): room for room in get_all_rooms()}
+        # Reservation ID
+        self.reservations_table.setItem(row, 0, QTableWidgetItem(reservation['reservation_id']))
         
-        # Add each reservation to the table
-        for row, reservation in enumerate(reservations):
-            self.reservations_table.insertRow(row)
-            
-            # Reservation ID
-            self.reservations_table.setItem(row, 0, QTableWidgetItem(reservation['reservation_id']))
-            
-            # Guest Name
-            guest_name = f"{reservation['guest_first_name']} {reservation['guest_last_name']}"
-            self.reservations_table.setItem(row, 1, QTableWidgetItem(guest_name))
-            
-            # Arrival Date
-            self.reservations_table.setItem(row, 2, QTableWidgetItem(reservation['arrival_date']))
-            
-            # Room Type (from room record)
-            room_type = rooms.get(str(reservation.get('room_id')), {}).get('type', '')
-            self.reservations_table.setItem(row, 3, QTableWidgetItem(room_type))
-            
-            # Status
-            self.reservations_table.setItem(row, 4, QTableWidgetItem(reservation['status']))
-            
-            # Created On
-            self.reservations_table.setItem(row, 5, QTableWidgetItem(reservation['created_on']))
-            
-            # Actions
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(5, 0, 5, 0)
-            actions_layout.setSpacing(10)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.setObjectName("tableActionButton")
-            edit_btn.setProperty("action", "edit")
-            edit_btn.setFixedWidth(80)
-            edit_btn.clicked.connect(lambda _, r=reservation: self.edit_reservation(r))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.setObjectName("tableActionButton")
-            delete_btn.setProperty("action", "delete")
-            delete_btn.setFixedWidth(80)
-            delete_btn.clicked.connect(lambda _, r=reservation: self.delete_reservation(r))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            actions_layout.addStretch()
-            
-            self.reservations_table.setCellWidget(row, 6, actions_widget)
+        # Guest Name
+        guest_name = f"{reservation['guest_first_name']} {reservation['guest_last_name']}"
+        self.reservations_table.setItem(row, 1, QTableWidgetItem(guest_name))
         
-        # Connect search and filter signals if not already connected
-        if not hasattr(self, 'search_connected'):
-            self.search_input.textChanged.connect(self.filter_reservations)
-            self.filter_arrival.dateChanged.connect(self.filter_reservations)
-            self.filter_status.currentIndexChanged.connect(self.filter_reservations)
-            self.search_connected = True
-
-    def filter_reservations(self):
-        """Filter reservations based on search text and filters"""
-        search_text = self.search_input.text().lower()
-        arrival_date = self.filter_arrival.date().toString('yyyy-MM-dd')
-        status = self.filter_status.currentText()
+        # Arrival Date
+        self.reservations_table.setItem(row, 2, QTableWidgetItem(reservation['arrival_date']))
         
-        for row in range(self.reservations_table.rowCount()):
-            show_row = True
-            
-            # Check search text
-            if search_text:
-                search_match = False
-                for col in range(self.reservations_table.columnCount() - 1):  # Exclude actions column
-                    item = self.reservations_table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        search_match = True
-                        break
-                if not search_match:
-                    show_row = False
-            
-            # Check arrival date
-            if arrival_date and show_row:
-                item = self.reservations_table.item(row, 2)  # Arrival date column
-                if item:
-                    item_date = item.text()
-                    if item_date < arrival_date:
-                        show_row = False
-            
-            # Check status
-            if status != "All Statuses" and show_row:
-                item = self.reservations_table.item(row, 4)  # Status column
-                if item and item.text() != status:
-                    show_row = False
-            
-            self.reservations_table.setRowHidden(row, not show_row)
+        # Room Type (stored on the reservation when it was booked)
+        self.reservations_table.setItem(row, 3, QTableWidgetItem(reservation.get('room_type') or ''))
         
-        # Update the table view
-        self.reservations_table.viewport().update()
+        # Status
+        self.reservations_table.setItem(row, 4, QTableWidgetItem(reservation['status']))
+        
+        # Created On
+        self.reservations_table.setItem(row, 5, QTableWidgetItem(reservation['created_on']))
+        
+        # Actions
+        actions_widget = QWidget()
+        actions_layout = QHBoxLayout(actions_widget)
+        actions_layout.setContentsMargins(5, 0, 5, 0)
+        actions_layout.setSpacing(10)
+        
+        edit_btn = QPushButton("Edit")
+        edit_btn.setObjectName("tableActionButton")
+        edit_btn.setProperty("action", "edit")
+        edit_btn.setFixedWidth(80)
+        edit_btn.clicked.connect(lambda _, r=reservation: self.edit_reservation(r))
+        
+        delete_btn = QPushButton("Delete")
+        delete_btn.setObjectName("tableActionButton")
+        delete_btn.setProperty("action", "delete")
+        delete_btn.setFixedWidth(80)
+        delete_btn.clicked.connect(lambda _, r=reservation: self.delete_reservation(r))
+        
+        actions_layout.addWidget(edit_btn)
+        actions_layout.addWidget(delete_btn)
+        actions_layout.addStretch()
+        
+        self.reservations_table.setCellWidget(row, 6, actions_widget)
+
+    def filter_reservations(self):
+        """Reload the list with the current search text and filters; they are
+        applied by the page queries, so rows loaded later match them too"""
+        self.load_reservations()
 
     def setup_calendar_tab(self):
         layout = QVBoxLayout(self.calendar_tab)
@@ -472,18 +431,12 @@ class ReservationsWidget(QWidget):
             return
             
         room_number = room_item.text().split()[1]  # Extract room number from "Room XXX"
-        date = QDate(self.calendar.yearShown(), self.calendar.monthShown(), int(date_item.text()))
-        
-        # Get all reservations
-        reservations = get_reservations()
+        date = self.availability_month.addDays(column)
         
-        # Find reservations for this room and date
-        room_reservations = [
-            r for r in reservations 
-            if r['room_id'] == room_number and 
-            datetime.strptime(r['arrival_date'], '%Y-%m-%d').date() <= date.toPyDate() <= 
-            datetime.strptime(r['departure_date'], '%Y-%m-%d').date()
-        ]
+        # The reservation holding this room on this night, if any
+        night = self.availability_nights.get((room_item.data(Qt.ItemDataRole.UserRole), column))
+        reservation = night and night['kind'] == 'reservation' and get_reservation(night['code'])
+        room_reservations = [reservation] if reservation else []
         
         if room_reservations:
             # Create and show a dialog with reservation details
@@ -513,7 +466,7 @@ class ReservationsWidget(QWidget):
                 # Dates
                 dates_label = QLabel(
                     f"Arrival: {reservation['arrival_date']}\n"
-                    f"Departure: {reservation['departure_date']}"
+                    f"Departure: {reservation['departure_date'] or 'N/A'}"
                 )
                 reservation_layout.addWidget(dates_label)
                 
@@ -539,7 +492,6 @@ class ReservationsWidget(QWidget):
     def update_availability_grid(self):
         """Update the room availability grid based on filters"""
         rooms = get_all_rooms()
-        reservations = get_reservations()
         
         # Apply filters
         status = self.calendar_status.currentText()
@@ -550,6 +502,15 @@ class ReservationsWidget(QWidget):
         month = current_date.month()
         days_in_month = QDate(year, month, 1).daysInMonth()
         
+        # Held nights of the month, keyed by (room id, day index)
+        self.availability_month = QDate(year, month, 1)
+        month_start = self.availability_month.toString('yyyy-MM-dd')
+        month_end = self.availability_month.addMonths(1).toString('yyyy-MM-dd')
+        self.availability_nights = {
+            (night['room_id'], self.availability_month.daysTo(QDate.fromString(night['night'], 'yyyy-MM-dd'))): night
+            for night in get_room_nights(month_start, month_end)
+        }
+        
         self.availability_table.clear()
         self.availability_table.setRowCount(len(rooms))
         self.availability_table.setColumnCount(days_in_month)
@@ -560,23 +521,15 @@ class ReservationsWidget(QWidget):
             # Set column width to 30 pixels
             self.availability_table.setColumnWidth(day, 30)
         for i, room in enumerate(rooms):
-            self.availability_table.setVerticalHeaderItem(i, QTableWidgetItem(f"Room {room['number']}"))
-        
-        # Convert rooms list to a dictionary keyed by room_id
-        rooms_dict = {str(room['id']): room for room in rooms}
+            header = QTableWidgetItem(f"Room {room['number']}")
+            header.setData(Qt.ItemDataRole.UserRole, room['id'])
+            self.availability_table.setVerticalHeaderItem(i, header)
         
         # Fill grid
         for i, room in enumerate(rooms):
             for day in range(days_in_month):
-                date = QDate(year, month, day + 1).toString('yyyy-MM-dd')
-                
-                # Find reservation for this room and date
-                room_reservation = next(
-                    (r for r in reservations 
-                    if str(r['room_id']) == str(room['id']) and 
-                    r['arrival_date'] == date),
-                    None
-                )
+                # The reservation or stay holding this room on this night
+                room_reservation = self.availability_nights.get((room['id'], day))
                 
                 if room_reservation:
                     # Apply status filter
@@ -591,17 +544,18 @@ class ReservationsWidget(QWidget):
                     color = self._get_status_color(room_reservation['status'])
                     cell = QTableWidgetItem()
                     cell.setBackground(QColor(color))
-                    initials = f"{room_reservation['guest_first_name'][0]}{room_reservation['guest_last_name'][0]}"
+                    initials = f"{(room_reservation['guest_first_name'] or '')[:1]}{(room_reservation['guest_last_name'] or '')[:1]}"
                     cell.setText(initials.upper())
                     cell.setForeground(QColor("white"))
                     cell.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
                     
                     # Tooltip with reservation details
+                    kind = "Reservation" if room_reservation['kind'] == 'reservation' else "Check-in"
                     cell.setToolTip(
-                        f"Reservation: {room_reservation['reservation_id']}\n"
+                        f"{kind}: {room_reservation['code']}\n"
                         f"Guest: {room_reservation['guest_first_name']} {room_reservation['guest_last_name']}\n"
                         f"Status: {room_reservation['status']}\n"
-                        f"Room: {rooms_dict.get(str(room_reservation.get('room_id')), {}).get('type', '')}"
+                        f"Room: {room.get('type', '')}"
                     )
                     self.availability_table.setItem(i, day, cell)
                 else:
@@ -722,7 +676,7 @@ class ReservationsWidget(QWidget):
         reservations = get_reservations()
         
         # Sort reservations by arrival date
-        reservations.sort(key=lambda x: datetime.strptime(x['arrival_date'], '%Y-%m-%d'))
+        reservations.sort(key=lambda x: x['arrival_date'])
         
         # Create a new widget for agenda view
         agenda_widget = QWidget()
@@ -918,6 +872,20 @@ class ReservationsWidget(QWidget):
         self.num_guests.setButtonSymbols(QSpinBox.ButtonSymbols.UpDownArrows)
         self.num_guests.setMinimumWidth(120)
         guests_layout.addWidget(self.num_guests)
+
+        nights_label = QLabel("Nights")
+        nights_label.setObjectName("sectionTitle")
+        guests_layout.addWidget(nights_label)
+
+        self.num_nights = QSpinBox()
+        self.num_nights.setMinimum(1)
+        self.num_nights.setMaximum(365)
+        self.num_nights.setValue(1)
+        self.num_nights.setButtonSymbols(QSpinBox.ButtonSymbols.UpDownArrows)
+        self.num_nights.setMinimumWidth(120)
+        self.num_nights.valueChanged.connect(self.update_room_selection)
+        self.num_nights.valueChanged.connect(self.update_amount_due)
+        guests_layout.addWidget(self.num_nights)
         guests_layout.addStretch()
 
         s2_layout.addWidget(guests_frame)
@@ -1034,6 +1002,10 @@ class ReservationsWidget(QWidget):
         if hasattr(self, 'room_grid_widget'):
             self.load_room_grid()
 
+    def selected_departure(self):
+        """Departure of the stay being booked, from the arrival date and nights"""
+        return self.arrival_date.selectedDate().addDays(self.num_nights.value())
+
     def load_room_grid(self):
         # Remove old buttons
         for i in reversed(range(self.room_grid_layout.count())):
@@ -1041,6 +1013,9 @@ class ReservationsWidget(QWidget):
             if widget:
                 widget.setParent(None)
         rooms = get_all_rooms()  # Fetch the latest room list from the database
+        # Rooms nobody holds on any of the nights asked for
+        free = {room['id'] for room in free_rooms(self.arrival_date.selectedDate().toString('yyyy-MM-dd'),
+                                                  self.selected_departure().toString('yyyy-MM-dd'))}
         cols = 5
         for idx, room in enumerate(rooms):
             btn = QPushButton(f"{room['number']}\n{room.get('type','')}\n{room.get('status','')}")
@@ -1056,7 +1031,7 @@ class ReservationsWidget(QWidget):
                 style += "border: none;"
                 btn.setChecked(False)
             btn.setStyleSheet(style)
-            if room.get('status') != "Vacant":
+            if room['id'] not in free or room.get('status') == "Not Available":
                 btn.setEnabled(False)
             btn.clicked.connect(lambda _, rid=room['id']: self.select_room(rid))
             self.room_grid_layout.addWidget(btn, idx // cols, idx % cols)
@@ -1099,17 +1074,9 @@ class ReservationsWidget(QWidget):
         self.update_wizard_ui()
 
     def finish_wizard(self):
-        # Mark room as reserved and save reservation
-        from app.core.db import update_room, add_reservation, get_all_rooms
+        # Save the reservation, then mark the room as reserved
         room_id = getattr(self, 'selected_room_id', None)
-        rooms = get_all_rooms()
-        room_info = next((r for r in rooms if r['id'] == room_id), None)
-        if room_info:
-            room_info = dict(room_info)
-            room_info['status'] = 'Reserved'
-            update_room(room_id, room_info)
-            # Emit room status changed signal
-            self.room_status_changed.emit()
+        room_info = room_by_id(room_id)
         
         # Generate receipt
         self.generate_receipt()
@@ -1131,6 +1098,7 @@ class ReservationsWidget(QWidget):
             'guest_email': self.guest_email.text(),
             'guest_phone': self.guest_phone.text(),
             'arrival_date': self.arrival_date.selectedDate().toString('yyyy-MM-dd'),
+            'departure_date': self.selected_departure().toString('yyyy-MM-dd'),
             'num_guests': str(self.num_guests.value()),
             'room_id': room_id,
             'room_type': room_info.get('type', ''),  # Ensure room_type is set
@@ -1144,6 +1112,9 @@ class ReservationsWidget(QWidget):
         
         try:
             add_reservation(reservation)
+            update_room(room_id, dict(room_info, status='Reserved'))
+            # Emit room status changed signal
+            self.room_status_changed.emit()
             
             # Reset wizard and return to step 1
             self.reset_wizard_fields()
@@ -1171,6 +1142,7 @@ class ReservationsWidget(QWidget):
         self.guest_phone.clear()
         self.arrival_date.setSelectedDate(QDate.currentDate())
         self.num_guests.setValue(1)
+        self.num_nights.setValue(1)
         self.special_requests.clear()
         self.payment_method.setCurrentIndex(0)
         self.deposit_amount.clear()
@@ -1199,12 +1171,12 @@ class ReservationsWidget(QWidget):
         pdf.cell(200, 10, txt=f"Phone: {self.guest_phone.text()}", ln=True)
         
         # Add stay details
-        rooms = get_all_rooms()
-        room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
+        room_info = room_by_id(self.selected_room_id)
         room_text = f"{room_info['type']} #{room_info['number']}" if room_info else "No room selected"
         
         pdf.cell(200, 10, txt=f"Room: {room_text}", ln=True)
         pdf.cell(200, 10, txt=f"Arrival: {self.arrival_date.selectedDate().toString('yyyy-MM-dd')}", ln=True)
+        pdf.cell(200, 10, txt=f"Departure: {self.selected_departure().toString('yyyy-MM-dd')}", ln=True)
         pdf.cell(200, 10, txt=f"Number of Guests: {str(self.num_guests.value())}", ln=True)
         
         # Add payment details
@@ -1222,10 +1194,10 @@ class ReservationsWidget(QWidget):
     def show_confirmation_details(self):
         guest = f"{self.guest_first_name.text()} {self.guest_last_name.text()}"
         arrival = self.arrival_date.selectedDate().toString('yyyy-MM-dd')
+        departure = self.selected_departure().toString('yyyy-MM-dd')
         
         # Get room info from database
-        rooms = get_all_rooms()
-        room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
+        room_info = room_by_id(self.selected_room_id)
         room_text = f"{room_info['type']} #{room_info['number']}" if room_info else "No room selected"
         
         payment = self.payment_method.currentText()
@@ -1238,6 +1210,7 @@ class ReservationsWidget(QWidget):
         <b>Date:</b> {datetime.now().strftime('%Y-%m-%d %H:%M')}<br><br>
         <b>Guest:</b> {guest}<br>
         <b>Arrival:</b> {arrival}<br>
+        <b>Departure:</b> {departure}<br>
         <b>Room:</b> {room_text}<br>
         <b>Payment Method:</b> {payment}<br>
         <b>Deposit:</b> {deposit}<br>
@@ -1258,17 +1231,15 @@ class ReservationsWidget(QWidget):
         if not hasattr(self, 'selected_room_id') or not self.selected_room_id:
             self.amount_due.setText("0.00")
             return
-        rooms = get_all_rooms()
-        room_info = next((r for r in rooms if r['id'] == self.selected_room_id), None)
+        room_info = room_by_id(self.selected_room_id)
         if not room_info or not room_info.get('type'):
             self.amount_due.setText("0.00")
             return
-        rates = get_room_rates()
-        room_rate = next((r['night_rate'] for r in rates if r['room_type'] == room_info['type']), None)
+        room_rate = rate_for_room_type(room_info['type'])
         if not room_rate:
             self.amount_due.setText("0.00")
             return
-        self.amount_due.setText(f"{room_rate:.2f}")
+        self.amount_due.setText(f"{room_rate * self.num_nights.value():.2f}")
 
     def update_wizard_ui(self):
         """Update wizard UI based on current step"""
@@ -1409,20 +1380,13 @@ class ReservationsWidget(QWidget):
 
     def search_reservations_to_cancel(self):
         """Search for reservations to cancel"""
-        search_text = self.cancel_search.text().lower()
+        search_text = self.cancel_search.text().strip()
         if not search_text:
             self.load_cancellations_table()
             return
             
-        # Get all reservations
-        reservations = get_reservations()
-        
-        # Filter reservations
-        filtered_reservations = []
-        for reservation in reservations:
-            if (search_text in reservation['reservation_id'].lower() or
-                search_text in f"{reservation['guest_first_name']} {reservation['guest_last_name']}".lower()):
-                filtered_reservations.append(reservation)
+        # Prefix search on reservation number and guest name
+        filtered_reservations = search_rows('reservation', search_text)
         
         # Update table
         self.update_cancellations_table(filtered_reservations)
@@ -1452,7 +1416,7 @@ class ReservationsWidget(QWidget):
             self.cancellations_table.setItem(row, 2, QTableWidgetItem(reservation['arrival_date']))
             
             # Departure Date (if available)
-            departure_date = reservation.get('departure_date', 'N/A')
+            departure_date = reservation.get('departure_date') or 'N/A'
             self.cancellations_table.setItem(row, 3, QTableWidgetItem(departure_date))
             
             # Room Type
@@ -1528,34 +1492,33 @@ class ReservationsWidget(QWidget):
         
         # Process cancellation
         from app.core.db import cancel_reservation
-        if cancel_reservation(self.selected_reservation['reservation_id'], cancellation_data):
-            # Show success message
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Reservation #{self.selected_reservation['reservation_id']} has been cancelled successfully."
-            )
-            
-            # Clear form
-            self.cancel_reason.setCurrentIndex(0)
-            self.refund_amount.clear()
-            self.cancel_notes.clear()
-            self.selected_reservation = None
-            self.process_cancellation_button.setEnabled(False)
-            
-            # Refresh tables
-            self.load_cancellations_table()
-            self.load_reservations()
-            self.update_calendar_view()
-            
-            # Emit room status changed signal
-            self.room_status_changed.emit()
-        else:
-            QMessageBox.critical(
-                self,
-                "Error",
-                "Failed to cancel reservation. Please try again."
-            )
+        try:
+            cancel_reservation(self.selected_reservation['reservation_id'], cancellation_data)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+
+        # Show success message
+        QMessageBox.information(
+            self,
+            "Success",
+            f"Reservation #{self.selected_reservation['reservation_id']} has been cancelled successfully."
+        )
+
+        # Clear form
+        self.cancel_reason.setCurrentIndex(0)
+        self.refund_amount.clear()
+        self.cancel_notes.clear()
+        self.selected_reservation = None
+        self.process_cancellation_button.setEnabled(False)
+
+        # Refresh tables
+        self.load_cancellations_table()
+        self.load_reservations()
+        self.update_calendar_view()
+
+        # Emit room status changed signal
+        self.room_status_changed.emit()
 
     def clear_calendar_filters(self):
         """Clear all calendar filters"""
@@ -1621,6 +1584,12 @@ class ReservationsWidget(QWidget):
         arrival_date.setCalendarPopup(True)
         arrival_date.setDate(QDate.fromString(reservation['arrival_date'], 'yyyy-MM-dd'))
         
+        departure = reservation.get('departure_date')
+        departure_date = QDateEdit()
+        departure_date.setCalendarPopup(True)
+        departure_date.setDate(QDate.fromString(departure, 'yyyy-MM-dd') if departure
+                               else arrival_date.date().addDays(1))
+        
         num_guests = QComboBox()
         num_guests.addItems([str(i) for i in range(1, 7)])
         num_guests.setCurrentText(str(reservation.get('num_guests', '1')))
@@ -1632,6 +1601,7 @@ class ReservationsWidget(QWidget):
         special_requests = QLineEdit(reservation.get('special_requests', ''))
         
         stay_layout.addRow("Arrival Date:", arrival_date)
+        stay_layout.addRow("Departure Date:", departure_date)
         stay_layout.addRow("Number of Guests:", num_guests)
         stay_layout.addRow("Status:", status)
         stay_layout.addRow("Special Requests:", special_requests)
@@ -1674,6 +1644,7 @@ class ReservationsWidget(QWidget):
                 'guest_email': email.text(),
                 'guest_phone': phone.text(),
                 'arrival_date': arrival_date.date().toString('yyyy-MM-dd'),
+                'departure_date': departure_date.date().toString('yyyy-MM-dd'),
                 'num_guests': num_guests.currentText(),
                 'room_id': reservation['room_id'],
                 'room_type': reservation['room_type'],
@@ -1685,8 +1656,12 @@ class ReservationsWidget(QWidget):
                 'created_on': reservation['created_on']
             }
             
-            # Save to database
-            update_reservation(reservation['reservation_id'], updated_reservation)
+            # Save to database; the room may be taken on the new dates
+            try:
+                update_reservation(updated_reservation)
+            except ValueError as e:
+                QMessageBox.warning(self, "Error", str(e))
+                return
             
             # Refresh views
             self.load_reservations()
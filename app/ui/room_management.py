@@ -7,7 +7,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QIcon
 from app.core.db import (
-    get_all_rooms, insert_room, update_room, delete_room,
+    get_all_rooms, insert_room, insert_rooms_bulk, update_room, delete_room,
     get_room_rates, update_room_rate
 )
 
@@ -335,7 +335,11 @@ class RoomManagementWidget(QWidget):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            delete_room(room['id'])
+            try:
+                delete_room(room['id'])
+            except ValueError as e:
+                QMessageBox.warning(self, "Error", str(e))
+                return
             self.load_rooms()
             
     def load_room_rates(self):
@@ -410,7 +414,7 @@ class RoomManagementWidget(QWidget):
         night_rate.setRange(0, 10000)
         night_rate.setDecimals(2)
         night_rate.setPrefix("MAD ")
-        night_rate.setValue(rate['night_rate'])
+        night_rate.setValue(float(rate['night_rate']))
         form.addRow("Night Rate:", night_rate)
         
         buttons = QDialogButtonBox(
@@ -499,21 +503,22 @@ class RoomManagementWidget(QWidget):
             start_num = last_regular_number + 1
             start_suite_num = last_suite_number + 1
             
+            new_rooms = []
             for i in range(num_rooms.value()):
                 if room_type.currentText().lower() == 'suite':
                     room_number = f"Suite {start_suite_num + i}"
                 else:
                     room_number = str(start_num + i)
                     
-                room = {
+                new_rooms.append({
                     'number': room_number,
                     'type': room_type.currentText(),
                     'beds': beds.value(),
                     'floor': floor.text(),
                     'location': location.text(),
                     'status': status.currentText()
-                }
-                insert_room(room)
+                })
+            insert_rooms_bulk(new_rooms)
                 
             self.load_rooms()
             QMessageBox.information(
@@ -2,14 +2,213 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget, QTableWidgetItem, QPushButton, QLabel, QHeaderView, QDialog, QFileDialog, QMessageBox
 )
 from PyQt6.QtCore import Qt
-from app.core.db import get_all_guests, get_guest_services, get_all_checkins
+from app.core.db import get_guest_service_totals, iter_guest_service_lines, iter_guest_service_totals, snapshot
+from app.core.executor import db_executor
+from app.core.money import Money
 from app.ui.dialogs.add_extra_service_dialog import AddExtraServiceDialog
 from app.ui.dialogs.view_guest_services_dialog import ViewGuestServicesDialog
+from app.utils.report_exporter import replacing
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Border, Side, PatternFill, Font, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.worksheet.page import PageMargins
 from openpyxl.worksheet.dimensions import SheetFormatProperties
-from decimal import Decimal
+from contextlib import closing
+from datetime import datetime
+from itertools import chain, groupby
+
+
+def fetch_guest_services(search_text=''):
+    """Every guest, or the guests matching search_text, with their service
+    totals (see get_guest_service_totals). Runs on a db_executor thread."""
+    return get_guest_service_totals(search_text)
+
+
+def payment_status(remaining, paid):
+    """Payment status of a guest's services; a remainder of up to 0.01 counts as paid"""
+    if remaining <= Money(1):
+        return 'Paid'
+    if paid > 0:
+        return 'Partly Paid'
+    return 'Unpaid'
+
+
+def iter_export_groups():
+    """(guest totals, service lines) per guest with services, in guest order,
+    for the XLSX export. Both are streamed from the database, so only one
+    guest's lines are held at a time."""
+    # One read transaction, so the totals and the lines agree
+    with snapshot(), closing(iter_guest_service_totals()) as totals:
+        for guest_id, lines in groupby(iter_guest_service_lines(), key=lambda line: line['guest_id']):
+            # Both streams are ordered by guest_id
+            guest = next(totals)
+            while guest['id'] != guest_id:
+                guest = next(totals)
+            yield guest, list(lines)
+
+
+# Styles of the XLSX export, shared by every cell that uses them
+THIN = Side(border_style="thin", color="000000")
+THICK = Side(border_style="thick", color="000000")
+HEADER_FILL = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+HEADER_FONT = Font(bold=True)
+CENTER = Alignment(horizontal="center", vertical="center")
+CENTER_TOP = Alignment(horizontal="center", vertical="top")
+LEFT_TOP = Alignment(horizontal="left", vertical="top")
+# Fill and font of each payment status
+STATUS_STYLES = {
+    'Paid': (PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"), Font(color="006100")),
+    'Unpaid': (PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid"), Font(color="9C0006")),
+    'Partly Paid': (PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid"), Font(color="9C5700")),
+}
+
+EXPORT_HEADER = ["Guest Name", "Service Name", "Room Number", "Quantity", "Unit Price", "Total", "Date",
+                 "Total Due", "Remaining", "Payment Status", "Notes"]
+# Total Due, Remaining and Payment Status, filled in on a guest's first row
+GUEST_TOTAL_COLUMNS = (8, 9, 10)
+# Columns with one value per guest, drawn without borders between the
+# guest's rows so they read as one block
+GUEST_COLUMNS = (1,) + GUEST_TOTAL_COLUMNS
+
+
+def charge_day(charge_date):
+    """The day of a charge_date as a date, or None when it does not start with one"""
+    try:
+        return datetime.strptime(charge_date[:10], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+class ExportStyles:
+    """The cell styles of one export workbook.
+
+    Every distinct look of a cell (its column, whether it is on the header
+    or on a guest's first or last row, its payment status, whether it holds
+    a date) becomes one hidden NamedStyle, added to the workbook the first
+    time it is needed. Applying a named style sets a cell's border, fill,
+    font, alignment and number format at once, which openpyxl does much
+    faster than setting each of them.
+    """
+
+    def __init__(self, wb):
+        self.wb = wb
+        self.names = {}
+
+    def __call__(self, col, header=False, first=False, last=False, status=None, day=False):
+        """The name of the style of a cell in column col"""
+        key = (col, header, first, last, status, day)
+        name = self.names.get(key)
+        if name is None:
+            name = self.names[key] = f"Guest Services {len(self.names) + 1}"
+            style = NamedStyle(name=name, font=DEFAULT_FONT, hidden=True)
+            inside_guest = col in GUEST_COLUMNS and not header
+            style.border = Border(
+                left=THICK if col == 1 else THIN,
+                right=THICK if col == len(EXPORT_HEADER) else THIN,
+                top=THICK if header else None if inside_guest and not first else THIN,
+                bottom=THICK if last else None if inside_guest else THIN
+            )
+            if header:
+                style.fill, style.font, style.alignment = HEADER_FILL, HEADER_FONT, CENTER
+            elif col == 1:
+                style.alignment = LEFT_TOP
+            elif col == 2:
+                style.alignment = CENTER
+            elif first and col in GUEST_TOTAL_COLUMNS:
+                style.alignment = CENTER_TOP
+            if status in STATUS_STYLES:
+                style.fill, style.font = STATUS_STYLES[status]
+            if day:
+                style.number_format = 'yyyy-mm-dd'
+            self.wb.add_named_style(style)
+        return name
+
+
+def styled_cell(ws, value, style):
+    """A cell of the write-only sheet ws holding value, in the named style"""
+    cell = WriteOnlyCell(ws, value)
+    cell.style = style
+    return cell
+
+
+def export_services_xlsx(file_path):
+    """Write the guest services sheet to file_path; returns the number of
+    service lines written, 0 (and no file) when no guest has services.
+
+    Runs on a db_executor thread. The service lines are streamed from the
+    database into a write-only workbook, so the export runs in constant
+    memory however many there are. A guest's name, totals and payment
+    status are on the first row of their lines, and a thick border under
+    the last.
+    """
+    with closing(iter_export_groups()) as groups:
+        group = next(groups, None)
+        if group is None:
+            return 0
+        written = 0
+        with replacing(file_path) as temp_path:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Guest Services")
+            # Everything but the rows has to be set before the first row
+            # Set margins
+            ws.page_margins = PageMargins(left=0.5, right=0.5, top=0.5, bottom=0.5, header=0, footer=0)
+            # Set page orientation to Landscape
+            ws.page_setup.orientation = 'landscape'
+            # Fit to 1 page wide, blank for tall
+            ws.page_setup.fitToWidth = 1
+            ws.page_setup.fitToHeight = 0
+            # Set paper size to A4 (9 = A4)
+            ws.page_setup.paperSize = 9
+            # Center horizontally on page
+            ws.page_setup.horizontalCentered = True
+            # Set column widths
+            ws.column_dimensions['A'].width = 40
+            ws.column_dimensions['B'].width = 20
+            ws.column_dimensions['C'].width = 10  # Room Number
+            ws.column_dimensions['D'].width = 10
+            ws.column_dimensions['E'].width = 10
+            ws.column_dimensions['F'].width = 10
+            ws.column_dimensions['G'].width = 15
+            ws.column_dimensions['H'].width = 15  # Total Due
+            ws.column_dimensions['I'].width = 15  # Remaining
+            ws.column_dimensions['J'].width = 15  # Payment Status
+            ws.column_dimensions['K'].width = 20  # Notes
+            # Freeze top row
+            ws.freeze_panes = "A2"
+            styles = ExportStyles(wb)
+            # Header row
+            ws.append([styled_cell(ws, title, styles(col, header=True))
+                       for col, title in enumerate(EXPORT_HEADER, 1)])
+
+            for guest, lines in chain([group], groups):
+                guest_payment_status = payment_status(guest['total_remaining'], guest['total_paid'])
+                for j, line in enumerate(lines):
+                    first, last = j == 0, j == len(lines) - 1
+                    day = charge_day(line['charge_date'])
+                    # openpyxl writes Decimal cells, not Money
+                    values = [
+                        line['guest_name'] if first else '',
+                        line['service_name'], guest['room_number'] or '', line['quantity'],
+                        Money.of(line['unit_price_at_time_of_charge'] or 0).to_decimal(),
+                        Money.of(line['total_charge'] or 0).to_decimal(),
+                        day or line['charge_date'],
+                        f"{guest['total_amount']:.2f}" if first else '',  # Total Due
+                        f"{guest['total_remaining']:.2f}" if first else '',  # Remaining
+                        guest_payment_status if first else '',  # Payment Status
+                        line['notes']
+                    ]
+                    ws.append([
+                        styled_cell(ws, value, styles(col, first=first, last=last,
+                                                      status=guest_payment_status if first and col == 10 else None,
+                                                      day=col == 7 and day is not None))
+                        for col, value in enumerate(values, 1)
+                    ])
+                written += len(lines)
+
+            wb.save(temp_path)
+    return written
+
 
 class ServicesReportTab(QWidget):
     def __init__(self, parent=None):
@@ -57,65 +256,39 @@ class ServicesReportTab(QWidget):
         self.load_guests()
 
     def load_guests(self):
-        guests = get_all_guests()
-        self.all_guests = guests
-        self.display_guests(guests)
+        """Load guests and their services in the background"""
+        self.search_guests()
+
+    def on_load_failed(self, error):
+        QMessageBox.warning(self, "Error", str(error))
 
     def display_guests(self, guests):
+        """Show the guests fetch_guest_services returned"""
         self.guest_table.setRowCount(len(guests))
         for row, guest in enumerate(guests):
             name = f"{guest['first_name']} {guest['last_name']}"
             self.guest_table.setItem(row, 0, QTableWidgetItem(name))
             self.guest_table.setItem(row, 1, QTableWidgetItem(guest.get('id_number') or ""))
-            
-            # Get guest services and calculate totals
-            services = get_guest_services(guest['id'])
-            total_services = len(services)
-            
-            if total_services == 0:
+            self.guest_table.setItem(row, 2, QTableWidgetItem(str(guest['service_count'])))
+            self.guest_table.setItem(row, 3, QTableWidgetItem(f"{guest['total_amount']:.2f}"))
+            self.guest_table.setItem(row, 4, QTableWidgetItem(f"{guest['total_paid']:.2f}"))
+            self.guest_table.setItem(row, 5, QTableWidgetItem(f"{guest['total_remaining']:.2f}"))
+            if guest['service_count'] == 0:
                 # Guest has no services
-                self.guest_table.setItem(row, 2, QTableWidgetItem("0"))
-                self.guest_table.setItem(row, 3, QTableWidgetItem("0.00"))
-                self.guest_table.setItem(row, 4, QTableWidgetItem("0.00"))
-                self.guest_table.setItem(row, 5, QTableWidgetItem("0.00"))
                 self.guest_table.setItem(row, 6, QTableWidgetItem(""))
             else:
-                total_amount = sum(Decimal(str(s.get('total_charge', 0))) for s in services)
-                total_paid = Decimal('0')
-                total_remaining = Decimal('0')
-                unpaid_services = [s for s in services if not s.get('is_paid', 0)]
-                paid_services = [s for s in services if s.get('is_paid', 0)]
-                if unpaid_services:
-                    # There are unpaid services
-                    total_remaining = sum(Decimal(str(s.get('total_charge', 0))) for s in unpaid_services)
-                    # If any payment has been made, get it from the first unpaid service
-                    total_paid = Decimal(str(unpaid_services[0].get('amount_paid', 0))) if unpaid_services else Decimal('0')
-                else:
-                    # All services are paid
-                    total_remaining = Decimal('0')
-                    total_paid = total_amount
-                # Determine payment status
-                if total_remaining <= Decimal('0.01'):
-                    payment_status = 'Paid'
-                elif total_paid > 0:
-                    payment_status = 'Partly Paid'
-                else:
-                    payment_status = 'Unpaid'
-                self.guest_table.setItem(row, 2, QTableWidgetItem(str(total_services)))
-                self.guest_table.setItem(row, 3, QTableWidgetItem(f"{total_amount:.2f}"))
-                self.guest_table.setItem(row, 4, QTableWidgetItem(f"{total_paid:.2f}"))
-                self.guest_table.setItem(row, 5, QTableWidgetItem(f"{total_remaining:.2f}"))
-                self.guest_table.setItem(row, 6, QTableWidgetItem(payment_status))
-                status_item = self.guest_table.item(row, 6)
-                if payment_status == 'Paid':
+                status = payment_status(guest['total_remaining'], guest['total_paid'])
+                status_item = QTableWidgetItem(status)
+                if status == 'Paid':
                     status_item.setBackground(Qt.GlobalColor.green)
                     status_item.setForeground(Qt.GlobalColor.white)
-                elif payment_status == 'Unpaid':
+                elif status == 'Unpaid':
                     status_item.setBackground(Qt.GlobalColor.red)
                     status_item.setForeground(Qt.GlobalColor.white)
-                elif payment_status == 'Partly Paid':
+                elif status == 'Partly Paid':
                     status_item.setBackground(Qt.GlobalColor.yellow)
                     status_item.setForeground(Qt.GlobalColor.black)
+                self.guest_table.setItem(row, 6, status_item)
             # Actions
             actions_widget = QWidget()
             actions_layout = QHBoxLayout(actions_widget)
@@ -133,9 +306,11 @@ class ServicesReportTab(QWidget):
             self.guest_table.setCellWidget(row, 7, actions_widget)
 
     def search_guests(self):
-        search_text = self.search_input.text().lower()
-        filtered = [g for g in self.all_guests if search_text in f"{g['first_name']} {g['last_name']}".lower()]
-        self.display_guests(filtered)
+        # Typing again cancels the previous, now outdated, search
+        search_text = self.search_input.text().strip()
+        job = db_executor.submit(fetch_guest_services, search_text, group=(self, 'guests'))
+        job.finished.connect(self.display_guests)
+        job.failed.connect(self.on_load_failed)
 
     def open_add_extras_dialog(self, guest):
         dialog = AddExtraServiceDialog(guest, self)
@@ -151,223 +326,16 @@ class ServicesReportTab(QWidget):
         pass
 
     def export_as_xlsx(self):
-        # Gather all guest services
-        thin = Side(border_style="thin", color="000000")
-        thick = Side(border_style="thick", color="000000")
-        guests = get_all_guests()
-        all_data = []
-        checkins = get_all_checkins()
-        for guest in guests:
-            # Find latest check-in for this guest (if any)
-            guest_checkins = [c for c in checkins if c.get('guest_id') == guest['id']]
-            room_number = ''
-            if guest_checkins:
-                # Use the most recent check-in
-                latest_checkin = max(guest_checkins, key=lambda c: c.get('checkin_date', ''))
-                room_number = latest_checkin.get('room_number', '')
-            services = get_guest_services(guest['id'])
-            for s in services:
-                all_data.append({
-                    'guest_id': guest['id'],
-                    'guest_name': f"{guest['first_name']} {guest['last_name']}",
-                    'room_number': room_number,
-                    'service_name': s.get('service_name', ''),
-                    'quantity': s.get('quantity', 0),
-                    'unit_price': s.get('unit_price_at_time_of_charge', 0),
-                    'total': s.get('total_charge', 0),
-                    'date': s.get('charge_date', ''),
-                    'status': 'Paid' if s.get('is_paid', 0) else ('Partly Paid' if s.get('amount_paid', 0) else 'Unpaid'),
-                    'notes': s.get('notes', ''),
-                    'amount_paid': s.get('amount_paid', 0),
-                    'remaining_amount': s.get('remaining_amount', 0)
-                })
-        if not all_data:
-            QMessageBox.information(self, "Export", "No data to export.")
-            return
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Guest Services"
-        # Set margins
-        ws.page_margins = PageMargins(left=0.5, right=0.5, top=0.5, bottom=0.5, header=0, footer=0)
-        # Set page orientation to Landscape
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
-        # Fit to 1 page wide, blank for tall
-        ws.page_setup.fitToWidth = 1
-        ws.page_setup.fitToHeight = 0 
-        # Set paper size to A4 (9 = A4)
-        ws.page_setup.paperSize = 9
-        # Center horizontally on page
-        ws.page_setup.horizontalCentered = True
-        # Set column widths
-        ws.column_dimensions['A'].width = 40
-        ws.column_dimensions['B'].width = 20
-        ws.column_dimensions['C'].width = 10  # Room Number
-        ws.column_dimensions['D'].width = 10
-        ws.column_dimensions['E'].width = 10
-        ws.column_dimensions['F'].width = 10
-        ws.column_dimensions['G'].width = 15
-        ws.column_dimensions['H'].width = 15  # Total Due
-        ws.column_dimensions['I'].width = 15  # Remaining
-        ws.column_dimensions['J'].width = 15  # Payment Status
-        ws.column_dimensions['K'].width = 20  # Notes
-        # Header row
-        header = ["Guest Name", "Service Name", "Room Number", "Quantity", "Unit Price", "Total", "Date", "Total Due", "Remaining", "Payment Status", "Notes"]
-        ws.append(header)
-        # Style header
-        fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-        font = Font(bold=True)
-        for col in range(1, len(header) + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.fill = fill
-            cell.font = font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Create named styles for payment status
-        good_style = NamedStyle(name="good")
-        good_style.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # Light green
-        good_style.font = Font(color="006100")  # Dark green text
-        
-        bad_style = NamedStyle(name="bad")
-        bad_style.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")  # Light red
-        bad_style.font = Font(color="9C0006")  # Dark red text
-        
-        neutral_style = NamedStyle(name="neutral")
-        neutral_style.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")  # Light yellow
-        neutral_style.font = Font(color="9C5700")  # Dark orange text
-        
-        # Write data with merged guest name cells
-        row_idx = 2  # Excel rows are 1-indexed, and row 1 is header
-        i = 0
-        date_style = NamedStyle(name="short_date")
-        date_style.number_format = 'yyyy-mm-dd'
-        thick_border_rows = []  # Track rows that need thick bottom borders
-        
-        while i < len(all_data):
-            guest_id = all_data[i]['guest_id']
-            # Count how many rows for this guest
-            count = 1
-            while i + count < len(all_data) and all_data[i + count]['guest_id'] == guest_id:
-                count += 1
-            
-            # Calculate totals for this guest
-            guest_services = [all_data[i + j] for j in range(count)]
-            guest_total_due = sum(Decimal(str(s['total'])) for s in guest_services)
-
-            # A payment transaction has occurred if any service for the guest has a non-zero amount_paid.
-            # The DB logic stamps the same payment info (amount_paid, remaining_amount) on all services for a guest during a transaction.
-            payment_has_occurred = any(Decimal(str(s.get('amount_paid', 0))) > 0 for s in guest_services)
-
-            if payment_has_occurred:
-                # If a payment was made, the 'remaining_amount' on the service records reflects the guest's total remaining balance.
-                # All service records for that guest updated in the same transaction will have the same remaining_amount.
-                # We can just take it from the first service record.
-                guest_remaining = Decimal(str(guest_services[0].get('remaining_amount', '0')))
-                guest_total_paid = guest_total_due - guest_remaining
-            else:
-                # No payment has ever been made for this guest.
-                guest_total_paid = Decimal('0')
-                guest_remaining = guest_total_due
-            
-            # Ensure remaining is not negative.
-            guest_remaining = max(Decimal('0'), guest_remaining)
-            guest_total_paid = max(Decimal('0'), guest_total_paid)
-
-            # Determine overall payment status for this guest. Using a small epsilon for safety.
-            if guest_remaining <= Decimal('0.01'):
-                guest_payment_status = 'Paid'
-            elif guest_total_paid > 0:
-                guest_payment_status = 'Partly Paid'
-            else:
-                guest_payment_status = 'Unpaid'
-            
-            # Write rows
-            for j in range(count):
-                row = all_data[i + j]
-                ws.append([
-                    row['guest_name'] if j == 0 else '',
-                    row['service_name'], row['room_number'], row['quantity'], row['unit_price'],
-                    row['total'], row['date'],
-                    f"{guest_total_due:.2f}" if j == 0 else '',  # Total Due (only in first row)
-                    f"{guest_remaining:.2f}" if j == 0 else '',  # Remaining (only in first row)
-                    guest_payment_status if j == 0 else '',  # Payment Status (only in first row)
-                    row['notes']
-                ])
-                # Align guest name (A) left, service name (B) center
-                ws.cell(row=row_idx + j, column=1).alignment = Alignment(horizontal="left", vertical="top")
-                ws.cell(row=row_idx + j, column=2).alignment = Alignment(horizontal="center", vertical="center")
-                
-                # Apply payment status cell style to the merged cell
-                if j == 0:  # Only for the first row of each guest
-                    status_cell = ws.cell(row=row_idx + j, column=10)  # Payment Status column
-                    if guest_payment_status == 'Paid':
-                        status_cell.style = good_style
-                    elif guest_payment_status == 'Unpaid':
-                        status_cell.style = bad_style
-                    elif guest_payment_status == 'Partly Paid':
-                        status_cell.style = neutral_style
-                
-                # Format date cell as short date if possible
-                date_cell = ws.cell(row=row_idx + j, column=7)
-                try:
-                    # Try to parse and set as date
-                    import datetime
-                    if row['date']:
-                        date_obj = datetime.datetime.strptime(row['date'][:10], '%Y-%m-%d')
-                        date_cell.value = date_obj
-                        date_cell.style = date_style
-                except Exception:
-                    pass
-                
-                # Align Total Due and Remaining columns (center top)
-                if j == 0:  # Only for the first row of each guest
-                    ws.cell(row=row_idx + j, column=8).alignment = Alignment(horizontal="center", vertical="top")  # Total Due
-                    ws.cell(row=row_idx + j, column=9).alignment = Alignment(horizontal="center", vertical="top")  # Remaining
-                    ws.cell(row=row_idx + j, column=10).alignment = Alignment(horizontal="center", vertical="top")  # Payment Status
-            
-            # Merge guest name cells if more than one row
-            if count > 1:
-                ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx + count - 1, end_column=1)
-                # Merge Total Due, Remaining, and Payment Status cells
-                ws.merge_cells(start_row=row_idx, start_column=8, end_row=row_idx + count - 1, end_column=8)  # Total Due
-                ws.merge_cells(start_row=row_idx, start_column=9, end_row=row_idx + count - 1, end_column=9)  # Remaining
-                ws.merge_cells(start_row=row_idx, start_column=10, end_row=row_idx + count - 1, end_column=10)  # Payment Status
-            
-            # Mark the last row of this guest's group for thick border
-            thick_border_rows.append(row_idx + count - 1)
-            
-            row_idx += count
-            i += count
-        
-        # Apply borders - general borders first
-        for r in range(1, ws.max_row + 1):
-            for c in range(1, ws.max_column + 1):
-                cell = ws.cell(row=r, column=c)
-                # Thick border for outside, thin for inside
-                border = Border(
-                    left=thick if c == 1 else thin,
-                    right=thick if c == ws.max_column else thin,
-                    top=thick if r == 1 else thin,
-                    bottom=thick if r == ws.max_row else thin
-                )
-                cell.border = border
-        
-        # Now apply thick borders under each guest's group
-        for row_num in thick_border_rows:
-            for col in range(1, ws.max_column + 1):
-                cell = ws.cell(row=row_num, column=col)
-                border = cell.border
-                cell.border = Border(
-                    left=border.left,
-                    right=border.right,
-                    top=border.top,
-                    bottom=thick
-                )
-        
-        # Freeze top row
-        ws.freeze_panes = ws["A2"]
-        # Save file dialog
+        # Ask where to save the sheet, then write it in the background
         file_path, _ = QFileDialog.getSaveFileName(self, "Save XLSX Report", "guest_services_report.xlsx", "Excel Files (*.xlsx)")
-        if file_path:
-            wb.save(file_path)
-            QMessageBox.information(self, "Export", f"Report exported to {file_path}")
\ No newline at end of file
+        if not file_path:
+            return
+        job = db_executor.submit(export_services_xlsx, file_path, group=(self, 'export'))
+        job.finished.connect(lambda lines: self.export_finished(file_path, lines))
+        job.failed.connect(self.on_load_failed)
+
+    def export_finished(self, file_path, lines):
+        if lines == 0:
+            QMessageBox.information(self, "Export", "No data to export.")
+        else:
+            QMessageBox.information(self, "Export", f"Report exported to {file_path}")
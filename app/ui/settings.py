@@ -1,14 +1,19 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget,
     QLineEdit, QFormLayout, QTableWidget, QTableWidgetItem, QHeaderView,
-    QDialog, QDialogButtonBox, QDoubleSpinBox, QComboBox, QCheckBox, QFrame
+    QDialog, QDialogButtonBox, QDoubleSpinBox, QComboBox, QCheckBox, QFrame,
+    QSpinBox, QFileDialog, QMessageBox
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QColor, QPainter, QPixmap
 from app.core.db import (
     get_hotel_settings, update_hotel_settings,
-    get_tax_rates, add_tax_rate, update_tax_rate, delete_tax_rate
+    get_tax_rates, add_tax_rate, update_tax_rate, delete_tax_rate, rebuild_daily_stats
 )
+from app.core.archive import archive_history
+from app.core.backup import backup_scheduler, list_backups, restore_backup
+from app.core.config_handler import app_config
+from app.core.instrumentation import query_stats
 
 class SettingsWidget(QWidget):
     def __init__(self, parent=None):
@@ -31,6 +36,16 @@ class SettingsWidget(QWidget):
         self.setup_tax_rates_tab()
         self.tab_widget.addTab(self.tax_rates_tab, QIcon(":/icons/tax_rates.png"), "Tax Rates")
         
+        # Diagnostics tab
+        self.diagnostics_tab = QWidget()
+        self.setup_diagnostics_tab()
+        self.tab_widget.addTab(self.diagnostics_tab, QIcon(":/icons/reports.png"), "Diagnostics")
+        
+        # Backups tab
+        self.backups_tab = QWidget()
+        self.setup_backups_tab()
+        self.tab_widget.addTab(self.backups_tab, QIcon(":/icons/reports.png"), "Backups")
+        
         layout.addWidget(self.tab_widget)
         
     def setup_hotel_info_tab(self):
@@ -94,6 +109,202 @@ class SettingsWidget(QWidget):
         # Load existing tax rates
         self.load_tax_rates()
         
+    def setup_diagnostics_tab(self):
+        layout = QVBoxLayout(self.diagnostics_tab)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(20)
+        
+        # Recording options
+        options_layout = QHBoxLayout()
+        self.query_stats_checkbox = QCheckBox("Record query statistics")
+        self.query_stats_checkbox.setChecked(query_stats.enabled)
+        self.query_stats_checkbox.toggled.connect(self.toggle_query_stats)
+        options_layout.addWidget(self.query_stats_checkbox)
+        options_layout.addWidget(QLabel("Slow query threshold (ms):"))
+        self.slow_query_ms = QSpinBox()
+        self.slow_query_ms.setRange(1, 60000)
+        self.slow_query_ms.setValue(int(query_stats.slow_query_ms))
+        self.slow_query_ms.valueChanged.connect(self.update_slow_query_threshold)
+        options_layout.addWidget(self.slow_query_ms)
+        options_layout.addStretch()
+        layout.addLayout(options_layout)
+        
+        # Per-function and per-statement tables
+        headers = ["Calls", "Rows", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Total (ms)"]
+        self.function_stats_table = QTableWidget()
+        self.function_stats_table.setColumnCount(7)
+        self.function_stats_table.setHorizontalHeaderLabels(["Function"] + headers)
+        self.statement_stats_table = QTableWidget()
+        self.statement_stats_table.setColumnCount(7)
+        self.statement_stats_table.setHorizontalHeaderLabels(["SQL"] + headers)
+        for table in (self.function_stats_table, self.statement_stats_table):
+            table.setAlternatingRowColors(True)
+            table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+            table.setObjectName("dataTable")
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+            layout.addWidget(table)
+        
+        # Actions
+        buttons_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.setObjectName("actionButton")
+        refresh_btn.clicked.connect(self.load_query_stats)
+        reset_btn = QPushButton("Reset")
+        reset_btn.setObjectName("actionButton")
+        reset_btn.clicked.connect(self.reset_query_stats)
+        export_btn = QPushButton("Export JSON")
+        export_btn.setObjectName("actionButton")
+        export_btn.clicked.connect(self.export_query_stats)
+        buttons_layout.addWidget(refresh_btn)
+        buttons_layout.addWidget(reset_btn)
+        buttons_layout.addWidget(export_btn)
+        buttons_layout.addStretch()
+        archive_btn = QPushButton("Archive Old History")
+        archive_btn.setObjectName("actionButton")
+        archive_btn.clicked.connect(self.archive_old_history)
+        buttons_layout.addWidget(archive_btn)
+        stats_btn = QPushButton("Rebuild Daily Statistics")
+        stats_btn.setObjectName("actionButton")
+        stats_btn.clicked.connect(self.rebuild_statistics)
+        buttons_layout.addWidget(stats_btn)
+        layout.addLayout(buttons_layout)
+        
+        self.load_query_stats()
+        
+    def toggle_query_stats(self, enabled):
+        if enabled:
+            query_stats.enable()
+        else:
+            query_stats.disable()
+        app_config.set('Diagnostics', 'query_stats', 'yes' if enabled else 'no')
+        
+    def update_slow_query_threshold(self, value):
+        query_stats.slow_query_ms = value
+        app_config.set('Diagnostics', 'slow_query_ms', value)
+        
+    def load_query_stats(self):
+        report = query_stats.report()
+        for table, rows in ((self.function_stats_table, report['functions']),
+                            (self.statement_stats_table, report['statements'])):
+            table.setRowCount(len(rows))
+            for row, stat in enumerate(rows):
+                name_item = QTableWidgetItem(stat['name'])
+                name_item.setToolTip(stat['name'])
+                table.setItem(row, 0, name_item)
+                table.setItem(row, 1, QTableWidgetItem(str(stat['calls'])))
+                table.setItem(row, 2, QTableWidgetItem(str(stat['rows'])))
+                for col, key in enumerate(('p50_ms', 'p95_ms', 'p99_ms', 'total_ms'), start=3):
+                    table.setItem(row, col, QTableWidgetItem(f"{stat[key]:.2f}"))
+                    
+    def reset_query_stats(self):
+        query_stats.reset()
+        self.load_query_stats()
+        
+    def export_query_stats(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Query Statistics", "query_stats.json", "JSON Files (*.json)")
+        if not path:
+            return
+        try:
+            query_stats.dump_json(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", str(e))
+        
+    def setup_backups_tab(self):
+        layout = QVBoxLayout(self.backups_tab)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(20)
+        
+        days = app_config.get('Database', 'backup_days', '7')
+        layout.addWidget(QLabel(f"Backups are taken automatically and kept for {days} days."))
+        
+        self.backups_table = QTableWidget()
+        self.backups_table.setColumnCount(3)
+        self.backups_table.setHorizontalHeaderLabels(["Date", "Size (KB)", "File"])
+        self.backups_table.setAlternatingRowColors(True)
+        self.backups_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.backups_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.backups_table.setObjectName("dataTable")
+        self.backups_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.backups_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.backups_table)
+        
+        buttons_layout = QHBoxLayout()
+        backup_btn = QPushButton("Back Up Now")
+        backup_btn.setObjectName("actionButton")
+        backup_btn.clicked.connect(backup_scheduler.run)
+        restore_btn = QPushButton("Restore Selected")
+        restore_btn.setObjectName("actionButton")
+        restore_btn.clicked.connect(self.restore_selected_backup)
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.setObjectName("actionButton")
+        refresh_btn.clicked.connect(self.load_backups)
+        buttons_layout.addWidget(backup_btn)
+        buttons_layout.addWidget(restore_btn)
+        buttons_layout.addWidget(refresh_btn)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+        
+        backup_scheduler.finished.connect(self.load_backups)
+        self.load_backups()
+        
+    def load_backups(self):
+        self.backups = list_backups()
+        self.backups_table.setRowCount(len(self.backups))
+        for row, backup in enumerate(self.backups):
+            self.backups_table.setItem(row, 0, QTableWidgetItem(backup['created'].strftime('%Y-%m-%d %H:%M:%S')))
+            self.backups_table.setItem(row, 1, QTableWidgetItem(f"{backup['size'] / 1024:,.0f}"))
+            self.backups_table.setItem(row, 2, QTableWidgetItem(backup['path']))
+            
+    def restore_selected_backup(self):
+        row = self.backups_table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "Error", "Please select a backup to restore.")
+            return
+        backup = self.backups[row]
+        reply = QMessageBox.question(
+            self, "Restore Backup",
+            f"Replace all current data with the backup of {backup['created']:%Y-%m-%d %H:%M}?\n"
+            "Close the application on every other terminal first.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            safety_path = restore_backup(backup['path'])
+        except Exception as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        self.load_backups()
+        QMessageBox.information(
+            self, "Restore Backup",
+            f"The backup was restored. The previous data was saved to:\n{safety_path}\n\n"
+            "Please restart the application.")
+
+    def archive_old_history(self):
+        months = int(app_config.get('Database', 'archive_after_months', '12'))
+        reply = QMessageBox.question(
+            self, "Archive Old History",
+            f"Move checked-out stays and reservations older than {months} months to the archive database?\n"
+            "They stay available in reports.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            moved = archive_history(months)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        QMessageBox.information(self, "Archive Old History",
+                                "\n".join(f"{table}: {count}" for table, count in moved.items()))
+
+    def rebuild_statistics(self):
+        try:
+            count = rebuild_daily_stats()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        QMessageBox.information(self, "Rebuild Daily Statistics", f"{count} daily statistics row(s) rebuilt.")
+
     def load_hotel_info(self):
         settings = get_hotel_settings()
         if settings:
@@ -268,7 +479,7 @@ class SettingsWidget(QWidget):
         amount.setRange(0, 10000)
         amount.setDecimals(2)
         amount.setPrefix("MAD ")
-        amount.setValue(rate['amount'] if rate['amount'] is not None else 0)
+        amount.setValue(float(rate['amount']) if rate['amount'] is not None else 0)
         
         # Add initial value widget
         if rate['tax_type'] == 'percentage':
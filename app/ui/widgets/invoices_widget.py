@@ -4,8 +4,9 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon
-import json
-from app.core.db import add_invoice, get_invoices, get_company_accounts, get_company_account
+from app.core.db import add_invoice, get_invoices_page, get_invoice_lines, get_company_accounts, get_company_account
+from app.core.money import Money
+from app.ui.widgets.paged_table import TablePager
 from datetime import datetime, timedelta
 import os
 from fpdf import FPDF
@@ -207,21 +208,53 @@ class InvoicesWidget(QWidget):
             "Invoice #", "Customer", "Date", "Total", "PDF", "Actions"
         ])
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.history_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.history_table.cellDoubleClicked.connect(self.show_invoice_lines)
         layout.addWidget(self.history_table)
+        self.history_pager = TablePager(self.history_table, get_invoices_page, self.add_invoice_row)
         self.load_invoices()
 
     def load_invoices(self):
-        invoices = get_invoices()
-        self.history_table.setRowCount(len(invoices))
-        for row, inv in enumerate(invoices):
-            self.history_table.setItem(row, 0, QTableWidgetItem(inv['invoice_number']))
-            self.history_table.setItem(row, 1, QTableWidgetItem(inv['customer_name']))
-            self.history_table.setItem(row, 2, QTableWidgetItem(inv['date_generated']))
-            self.history_table.setItem(row, 3, QTableWidgetItem(f"{inv['total_amount']:.2f}"))
-            self.history_table.setItem(row, 4, QTableWidgetItem(os.path.basename(inv['pdf_path']) if inv['pdf_path'] else "-"))
-            btn = QPushButton("Review PDF")
-            btn.clicked.connect(lambda checked, path=inv['pdf_path']: self.open_pdf(path))
-            self.history_table.setCellWidget(row, 5, btn)
+        self.history_pager.reset()
+
+    def add_invoice_row(self, inv):
+        row = self.history_table.rowCount()
+        self.history_table.insertRow(row)
+        number_item = QTableWidgetItem(inv['invoice_number'])
+        number_item.setData(Qt.ItemDataRole.UserRole, inv['id'])
+        self.history_table.setItem(row, 0, number_item)
+        self.history_table.setItem(row, 1, QTableWidgetItem(inv['customer_name']))
+        self.history_table.setItem(row, 2, QTableWidgetItem(inv['date_generated']))
+        self.history_table.setItem(row, 3, QTableWidgetItem(f"{inv['total_amount']:.2f}"))
+        self.history_table.setItem(row, 4, QTableWidgetItem(os.path.basename(inv['pdf_path']) if inv['pdf_path'] else "-"))
+        btn = QPushButton("Review PDF")
+        btn.clicked.connect(lambda checked, path=inv['pdf_path']: self.open_pdf(path))
+        self.history_table.setCellWidget(row, 5, btn)
+
+    def show_invoice_lines(self, row, column):
+        """Show the line items of the invoice double-clicked in the history table"""
+        number_item = self.history_table.item(row, 0)
+        if number_item is None:
+            return
+        lines = get_invoice_lines(number_item.data(Qt.ItemDataRole.UserRole))
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Invoice {number_item.text()}")
+        dialog.resize(600, 300)
+        layout = QVBoxLayout(dialog)
+        table = QTableWidget(len(lines), 4)
+        table.setHorizontalHeaderLabels(["Description", "Quantity", "Unit Price", "Line Total"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for i, line in enumerate(lines):
+            table.setItem(i, 0, QTableWidgetItem(line['description']))
+            table.setItem(i, 1, QTableWidgetItem(f"{line['quantity']:g}"))
+            table.setItem(i, 2, QTableWidgetItem(f"{line['unit_price']:.2f}"))
+            table.setItem(i, 3, QTableWidgetItem(f"{line['line_total']:.2f}"))
+        layout.addWidget(table)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        dialog.exec()
 
     def open_pdf(self, path):
         if path and os.path.exists(path):
@@ -242,27 +275,27 @@ class InvoicesWidget(QWidget):
 
         # Gather items
         items = []
-        subtotal = 0
+        subtotal = Money(0)
         for row in range(self.items_table.rowCount()):
             desc = self.items_table.item(row, 0).text() if self.items_table.item(row, 0) else ""
             qty = self.items_table.cellWidget(row, 1).value() if self.items_table.cellWidget(row, 1) else 1
             unit_price = self.items_table.cellWidget(row, 2).value() if self.items_table.cellWidget(row, 2) else 0
-            line_total = qty * unit_price
+            line_total = Money.of(unit_price) * qty
             subtotal += line_total
             items.append({
                 'description': desc,
                 'quantity': qty,
                 'unit_price': unit_price,
-                'line_total': line_total
+                'line_total': float(line_total)
             })
         # Global tax
         tax_name = self.tax_name.text().strip()
         tax_value = self.tax_value.value()
         tax_type = self.tax_type_combo.currentText()
         if tax_type == "Percentage (%)":
-            tax_amount = subtotal * (tax_value / 100)
+            tax_amount = subtotal.percent(tax_value)
         else:
-            tax_amount = tax_value
+            tax_amount = Money.of(tax_value)
         total_amount = subtotal + tax_amount
         balance_due = total_amount
 
@@ -284,7 +317,7 @@ class InvoicesWidget(QWidget):
             'customer_phone': customer_phone,
             'billing_address': billing_address,
             'tax_id': tax_id,
-            'items': json.dumps(items),
+            'items': items,
             'subtotal': subtotal,
             'tax_amount': tax_amount,
             'total_amount': total_amount,
@@ -0,0 +1,82 @@
+from PyQt6.QtCore import QDate
+from PyQt6.QtWidgets import QDateEdit
+from app.core.db import PAGE_SIZE
+
+# The earliest date of a list's date filter, shown as "Any" (no filter)
+ANY_DATE = QDate(2000, 1, 1)
+
+
+class TablePager:
+    """Fills a QTableWidget one keyset page at a time.
+
+    fetch_page(after=..., limit=...) is one of the db.get_*_page functions and
+    add_row(row) appends a single record to the table. The next page is
+    fetched when the user scrolls near the bottom, so opening a list only
+    costs the first page however much history the database holds.
+
+    filters(), when given, returns the list's current search filters as
+    more keyword arguments of fetch_page; every page is fetched with them,
+    so call reset() whenever one of them changes.
+    """
+
+    # Rows left below the viewport when the next page is requested
+    PREFETCH_ROWS = 10
+
+    def __init__(self, table, fetch_page, add_row, page_size=PAGE_SIZE, filters=None):
+        self.table = table
+        self.fetch_page = fetch_page
+        self.add_row = add_row
+        self.filters = filters
+        self.page_size = page_size
+        self.last_row = None
+        self.exhausted = False
+        table.verticalScrollBar().valueChanged.connect(self._on_scroll)
+
+    def reset(self):
+        """Clear the table and load the first page"""
+        self.table.setRowCount(0)
+        self.last_row = None
+        self.exhausted = False
+        self.load_more()
+
+    def stop(self):
+        """Stop paging, e.g. while the table shows search results"""
+        self.exhausted = True
+
+    def load_more(self):
+        """Append the next page; returns the number of rows added"""
+        if self.exhausted:
+            return 0
+        filters = self.filters() if self.filters is not None else {}
+        rows = self.fetch_page(after=self.last_row, limit=self.page_size, **filters)
+        for row in rows:
+            self.add_row(row)
+        if rows:
+            self.last_row = rows[-1]
+        self.exhausted = len(rows) < self.page_size
+        return len(rows)
+
+    def _on_scroll(self, _value):
+        # rowAt() works for both per-item and per-pixel scroll modes; -1
+        # means the viewport already extends past the last row.
+        last_visible = self.table.rowAt(self.table.viewport().height() - 1)
+        if last_visible < 0 or last_visible >= self.table.rowCount() - self.PREFETCH_ROWS:
+            self.load_more()
+
+
+def date_filter():
+    """A date edit for filtering a paged list, showing "Any" until a date is picked"""
+    edit = QDateEdit()
+    edit.setCalendarPopup(True)
+    edit.setDisplayFormat("yyyy-MM-dd")
+    edit.setMinimumDate(ANY_DATE)
+    edit.setSpecialValueText("Any")
+    edit.setDate(ANY_DATE)
+    return edit
+
+
+def date_filter_value(edit):
+    """The date picked in a date_filter() as 'YYYY-MM-DD', or None while it shows Any"""
+    if edit.date() == ANY_DATE:
+        return None
+    return edit.date().toString("yyyy-MM-dd")
@@ -1,43 +1,143 @@
+import csv
+import os
+import uuid
+from contextlib import closing, contextmanager
 from fpdf import FPDF
 from openpyxl import Workbook
+from app.core.report_engine import REPORTS, iter_report
 
-def export_checkins_pdf(table_widget, file_path):
-    pdf = FPDF()
+# Rows written between two progress reports of export_report
+PROGRESS_ROWS = 500
+
+PDF_ROW_HEIGHT = 10
+
+# The exporters take the column headers and an iterable of rows (lists of
+# cell texts) and write the rows as they come, so a streamed report is
+# never held in memory whole.
+
+def export_rows_csv(headers, rows, file_path, title=None):
+    # utf-8-sig so Excel opens the file with the right encoding
+    with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+class _ReportPDF(FPDF):
+    """Pages numbered in the footer; export_rows_pdf repeats the column
+    headers at the top of each page"""
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", size=8)
+        self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+
+def export_rows_pdf(headers, rows, file_path, title=None):
+    pdf = _ReportPDF()
     pdf.add_page()
+
+    if title:
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, title, ln=1, align="C")
     pdf.set_font("Arial", size=10)
 
-    col_count = table_widget.columnCount()
-    headers = [table_widget.horizontalHeaderItem(i).text() for i in range(col_count)]
+    col_count = len(headers)
     col_widths = [190 / col_count] * col_count
 
-    pdf.set_fill_color(200, 220, 255)
-    for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], 10, header, border=1, ln=0, align="C", fill=True)
-    pdf.ln()
-
-    row_count = table_widget.rowCount()
-    for row in range(row_count):
-        for col in range(col_count):
-            item = table_widget.item(row, col)
-            text = item.text() if item else ""
-            pdf.cell(col_widths[col], 10, text, border=1, ln=0, align="C")
+    def header_row():
+        pdf.set_fill_color(200, 220, 255)
+        for i, header in enumerate(headers):
+            pdf.cell(col_widths[i], PDF_ROW_HEIGHT, header, border=1, ln=0, align="C", fill=True)
+        pdf.ln()
+
+    header_row()
+    for row in rows:
+        if pdf.get_y() + PDF_ROW_HEIGHT > pdf.page_break_trigger:
+            pdf.add_page()
+            header_row()
+        for col, text in enumerate(row):
+            pdf.cell(col_widths[col], PDF_ROW_HEIGHT, text, border=1, ln=0, align="C")
         pdf.ln()
 
     pdf.output(file_path)
 
-def export_checkins_xlsx(table_widget, file_path):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Check-ins Report"
 
-    headers = [table_widget.horizontalHeaderItem(i).text() for i in range(table_widget.columnCount())]
-    ws.append(headers)
+def export_rows_xlsx(headers, rows, file_path, title="Report"):
+    # Write-only mode streams rows to the file instead of keeping every cell
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
 
-    for row in range(table_widget.rowCount()):
-        row_data = []
-        for col in range(table_widget.columnCount()):
-            item = table_widget.item(row, col)
-            row_data.append(item.text() if item else "")
-        ws.append(row_data)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
 
     wb.save(file_path)
+
+
+@contextmanager
+def replacing(file_path):
+    """Yield the path of a temporary file beside file_path, moved over
+    file_path once the block completes. If the block raises, the temporary
+    file is removed instead and file_path, when it already exists, is left
+    as it was."""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        yield temp_path
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class ExportCancelled(Exception):
+    """Raised by export_report once its cancelled() returns True"""
+
+
+# Exporter for each file extension export_report accepts
+EXPORTERS = {
+    "csv": export_rows_csv,
+    "pdf": export_rows_pdf,
+    "xlsx": export_rows_xlsx,
+}
+
+
+def export_report(report_type, file_path, from_date, to_date, room_type="All", status="All", progress=None,
+                  cancelled=None):
+    """Write one report (see report_engine.REPORTS) to file_path, in the
+    format its extension names, streaming the rows from its query; returns
+    the number of rows written.
+
+    Runs on a db_executor thread; progress(rows_written) is called every
+    PROGRESS_ROWS rows. cancelled() is checked before each row and once the
+    file is written, and ExportCancelled raised as soon as it returns True.
+    A failed or cancelled export leaves no file behind, and an existing
+    file_path untouched (see replacing).
+    """
+    report = REPORTS[report_type]
+    file_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if file_format not in EXPORTERS:
+        raise ValueError(f"Cannot export to .{file_format} files")
+
+    written = 0
+
+    def check_cancelled():
+        if cancelled is not None and cancelled():
+            raise ExportCancelled(f"Export of {report.name} cancelled")
+
+    def rows(records):
+        nonlocal written
+        for record in records:
+            check_cancelled()
+            yield report.cells(record)
+            written += 1
+            if progress is not None and written % PROGRESS_ROWS == 0:
+                progress(written)
+
+    with replacing(file_path) as temp_path:
+        with closing(iter_report(report_type, from_date, to_date, room_type, status)) as records:
+            EXPORTERS[file_format](report.headers, rows(records), temp_path, title=report.name)
+        check_cancelled()
+    return written
@@ -7,6 +7,7 @@ from app.ui.main_window import MainWindow
 from app.core.auth import MachineAuthorizer
 from app.resources.resources import register_resources, unregister_resources
 from app.core.db import init_db
+from app.core.executor import db_executor
 import resources_rc  # type: ignore # noqa: F401 (registers Qt resources)
 from app.core.dev_config import DEV_MODE  # <-- moved here
 
@@ -17,6 +18,8 @@ DEV_MODE = True
 class HotelManagementApp:
     def __init__(self):
         self.app = QApplication(sys.argv)
+        # Let background queries finish before their connections are closed
+        self.app.aboutToQuit.connect(db_executor.wait)
         self.login_window = None
         self.main_window = None
         
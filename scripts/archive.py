@@ -0,0 +1,18 @@
+import argparse
+import logging
+from app.core.archive import archive_history
+from app.core.db import init_db
+
+def main():
+    """Move closed stays and old reservations into the archive database"""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--months', type=int, default=None,
+                        help="archive history older than this (default: [Database] archive_after_months)")
+    args = parser.parse_args()
+    init_db()
+    for table, count in archive_history(args.months).items():
+        print(f"{table}: {count} row(s) archived")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+ROWS = 1_000_000
+RUNS = 5
+FROM_DATE, TO_DATE = '2024-03-01', '2024-03-07'
+
+# get_filtered_checkins before and after the date normalization migration
+OLD_QUERY = '''
+    SELECT c.checkin_id, c.arrival_date, c.departure_date, c.status
+    FROM check_ins c
+    WHERE date(c.arrival_date) BETWEEN ? AND ?
+    ORDER BY c.arrival_date DESC
+'''
+NEW_QUERY = '''
+    SELECT c.checkin_id, c.arrival_date, c.departure_date, c.status
+    FROM check_ins c
+    WHERE c.arrival_date >= ? AND c.arrival_date < ?
+    ORDER BY c.arrival_date DESC
+'''
+
+
+def build_db(path, rows=ROWS):
+    """Create `rows` check-ins spread over six years, with mixed date formats"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE check_ins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, checkin_id TEXT, room_id INTEGER,
+            checkin_date TEXT, arrival_date TEXT, departure_date TEXT, status TEXT
+        )
+    ''')
+    rnd = random.Random(42)
+    start = date(2020, 1, 1)
+    formats = ['%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S']
+
+    def rows_iter():
+        for i in range(rows):
+            arrival = start + timedelta(days=rnd.randrange(6 * 365))
+            fmt = rnd.choice(formats)
+            yield (f'CI{i:08d}', rnd.randint(1, 100), arrival.strftime('%Y-%m-%d 12:00'),
+                   arrival.strftime(fmt), (arrival + timedelta(days=2)).strftime(fmt), 'checked_out')
+
+    conn.executemany('''
+        INSERT INTO check_ins (checkin_id, room_id, checkin_date, arrival_date, departure_date, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows_iter())
+    conn.execute('CREATE INDEX idx_check_ins_arrival_date ON check_ins (arrival_date)')
+    conn.commit()
+    return conn
+
+
+def normalize(conn):
+    """What migration 6 does to the stay dates"""
+    for column in ('arrival_date', 'departure_date'):
+        conn.execute(f'''
+            UPDATE check_ins SET {column} = date({column})
+            WHERE date({column}) IS NOT NULL AND {column} != date({column})
+        ''')
+    conn.commit()
+
+
+def measure(label, conn, query, params):
+    plan = ' | '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params))
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        rows = conn.execute(query, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<7} best {min(timings) * 1000:8.1f} ms  rows {len(rows):6d}  plan: {plan}")
+    return len(rows)
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_db(str(Path(tmp) / 'bench.db'), rows)
+        print(f"{rows} check-ins, arrivals {FROM_DATE} .. {TO_DATE}")
+        before = measure('before', conn, OLD_QUERY, (FROM_DATE, TO_DATE))
+        start = time.perf_counter()
+        normalize(conn)
+        print(f"migration {(time.perf_counter() - start) * 1000:8.1f} ms")
+        end = (date.fromisoformat(TO_DATE) + timedelta(days=1)).isoformat()
+        after = measure('after', conn, NEW_QUERY, (FROM_DATE, end))
+        assert before == after, (before, after)
+        conn.close()
@@ -0,0 +1,87 @@
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.rows import fetch_all  # noqa: E402
+
+ROWS = 100_000
+QUERY = '''
+    SELECT c.*, g.first_name, g.last_name, r.number as room_number, r.type as room_type
+    FROM check_ins c
+    LEFT JOIN guests g ON c.guest_id = g.id
+    LEFT JOIN rooms r ON c.room_id = r.id
+    ORDER BY c.checkin_date DESC
+'''
+
+
+def build_db(rows=ROWS):
+    """Create an in-memory database holding `rows` check-ins"""
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('''
+        CREATE TABLE guests (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT);
+        CREATE TABLE rooms (id INTEGER PRIMARY KEY, number TEXT, type TEXT);
+        CREATE TABLE check_ins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, checkin_id TEXT, transaction_id TEXT,
+            guest_id INTEGER, room_id INTEGER, checkin_date TEXT, arrival_date TEXT,
+            departure_date TEXT, num_guests INTEGER, total_paid REAL, amount_due REAL,
+            payment_method TEXT, status TEXT, actual_departure TEXT
+        );
+    ''')
+    rnd = random.Random(42)
+    conn.executemany('INSERT INTO guests VALUES (?, ?, ?)',
+                     [(i, f'First{i}', f'Last{i}') for i in range(1, 5001)])
+    conn.executemany('INSERT INTO rooms VALUES (?, ?, ?)',
+                     [(i, str(100 + i), rnd.choice(['Single', 'Double', 'Suite'])) for i in range(1, 101)])
+    conn.executemany('''
+        INSERT INTO check_ins (checkin_id, transaction_id, guest_id, room_id, checkin_date,
+            arrival_date, departure_date, num_guests, total_paid, amount_due, payment_method, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'CI{i:08d}', f'TX{i:08d}', rnd.randint(1, 5000), rnd.randint(1, 100),
+           f'2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00', '2024-01-01', '2024-01-03',
+           2, 500.0, 0.0, 'Cash', 'checked_out') for i in range(rows)])
+    conn.commit()
+    return conn
+
+
+def as_dicts(conn):
+    c = conn.execute(QUERY)
+    columns = [desc[0] for desc in c.description]
+    return [dict(zip(columns, row)) for row in c.fetchall()]
+
+
+def as_records(conn):
+    return fetch_all(conn.execute(QUERY))
+
+
+def measure(label, func, conn):
+    start = time.perf_counter()
+    rows = func(conn)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in rows:
+        row['room_number'], row['first_name'], row['status'], row.get('total_paid')
+    access = time.perf_counter() - start
+    del rows
+
+    # Memory is measured in a separate pass; tracing skews the timings
+    tracemalloc.start()
+    rows = func(conn)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+
+    print(f"{label:<7} materialize {elapsed * 1000:7.1f} ms  retained {retained / 2**20:6.1f} MiB  "
+          f"peak {peak / 2**20:6.1f} MiB  4 lookups/row {access * 1000:6.1f} ms")
+
+
+if __name__ == '__main__':
+    conn = build_db()
+    print(f"{ROWS} check-ins")
+    measure('dict', as_dicts, conn)
+    measure('Record', as_records, conn)
@@ -0,0 +1,497 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from inspect import isfunction
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core import db  # noqa: E402
+from app.core import report_engine  # noqa: E402
+from app.core.connection import db_manager  # noqa: E402
+from app.core.instrumentation import query_stats  # noqa: E402
+from app.core.rows import fetch_one  # noqa: E402
+
+# Timed runs per case, after one untimed warm-up run
+RUNS = 5
+# A case stops repeating once its runs add up to this many seconds
+MAX_SECONDS = 30.0
+# A case (warm-up run included) is given up after this many seconds
+TIMEOUT = 300.0
+# How long an interrupted case gets to stop before it is left behind
+INTERRUPT_GRACE = 5.0
+# Statements listed per case when --statements is given
+TOP_STATEMENTS = 5
+# Tables whose row counts are stored with the results
+COUNTED_TABLES = ['rooms', 'guests', 'check_ins', 'booking_services', 'company_accounts', 'company_charges',
+                  'reservations', 'reservation_cancellations', 'invoices', 'invoice_lines', 'room_nights',
+                  'daily_stats']
+# Functions that are not queries (see the instrument_module call in db.py)
+NOT_BENCHMARKED = {'get_connection', 'to_iso_date', 'to_iso_datetime', 'day_range', 'init_db'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def rolled_back(func):
+    """Run a writer inside a transaction that is rolled back afterwards,
+    so every run starts from the same data"""
+    def run(*args, **kwargs):
+        try:
+            with db.transaction():
+                raise _Rollback(func(*args, **kwargs))
+        except _Rollback as done:
+            return done.args[0]
+    run.__name__ = func.__name__
+    return run
+
+
+def drained(func):
+    """Run a generator function to the end, returning its rows as a list"""
+    def run(*args, **kwargs):
+        return list(func(*args, **kwargs))
+    run.__name__ = func.__name__
+    return run
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None or isinstance(result, (bool, int, float)) else 1
+
+
+def _sample(sql, params=()):
+    with db.cursor() as c:
+        c.execute(sql, params)
+        return c.fetchone()
+
+
+def _sample_row(sql, params=()):
+    with db.cursor() as c:
+        c.execute(sql, params)
+        return dict(fetch_one(c))
+
+
+def db_cases():
+    """(name, function, args) for the db.py functions, with arguments taken
+    from the data on file. Dates are relative to the newest arrival, which
+    is 'today' in a database from generate_data.py."""
+    today = date.fromisoformat(_sample('SELECT MAX(arrival_date) FROM check_ins')[0] or date.today().isoformat())
+    month, year = (today - timedelta(days=30)).isoformat(), (today - timedelta(days=365)).isoformat()
+    later = (today + timedelta(days=400)).isoformat()
+    guest_id, = _sample('SELECT guest_id FROM check_ins ORDER BY id DESC LIMIT 1')
+    guest = dict(db.get_guest(guest_id))
+    open_stay = _sample("SELECT id, checkin_id FROM check_ins WHERE status != 'checked_out' ORDER BY id DESC LIMIT 1")
+    booking_id, checkin_code = open_stay or _sample('SELECT id, checkin_id FROM check_ins ORDER BY id DESC LIMIT 1')
+    checkin = _sample_row('SELECT * FROM check_ins WHERE id = ?', (booking_id,))
+    room = db.get_room(checkin['room_id'])
+    reservation_code, = _sample("SELECT reservation_id FROM reservations WHERE status NOT IN ('Cancelled', 'Checked-in') "
+                                "ORDER BY id DESC LIMIT 1") or _sample('SELECT reservation_id FROM reservations '
+                                                                        'ORDER BY id DESC LIMIT 1')
+    reservation = dict(db.get_reservation(reservation_code))
+    reservation.setdefault('room_type', None)
+    company_id, = _sample('SELECT company_id FROM company_charges GROUP BY company_id ORDER BY COUNT(*) DESC LIMIT 1')
+    charge_id, = _sample('SELECT id FROM company_charges WHERE is_paid = 0 ORDER BY id DESC LIMIT 1') or (None,)
+    invoice_id, = _sample('SELECT MAX(id) FROM invoices')
+    service = dict(db.get_services()[0])
+    tax_rate = dict(db.get_tax_rates()[0]) if db.get_tax_rates() else None
+    first_guests = db.get_guests_page()
+    first_checkins = db.get_checkins_page()
+    first_reservations = db.get_reservations_page()
+    first_invoices = db.get_invoices_page()
+    # No user when the database has none; the updates then match no row
+    user_id = _sample('SELECT IFNULL(MIN(id), 0) FROM users')[0]
+    # Rows nothing else refers to, so deleting them succeeds
+    spare_guest = _sample('''
+        SELECT id FROM guests g
+        WHERE NOT EXISTS (SELECT 1 FROM check_ins WHERE guest_id = g.id)
+          AND NOT EXISTS (SELECT 1 FROM booking_services WHERE guest_id = g.id)
+          AND NOT EXISTS (SELECT 1 FROM company_charges WHERE guest_id = g.id)
+        ORDER BY id DESC LIMIT 1
+    ''')
+    booking_service_id, = _sample('SELECT MAX(id) FROM booking_services')
+
+    new_charge = {'booking_id': booking_id, 'guest_id': checkin['guest_id'], 'service_id': service['id'],
+                  'quantity': 1, 'unit_price_at_time_of_charge': service['default_price'],
+                  'total_charge': service['default_price'], 'charge_date': f'{today} 12:00:00'}
+    new_reservation = dict(reservation, reservation_id='BENCH0001', arrival_date=later,
+                           departure_date=(today + timedelta(days=403)).isoformat(), status='Confirmed',
+                           created_on=f'{today} 12:00:00')
+    new_checkin = {'checkin_id': 'BENCH0001', 'transaction_id': 'BENCH0001', 'guest_id': guest_id,
+                   'room_id': room['id'], 'checkin_date': f'{later} 14:00:00', 'arrival_date': later,
+                   'departure_date': (today + timedelta(days=402)).isoformat(), 'num_guests': 1,
+                   'total_paid': 0, 'amount_due': 0, 'payment_method': 'Cash', 'status': 'Pending'}
+    new_charge_row = {'company_id': company_id, 'checkin_id': checkin_code, 'guest_id': checkin['guest_id'],
+                      'room_charges': 1000, 'service_charges': 0, 'total_amount': 1000}
+    company = dict(db.get_company_account(company_id))
+    new_invoice = {'invoice_number': 'BENCH0001', 'date_generated': today.isoformat(), 'customer_name': 'Bench',
+                   'subtotal': 100, 'tax_amount': 10, 'total_amount': 110, 'balance_due': 110,
+                   'items': [{'description': 'Breakfast', 'quantity': 2, 'unit_price': 50}]}
+    new_room = dict(room, number='BENCH1')
+
+    cases = [
+        # Guests
+        ('get_all_guests', db.get_all_guests, ()),
+        ('iter_guests', drained(db.iter_guests), ()),
+        ('get_guests_page', db.get_guests_page, ()),
+        ('get_guests_page', db.get_guests_page, (first_guests[-1],)) if first_guests else None,
+        ('get_guest', db.get_guest, (guest_id,)),
+        ('get_guest_id_by_name', db.get_guest_id_by_name, (guest['first_name'], guest['last_name'])),
+        ('get_guest_services', db.get_guest_services, (guest_id,)),
+        ('get_guest_service_totals', db.get_guest_service_totals, ()),
+        ('get_guest_service_totals[search]', db.get_guest_service_totals, (guest['last_name'],)),
+        ('iter_guest_service_lines', drained(db.iter_guest_service_lines), ()),
+        ('iter_guest_service_totals', drained(db.iter_guest_service_totals), ()),
+        ('insert_guest', rolled_back(db.insert_guest), (dict(guest, id_number='BENCH0001'),)),
+        ('insert_guests_bulk', rolled_back(db.insert_guests_bulk),
+         ([dict(guest, id_number=f'BENCH{i:04d}') for i in range(1000)],)),
+        ('update_guest', rolled_back(db.update_guest), (guest_id, guest)),
+        ('mark_guest_services_paid', rolled_back(db.mark_guest_services_paid), (guest_id, 100)),
+        ('delete_guest', rolled_back(db.delete_guest), spare_guest) if spare_guest else None,
+        # Rooms and reference data
+        ('get_all_rooms', db.get_all_rooms, ()),
+        ('room_by_id', db.room_by_id, (room['id'],)),
+        ('get_room', db.get_room, (room['id'],)),
+        ('get_available_rooms_count', db.get_available_rooms_count, ()),
+        ('insert_room', rolled_back(db.insert_room), (new_room,)),
+        ('insert_rooms_bulk', rolled_back(db.insert_rooms_bulk),
+         ([dict(room, number=f'BENCH{i}') for i in range(50)],)),
+        ('update_room', rolled_back(db.update_room), (room['id'], dict(room))),
+        ('update_room_status', rolled_back(db.update_room_status), (room['id'], room['status'])),
+        ('get_hotel_settings', db.get_hotel_settings, ()),
+        ('update_hotel_settings', rolled_back(db.update_hotel_settings),
+         ({'hotel_name': 'Bench', 'hotel_address': '', 'phone': '', 'email': '', 'website': ''},)),
+        ('get_room_rates', db.get_room_rates, ()),
+        ('rate_for_room_type', db.rate_for_room_type, (room['type'],)),
+        ('update_room_rate', rolled_back(db.update_room_rate), (room['type'], 500)),
+        ('get_services', db.get_services, ()),
+        ('service_by_id', db.service_by_id, (service['id'],)),
+        ('add_service', rolled_back(db.add_service), (dict(service, name='Bench service'),)),
+        ('update_service', rolled_back(db.update_service), (service['id'], service)),
+        ('get_tax_rates', db.get_tax_rates, ()),
+        ('add_tax_rate', rolled_back(db.add_tax_rate), (dict(tax_rate, name='Bench tax'),)) if tax_rate else None,
+        ('update_tax_rate', rolled_back(db.update_tax_rate), (tax_rate['id'], tax_rate)) if tax_rate else None,
+        ('delete_tax_rate', rolled_back(db.delete_tax_rate), (tax_rate['id'],)) if tax_rate else None,
+        # Check-ins and service charges
+        ('get_all_checkins', db.get_all_checkins, ()),
+        ('iter_checkins', drained(db.iter_checkins), ()),
+        ('get_checkins_page', db.get_checkins_page, ()),
+        ('get_checkins_page', db.get_checkins_page, (first_checkins[-1],)) if first_checkins else None,
+        ('get_checkins_page[search]', db.get_checkins_page, (None, db.PAGE_SIZE, guest['last_name'])),
+        ('get_checkins_page[room type]', db.get_checkins_page, (None, db.PAGE_SIZE, None, None, None, room['type'])),
+        ('get_filtered_checkins', db.get_filtered_checkins, (month, today.isoformat())),
+        ('get_filtered_checkins', db.get_filtered_checkins, (year, today.isoformat(), room['type'], 'checked_out')),
+        ('iter_filtered_checkins', drained(db.iter_filtered_checkins), (year, today.isoformat())),
+        ('insert_checkin', rolled_back(db.insert_checkin), (new_checkin,)),
+        ('update_checkin', rolled_back(db.update_checkin), (checkin['checkin_id'], checkin)),
+        ('get_booking_services', db.get_booking_services, (booking_id,)),
+        ('get_booking_services', db.get_booking_services, (booking_id, True)),
+        ('iter_booking_services', drained(db.iter_booking_services), (True,)),
+        ('get_total_booking_charges', db.get_total_booking_charges, (booking_id,)),
+        ('get_unpaid_booking_charges', db.get_unpaid_booking_charges, (booking_id,)),
+        ('add_booking_service', rolled_back(db.add_booking_service), (new_charge,)),
+        ('add_booking_services_bulk', rolled_back(db.add_booking_services_bulk), ([new_charge] * 100,)),
+        ('settle_booking_services', rolled_back(db.settle_booking_services), (booking_id, 50)),
+        ('delete_booking_service', rolled_back(db.delete_booking_service), (booking_service_id,)),
+        # Dashboard and statistics
+        ('get_dashboard_snapshot', db.get_dashboard_snapshot, (today.isoformat(),)),
+        ('get_daily_stats', db.get_daily_stats, (month, today.isoformat())),
+        ('get_daily_stats', db.get_daily_stats, (year, today.isoformat(), room['type'])),
+        ('rebuild_daily_stats', rolled_back(db.rebuild_daily_stats), (month, today.isoformat())),
+        # Reservations and availability
+        ('get_reservations', db.get_reservations, ()),
+        ('iter_reservations', drained(db.iter_reservations), ()),
+        ('get_all_reservations', db.get_all_reservations, ()),
+        ('get_reservations_page', db.get_reservations_page, ()),
+        ('get_reservations_page', db.get_reservations_page, (first_reservations[-1],)) if first_reservations else None,
+        ('get_reservations_page[search]', db.get_reservations_page,
+         (None, db.PAGE_SIZE, reservation['guest_last_name'])),
+        ('get_reservations_page[status]', db.get_reservations_page, (None, db.PAGE_SIZE, None, None, 'Cancelled')),
+        ('get_filtered_reservations', db.get_filtered_reservations, (year, later)),
+        ('iter_filtered_reservations', drained(db.iter_filtered_reservations), (year, later)),
+        ('get_reservation', db.get_reservation, (reservation_code,)),
+        ('get_cancellation_details', db.get_cancellation_details, (reservation_code,)),
+        ('add_reservation', rolled_back(db.add_reservation), (new_reservation,)),
+        ('update_reservation', rolled_back(db.update_reservation), (reservation,)),
+        ('cancel_reservation', rolled_back(db.cancel_reservation), (reservation_code, {'reason': 'Benchmark'})),
+        ('delete_reservation', rolled_back(db.delete_reservation), (reservation_code,)),
+        ('check_in_reservation', rolled_back(db.check_in_reservation), (reservation_code,))
+        if reservation['status'] in db.ARRIVING_RESERVATION_STATUSES else None,
+        ('find_arriving_reservation', db.find_arriving_reservation,
+         (reservation['guest_first_name'], reservation['guest_last_name'], reservation['arrival_date'])),
+        ('is_available', db.is_available, (room['id'], today.isoformat(), (today + timedelta(days=7)).isoformat())),
+        ('free_rooms', db.free_rooms, (today.isoformat(), (today + timedelta(days=7)).isoformat())),
+        ('free_rooms', db.free_rooms, (reservation['arrival_date'], reservation['departure_date'], None,
+                                       reservation_code)),
+        ('find_overlaps', db.find_overlaps, (room['id'], month, later)),
+        ('get_room_nights', db.get_room_nights, (today.isoformat(), (today + timedelta(days=30)).isoformat())),
+        # Users
+        ('get_user_by_username', db.get_user_by_username, ('admin',)),
+        ('get_all_users', db.get_all_users, ()),
+        ('create_user', rolled_back(db.create_user), ('bench', 'x', 'Bench', 'User', 'staff')),
+        ('update_user_password', rolled_back(db.update_user_password), (user_id, 'x')),
+        ('deactivate_user', rolled_back(db.deactivate_user), (user_id,)),
+        # Companies
+        ('get_company_accounts', db.get_company_accounts, ()),
+        ('get_company_account', db.get_company_account, (company_id,)),
+        ('get_company_charges', db.get_company_charges, ()),
+        ('get_company_charges', db.get_company_charges, (company_id,)),
+        ('get_company_charges', db.get_company_charges, (company_id, 0)),
+        ('get_company_balance', db.get_company_balance, (company_id,)),
+        ('get_company_accounts_with_balances', db.get_company_accounts_with_balances, ()),
+        ('rebuild_company_balances', rolled_back(db.rebuild_company_balances), ()),
+        ('add_company_account', rolled_back(db.add_company_account), (dict(company, name='Bench company'),)),
+        ('update_company_account', rolled_back(db.update_company_account), (company,)),
+        ('add_company_charge', rolled_back(db.add_company_charge), (new_charge_row,)),
+        ('add_company_charges_bulk', rolled_back(db.add_company_charges_bulk), ([new_charge_row] * 100,)),
+        ('mark_company_charge_paid', rolled_back(db.mark_company_charge_paid), (charge_id,)) if charge_id else None,
+        # Invoices and search
+        ('get_invoices', db.get_invoices, ()),
+        ('iter_invoices', drained(db.iter_invoices), ()),
+        ('get_invoices_page', db.get_invoices_page, ()),
+        ('get_invoices_page', db.get_invoices_page, (first_invoices[-1],)) if first_invoices else None,
+        ('get_invoice', db.get_invoice, (invoice_id,)),
+        ('get_invoice_lines', db.get_invoice_lines, (invoice_id,)),
+        ('get_invoice_item_revenue', db.get_invoice_item_revenue, (year, today.isoformat())),
+        ('add_invoice', rolled_back(db.add_invoice), (new_invoice,)),
+        ('search_entities', db.search_entities, (guest['last_name'],)),
+        ('search_rows', db.search_rows, ('guest', guest['last_name'])),
+        ('search_rows', db.search_rows, ('reservation', reservation['guest_last_name'])),
+    ]
+    return [case for case in cases if case is not None], today
+
+
+def ui_cases(today):
+    """The data loaders the widgets run on db_executor threads: the report
+    engine and its exports, and the widget modules' own loaders (skipped,
+    with the reason, when the GUI dependencies are not installed)."""
+    month, year = (today - timedelta(days=30)).isoformat(), (today - timedelta(days=365)).isoformat()
+    cases, skipped = [], {}
+    for report_type in report_engine.REPORTS:
+        cases.append((f'report_engine.run_report[{report_type}]', report_engine.run_report,
+                      (report_type, month, today.isoformat(), 'All', 'All')))
+    cases.append(('report_engine.run_report[Daily Revenue, year]', report_engine.run_report,
+                  ('Daily Revenue', year, today.isoformat(), 'All', 'All')))
+    cases.append(('report_engine.run_report[Revenue, year]', report_engine.run_report,
+                  ('Revenue', year, today.isoformat(), 'All', 'All')))
+    cases.append(('report_engine.run_report[Services, year]', report_engine.run_report,
+                  ('Services', year, today.isoformat(), 'All', 'All')))
+    cases.append(('report_engine.iter_report[Revenue, year]', drained(report_engine.iter_report),
+                  ('Revenue', year, today.isoformat(), 'All', 'All')))
+    try:
+        from app.ui.services_report_tab import fetch_guest_services, export_services_xlsx
+    except ImportError as e:
+        skipped['services_report_tab'] = str(e)
+    else:
+        last_name = db.get_guest(_sample('SELECT MAX(id) FROM guests')[0])['last_name']
+        cases.append(('services_report_tab.fetch_guest_services[search]', fetch_guest_services, (last_name,)))
+        cases.append(('services_report_tab.fetch_guest_services', fetch_guest_services, ()))
+        cases.append(('services_report_tab.export_services_xlsx', export_services_xlsx,
+                      (os.path.join(tempfile.gettempdir(), 'benchmark_services.xlsx'),)))
+    try:
+        from app.utils.report_exporter import export_report
+    except ImportError as e:
+        skipped['report_exporter'] = str(e)
+    else:
+        for file_format in ('csv', 'xlsx', 'pdf'):
+            path = os.path.join(tempfile.gettempdir(), f'benchmark_revenue.{file_format}')
+            cases.append((f'report_exporter.export_report[Revenue, year, {file_format}]', export_report,
+                          ('Revenue', path, year, today.isoformat(), 'All', 'All')))
+    return cases, skipped
+
+
+def run_case(key, func, args, runs, max_seconds, statements, deadline=None):
+    """Time func(*args) and return its summary (see QueryStats.report).
+
+    No further run starts once time.perf_counter() has passed deadline.
+    """
+    query_stats.reset()
+    func(*args)
+    query_stats.reset()
+    spent = 0.0
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        query_stats.record_function(key, elapsed, _row_count(result))
+        spent += elapsed
+        if spent >= max_seconds or (deadline is not None and time.perf_counter() >= deadline):
+            break
+    report = query_stats.report()
+    summary = next(s for s in report['functions'] if s['name'] == key)
+    summary['function'] = func.__name__
+    if statements:
+        summary['statements'] = report['statements'][:TOP_STATEMENTS]
+    return summary
+
+
+def run_case_with_timeout(key, func, args, runs, max_seconds, statements, timeout):
+    """run_case on a worker thread with its own connection; None when the
+    case has not finished within timeout seconds.
+
+    The statement running at the timeout is interrupted. A case busy in
+    Python code instead is left to finish its current call in the
+    background, and starts no further run.
+    """
+    outcome = {}
+
+    def work():
+        outcome['connection'] = db_manager.get_connection()
+        try:
+            outcome['summary'] = run_case(key, func, args, runs, max_seconds, statements,
+                                          deadline=time.perf_counter() + timeout)
+        except Exception as e:
+            outcome['error'] = e
+        finally:
+            db_manager.close()
+
+    worker = threading.Thread(target=work, name=key, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        connection = outcome.get('connection')
+        if connection is not None:
+            connection.interrupt()
+        worker.join(INTERRUPT_GRACE)
+        return None
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['summary']
+
+
+def _case_key(name, seen):
+    """Unique result key: the function name, numbered when it is timed more than once"""
+    seen[name] = seen.get(name, 0) + 1
+    return name if seen[name] == 1 else f'{name}#{seen[name]}'
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent.parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results, threshold, min_ms, timed_out=()):
+    """Print (to stderr) the p50 of every case next to the baseline's; return
+    the regressions, counting the baseline's cases that now time out"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    regressions = []
+    for name in timed_out:
+        if name in baseline:
+            print(f"{'timeout':>8}  {name}: {baseline[name]['p50_ms']:.2f} ms -> timed out SLOWER", file=sys.stderr)
+            regressions.append(name)
+    for result in results:
+        before = baseline.get(result['name'])
+        if before is None:
+            print(f"{'new':>8}  {result['name']}: {result['p50_ms']:.2f} ms", file=sys.stderr)
+            continue
+        ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else 1.0
+        # Sub-millisecond cases jitter by more than the threshold from run to run
+        changed = abs(result['p50_ms'] - before['p50_ms']) >= min_ms
+        flag = '' if not changed else 'SLOWER' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else ''
+        print(f"{ratio:7.2f}x  {result['name']}: {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms {flag}",
+              file=sys.stderr)
+        if flag == 'SLOWER':
+            regressions.append(result['name'])
+    return regressions
+
+
+def main():
+    """Time the db.py functions and the widgets' data loaders against a database and write the results as JSON"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('path', help="database to run against, e.g. one made by scripts/generate_data.py")
+    parser.add_argument('--output', default=None, help="JSON file to write (default: print to stdout)")
+    parser.add_argument('--runs', type=int, default=RUNS, help=f"timed runs per case (default {RUNS})")
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS,
+                        help=f"stop repeating a case after this long (default {MAX_SECONDS:g})")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT,
+                        help=f"give up a case, warm-up included, after this many seconds and record it "
+                             f"as timed out (default {TIMEOUT:g})")
+    parser.add_argument('--only', default=None, help="run only the cases whose name contains this text")
+    parser.add_argument('--statements', action='store_true',
+                        help="also record the slowest SQL statements of each case (adds some overhead)")
+    parser.add_argument('--compare', default=None, metavar='BASELINE',
+                        help="print the p50 change against an earlier results file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative p50 change reported as a regression (default 0.2)")
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help="ignore p50 changes smaller than this many milliseconds (default 1)")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    if not os.path.exists(path):
+        parser.error(f"{path} does not exist")
+    db_manager.set_db_path(path)
+    db.init_db()
+    if args.statements:
+        query_stats.enable()
+
+    cases, today = db_cases()
+    more, skipped = ui_cases(today)
+    cases += more
+    covered = {func.__name__ for _name, func, _args in cases}
+    not_covered = sorted(name for name, obj in vars(db).items()
+                         if isfunction(obj) and obj.__module__ == db.__name__ and not name.startswith('_')
+                         and name not in covered and name not in NOT_BENCHMARKED)
+
+    results, timed_out, seen = [], {}, {}
+    for name, func, case_args in cases:
+        key = _case_key(name, seen)
+        if args.only and args.only not in key:
+            continue
+        summary = run_case_with_timeout(key, func, case_args, args.runs, args.max_seconds, args.statements,
+                                        args.timeout)
+        if summary is None:
+            timed_out[key] = args.timeout
+            print(f"{key:<55} timed out after {args.timeout:g} s", file=sys.stderr)
+            continue
+        results.append(summary)
+        print(f"{key:<55} p50 {summary['p50_ms']:10.2f} ms  rows {summary['rows'] // summary['calls']:>9}",
+              file=sys.stderr)
+
+    with db.cursor() as c:
+        volumes = {}
+        for table in COUNTED_TABLES:
+            c.execute(f'SELECT COUNT(*) FROM {table}')
+            volumes[table] = c.fetchone()[0]
+    data = {
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': _revision(),
+        'database': path,
+        'today': today.isoformat(),
+        'volumes': volumes,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'runs': args.runs,
+        'results': results,
+        'skipped': skipped,
+        'timed_out': timed_out,
+        'not_covered': not_covered,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold, args.min_ms, timed_out)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+import argparse
+import heapq
+import logging
+import os
+import random
+import sys
+from array import array
+from datetime import date, timedelta
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.connection import db_manager  # noqa: E402
+from app.core.db import (  # noqa: E402
+    init_db, transaction, insert_checkin, add_reservation, rebuild_company_balances, rebuild_daily_stats
+)
+from app.core.money import Money  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Default volumes; --scale multiplies all of them
+VOLUMES = {
+    'rooms': 500,
+    'companies': 500,
+    'guests': 200_000,
+    'checkins': 1_000_000,
+    'booking_services': 5_000_000,
+    'company_charges': 50_000,
+    'reservations': 50_000,
+    'invoices': 20_000,
+}
+
+# Rows written per transaction
+BATCH = 50_000
+
+ROOM_TYPES = [('Single', 1, 45000), ('Double', 2, 65000), ('Twin', 2, 65000),
+              ('Suite', 3, 120000), ('Family', 4, 95000)]
+SERVICES = [('Breakfast', 8000, 'person'), ('Dinner', 15000, 'person'), ('Laundry', 5000, 'item'),
+            ('Minibar', 3000, 'item'), ('Coffee', 1500, 'cup'), ('Tea', 1200, 'cup'),
+            ('Soft drink', 2000, 'bottle'), ('Airport transfer', 25000, 'trip'), ('Spa', 40000, 'session'),
+            ('Parking', 5000, 'day'), ('Late checkout', 20000, 'stay'), ('Room service', 6000, 'order')]
+FIRST_NAMES = ['Mohamed', 'Fatima', 'Youssef', 'Khadija', 'Omar', 'Aicha', 'Hassan', 'Salma', 'Karim',
+               'Nadia', 'Rachid', 'Imane', 'Mehdi', 'Sara', 'Anas', 'Leila', 'Pierre', 'Marie', 'John',
+               'Emma', 'Carlos', 'Lucia', 'Hans', 'Anna', 'Luca', 'Giulia', 'Kenji', 'Yuki', 'David', 'Laura']
+LAST_NAMES = ['Alaoui', 'Bennani', 'El Idrissi', 'Tazi', 'Berrada', 'Chraibi', 'Fassi', 'Amrani',
+              'Benjelloun', 'Ouazzani', 'Lahlou', 'Skalli', 'Martin', 'Bernard', 'Dubois', 'Smith',
+              'Johnson', 'Garcia', 'Lopez', 'Muller', 'Schmidt', 'Rossi', 'Bianchi', 'Tanaka', 'Sato',
+              'Brown', 'Wilson', 'Moreau', 'Lefebvre', 'Haddad']
+NATIONALITIES = ['Moroccan'] * 6 + ['French', 'Spanish', 'German', 'Italian', 'British', 'American', 'Japanese']
+ID_TYPES = ['Passport', 'National ID', "Driver's License"]
+PAYMENT_METHODS = ['Cash', 'Credit Card', 'Debit Card', 'Bank Transfer']
+CANCEL_REASONS = ['Change of plans', 'Found another hotel', 'Flight cancelled', 'Illness', 'No reason given']
+COMPANY_WORDS = ['Atlas', 'Sahara', 'Medina', 'Argan', 'Oasis', 'Rif', 'Souss', 'Tafilalet', 'Anfa', 'Menara']
+COMPANY_KINDS = ['Travel', 'Consulting', 'Logistics', 'Telecom', 'Engineering', 'Trading', 'Events']
+
+# Stay lengths in nights and days a room stays empty between two stays;
+# the mix gives an occupancy of roughly 70%
+NIGHTS = [1, 1, 2, 2, 2, 3, 3, 4, 5, 7, 10, 14]
+GAPS = [0, 0, 0, 1, 1, 1, 2, 3, 5, 8]
+
+
+def _schedule(seed, rooms, count):
+    """Yield (arrival day, room index, nights) for count stays in arrival order.
+
+    Every room takes a stay, stays empty for a while and takes the next one,
+    so stays of the same room never overlap. Days count from 0.
+    """
+    rnd = random.Random(seed)
+    free = [(rnd.choice(GAPS), room) for room in range(rooms)]
+    heapq.heapify(free)
+    for _ in range(count):
+        day, room = free[0]
+        nights = rnd.choice(NIGHTS)
+        heapq.heapreplace(free, (day + nights + rnd.choice(GAPS), room))
+        yield day, room, nights
+
+
+def _volumes(args):
+    volumes = {}
+    for name, default in VOLUMES.items():
+        value = getattr(args, name)
+        volumes[name] = max(1, round((default if value is None else value) * args.scale))
+    return volumes
+
+
+def _write(sql, rows, label):
+    """executemany rows in BATCH-sized transactions; return the number written"""
+    rows = iter(rows)
+    written = 0
+    while True:
+        batch = list(islice(rows, BATCH))
+        if not batch:
+            break
+        with transaction() as c:
+            c.executemany(sql, batch)
+        written += len(batch)
+        logger.info(f"{label}: {written}")
+    return written
+
+
+class Generator:
+    """Writes a deterministic hotel history ending on end_date.
+
+    The same seed, volumes and end date always produce the same rows.
+    Check-ins are laid out room by room without overlaps; the last stay
+    of a room is still open when it has not departed by end_date.
+    """
+
+    def __init__(self, volumes, seed, end_date):
+        self.v = volumes
+        self.seed = seed
+        self.rnd = random.Random(seed)
+        self.end_date = end_date
+        # Filled while the check-ins are written, for the rows that refer to them
+        self.guest_of = array('i', [0])
+        self.arrival_of = array('i', [0])
+        self.nights_of = array('b', [0])
+        self.paid_of = array('q', [0])
+        self.room_free = []
+
+    def day(self, offset):
+        return (self.start + timedelta(days=offset)).isoformat()
+
+    def moment(self, offset):
+        return f'{self.day(offset)} {self.rnd.randint(7, 22):02d}:{self.rnd.randint(0, 59):02d}:00'
+
+    def run(self):
+        # A first pass finds how many days the check-ins span, so the
+        # history can end on end_date
+        last = 0
+        for last, _room, _nights in _schedule(self.seed, self.v['rooms'], self.v['checkins']):
+            pass
+        self.last_day = last
+        self.start = self.end_date - timedelta(days=last)
+
+        self.reference_data()
+        self.companies()
+        self.guests()
+        self.checkins()
+        self.booking_services()
+        self.company_charges()
+        self.reservations()
+        self.invoices()
+        logger.info("Rebuilding daily_stats")
+        rebuild_daily_stats()
+        rebuild_company_balances()
+        with transaction() as c:
+            c.execute('''
+                UPDATE rooms SET status = 'Occupied'
+                WHERE id IN (SELECT room_id FROM check_ins WHERE status != 'checked_out')
+            ''')
+            # The bulk load is not news for other terminals
+            c.execute('DELETE FROM change_log')
+        db_manager.get_connection().execute('ANALYZE')
+
+    def reference_data(self):
+        rnd = self.rnd
+        rooms = []
+        per_floor = 50
+        for i in range(self.v['rooms']):
+            room_type, beds, _rate = ROOM_TYPES[rnd.randrange(len(ROOM_TYPES))]
+            floor = i // per_floor + 1
+            rooms.append((f'{floor}{i % per_floor + 1:02d}', room_type, beds, str(floor),
+                          rnd.choice(['Sea view', 'Garden view', 'Street view', 'Pool view']), 'Vacant'))
+        self.room_types = [(row[1], row[2]) for row in rooms]
+        self.rates = {room_type: rate for room_type, _beds, rate in ROOM_TYPES}
+        with transaction() as c:
+            c.executemany('INSERT INTO rooms (number, type, beds, floor, location, status) VALUES (?, ?, ?, ?, ?, ?)',
+                          rooms)
+            c.executemany('INSERT INTO room_rates (room_type, night_rate) VALUES (?, ?)',
+                          [(room_type, rate) for room_type, _beds, rate in ROOM_TYPES])
+            c.executemany('INSERT INTO services (name, default_price, unit) VALUES (?, ?, ?)', SERVICES)
+            c.execute('''
+                INSERT INTO hotel_settings (hotel_name, hotel_address, phone, email, website)
+                VALUES ('Hotel Kissan', 'Avenue Mohammed V, Agadir', '+212 528 000 000',
+                        'contact@kissan.example', 'kissan.example')
+            ''')
+            c.execute('''
+                INSERT INTO tax_rates (name, tax_type, percentage, amount, apply_to_rooms, apply_to_services)
+                VALUES ('VAT', 'percentage', 10, NULL, 1, 1), ('City tax', 'fixed', NULL, 2500, 1, 0)
+            ''')
+
+    def companies(self):
+        rnd = self.rnd
+        rows = []
+        for i in range(1, self.v['companies'] + 1):
+            name = f'{rnd.choice(COMPANY_WORDS)} {rnd.choice(COMPANY_KINDS)} {i}'
+            rows.append((name, f'{i} Boulevard Zerktouni, Casablanca', f'+212 522 {i:06d}',
+                         f'billing{i}@company.example', f'ICE{i:09d}', rnd.choice(['Net 30', 'Net 60']),
+                         rnd.choice([1_000_000, 2_500_000, 5_000_000]), rnd.choice([30, 60]),
+                         self.day(rnd.randint(0, self.last_day)) + ' 09:00:00'))
+        _write('''
+            INSERT INTO company_accounts (name, address, phone, email, tax_id, billing_terms,
+                credit_limit, payment_due_days, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows, 'company_accounts')
+
+    def _guest_rows(self):
+        rnd = self.rnd
+        for i in range(1, self.v['guests'] + 1):
+            first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+            company = rnd.randint(1, self.v['companies']) if rnd.random() < 0.1 else None
+            yield (first, last, rnd.choice(ID_TYPES), f'ID{i:09d}',
+                   date(rnd.randint(1950, 2004), rnd.randint(1, 12), rnd.randint(1, 28)).isoformat(),
+                   rnd.choice(NATIONALITIES), '+212', f'6{rnd.randint(10_000_000, 99_999_999)}',
+                   f'{first}.{last}{i}@mail.example'.lower().replace(' ', ''), f'{i} Rue {rnd.choice(LAST_NAMES)}',
+                   'VIP' if rnd.random() < 0.02 else None, None, company,
+                   self.day(rnd.randint(0, self.last_day)) + ' 12:00:00')
+
+    def guests(self):
+        _write('''
+            INSERT INTO guests (first_name, last_name, id_type, id_number, dob, nationality, phone_code,
+                phone_number, email, address, vip_status, preferences, company_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', self._guest_rows(), 'guests')
+
+    def checkins(self):
+        """Closed stays go in by executemany, open ones through insert_checkin
+        so their room_nights are taken; ids follow arrival order either way"""
+        rnd = self.rnd
+        sql = '''
+            INSERT INTO check_ins (checkin_id, transaction_id, guest_id, room_id, checkin_date, arrival_date,
+                departure_date, num_guests, total_paid, amount_due, payment_method, status, actual_departure)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+        stays = _schedule(self.seed, self.v['rooms'], self.v['checkins'])
+        self.room_free = [0] * self.v['rooms']
+        checkin_no = 0
+        while True:
+            chunk = list(islice(stays, BATCH))
+            if not chunk:
+                break
+            with transaction() as c:
+                closed = []
+                for day, room, nights in chunk:
+                    checkin_no += 1
+                    room_type, beds = self.room_types[room]
+                    guest_id = rnd.randint(1, self.v['guests'])
+                    paid = self.rates[room_type] * nights
+                    self.guest_of.append(guest_id)
+                    self.arrival_of.append(day)
+                    self.nights_of.append(nights)
+                    self.paid_of.append(paid)
+                    # Stays come in arrival order, so this ends as the room's last departure
+                    self.room_free[room] = day + nights
+                    row = [f'{checkin_no:08x}', f'{rnd.getrandbits(32):08x}', guest_id, room + 1,
+                           self.moment(day), self.day(day), self.day(day + nights), rnd.randint(1, beds),
+                           paid, 0, rnd.choice(PAYMENT_METHODS)]
+                    if day + nights > self.last_day:
+                        if closed:
+                            c.executemany(sql, closed)
+                            closed = []
+                        checkin = dict(zip(
+                            ('checkin_id', 'transaction_id', 'guest_id', 'room_id', 'checkin_date', 'arrival_date',
+                             'departure_date', 'num_guests', 'total_paid', 'amount_due', 'payment_method'),
+                            row), status='Completed')
+                        # The rows hold centimes; insert_checkin takes amounts in dirhams or Money
+                        checkin['total_paid'], checkin['amount_due'] = Money(paid), Money(0)
+                        insert_checkin(checkin)
+                    else:
+                        closed.append(row + ['checked_out', self.day(day + nights)])
+                if closed:
+                    c.executemany(sql, closed)
+            logger.info(f"check_ins: {checkin_no}")
+
+    def _booking_service_rows(self):
+        rnd = self.rnd
+        checkins = self.v['checkins']
+        total = self.v['booking_services']
+        mean = total / checkins
+        # Cumulative counts with jitter: exactly `total` rows, unevenly spread
+        done = 0
+        for checkin_id in range(1, checkins + 1):
+            target = total if checkin_id == checkins else round(checkin_id * mean + rnd.uniform(-mean, mean))
+            count = max(0, min(target, total) - done)
+            if not count:
+                continue
+            done += count
+            arrival, nights = self.arrival_of[checkin_id], self.nights_of[checkin_id]
+            departed = arrival + nights <= self.last_day
+            for _ in range(count):
+                service = rnd.randrange(len(SERVICES))
+                quantity = rnd.randint(1, 3)
+                price = SERVICES[service][1]
+                charged = price * quantity
+                day = arrival + rnd.randrange(nights)
+                yield (checkin_id, self.guest_of[checkin_id], service + 1, quantity, price, charged,
+                       self.moment(min(day, self.last_day)), None, None, int(departed),
+                       charged if departed else 0, 0 if departed else charged,
+                       self.day(arrival + nights) + ' 11:00:00' if departed else None)
+
+    def booking_services(self):
+        _write('''
+            INSERT INTO booking_services (booking_id, guest_id, service_id, quantity, unit_price_at_time_of_charge,
+                total_charge, charge_date, charged_by_user_id, notes, is_paid, amount_paid, remaining_amount,
+                payment_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', self._booking_service_rows(), 'booking_services')
+
+    def _company_charge_rows(self):
+        rnd = self.rnd
+        count = min(self.v['company_charges'], self.v['checkins'])
+        for checkin_id in sorted(rnd.sample(range(1, self.v['checkins'] + 1), count)):
+            departure = self.arrival_of[checkin_id] + self.nights_of[checkin_id]
+            paid = departure < self.last_day - 60 and rnd.random() < 0.9
+            amount = self.paid_of[checkin_id]
+            yield (rnd.randint(1, self.v['companies']), f'{checkin_id:08x}', self.guest_of[checkin_id],
+                   self.day(min(departure, self.last_day)) + ' 11:00:00', amount, 0, amount, int(paid),
+                   self.day(departure + rnd.randint(5, 60)) + ' 10:00:00' if paid else None,
+                   f'Check-in {checkin_id:08x}')
+
+    def company_charges(self):
+        _write('''
+            INSERT INTO company_charges (company_id, checkin_id, guest_id, charge_date, room_charges,
+                service_charges, total_amount, is_paid, payment_date, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', self._company_charge_rows(), 'company_charges')
+
+    def reservations(self):
+        """Past reservations end up checked in or cancelled; a tenth of them
+        are upcoming and go through add_reservation, room after room"""
+        rnd = self.rnd
+        total = self.v['reservations']
+        upcoming = total // 10
+        rows, cancellations = [], []
+        for number in range(1, total - upcoming + 1):
+            arrival = rnd.randint(0, self.last_day)
+            nights = rnd.choice(NIGHTS)
+            room = rnd.randrange(self.v['rooms'])
+            cancelled = rnd.random() < 0.15
+            created = arrival - rnd.randint(1, 60)
+            row = self._reservation_row(number, room, arrival, nights, 'Cancelled' if cancelled else 'Checked-in',
+                                        created)
+            rows.append(row)
+            if cancelled:
+                cancellations.append((row[0], self.moment(rnd.randint(created, arrival)),
+                                      rnd.choice(CANCEL_REASONS), 0, '', 'System'))
+        _write('''
+            INSERT INTO reservations (reservation_id, guest_first_name, guest_last_name, guest_email, guest_phone,
+                arrival_date, departure_date, num_guests, room_id, special_requests, payment_method,
+                deposit_amount, amount_due, status, created_on)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows, 'reservations')
+        _write('''
+            INSERT INTO reservation_cancellations (reservation_id, cancellation_date, reason,
+                refund_amount, notes, cancelled_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', cancellations, 'reservation_cancellations')
+
+        columns = ('reservation_id', 'guest_first_name', 'guest_last_name', 'guest_email', 'guest_phone',
+                   'arrival_date', 'departure_date', 'num_guests', 'room_id', 'special_requests',
+                   'payment_method', 'deposit_amount', 'amount_due', 'status', 'created_on')
+        with transaction():
+            for number in range(total - upcoming + 1, total + 1):
+                room = number % self.v['rooms']
+                arrival = max(self.room_free[room], self.last_day + 1) + rnd.choice(GAPS)
+                nights = rnd.choice(NIGHTS)
+                self.room_free[room] = arrival + nights
+                reservation = dict(zip(columns, self._reservation_row(
+                    number, room, arrival, nights, rnd.choice(['Confirmed', 'Confirmed', 'Pending']),
+                    self.last_day - rnd.randint(0, 30))))
+                # The rows hold centimes; add_reservation takes amounts in dirhams or Money
+                for key in ('deposit_amount', 'amount_due'):
+                    reservation[key] = Money(reservation[key])
+                add_reservation(reservation)
+        logger.info(f"reservations: {total}")
+
+    def _reservation_row(self, number, room, arrival, nights, status, created):
+        rnd = self.rnd
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        room_type, beds = self.room_types[room]
+        amount = self.rates[room_type] * nights
+        deposit = amount // 5 * rnd.randint(0, 1)
+        return (f'R{number:07x}', first, last, f'{first}.{last}{number}@mail.example'.lower().replace(' ', ''),
+                f'+2126{rnd.randint(10_000_000, 99_999_999)}', self.day(arrival), self.day(arrival + nights),
+                rnd.randint(1, beds), room + 1, None, rnd.choice(PAYMENT_METHODS), deposit, amount - deposit,
+                status, self.moment(max(created, 0)))
+
+    def invoices(self):
+        rnd = self.rnd
+        invoices, lines = [], []
+        for number in range(1, self.v['invoices'] + 1):
+            issued = rnd.randint(0, self.last_day)
+            subtotal = 0
+            for line_no in range(1, rnd.randint(1, 4) + 1):
+                if line_no == 1:
+                    room_type, _beds, price = ROOM_TYPES[rnd.randrange(len(ROOM_TYPES))]
+                    description, quantity = f'{room_type} room', rnd.choice(NIGHTS)
+                else:
+                    description, price, _unit = SERVICES[rnd.randrange(len(SERVICES))]
+                    quantity = rnd.randint(1, 5)
+                lines.append((number, line_no, description, quantity, price, price * quantity))
+                subtotal += price * quantity
+            tax = subtotal // 10
+            paid = subtotal + tax if rnd.random() < 0.8 else 0
+            invoices.append((f'INV-{number:07d}', self.day(issued), self.day(issued + 30),
+                             f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}', None, None, None, None,
+                             subtotal, tax, subtotal + tax, paid, subtotal + tax - paid, 'Net 30', None, None,
+                             self.day(issued) + ' 10:00:00'))
+        _write('''
+            INSERT INTO invoices (invoice_number, date_generated, due_date, customer_name, customer_email,
+                customer_phone, billing_address, tax_id, subtotal, tax_amount, total_amount, amount_paid,
+                balance_due, payment_terms, special_instructions, pdf_path, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', invoices, 'invoices')
+        _write('''
+            INSERT INTO invoice_lines (invoice_id, line_no, description, quantity, unit_price, line_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', lines, 'invoice_lines')
+
+
+def main():
+    """Fill a new database with a deterministic, configurable volume of hotel history"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('path', help="database file to create")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(),
+                        help="day the history ends on, YYYY-MM-DD (default: today)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every volume, e.g. 0.01 for a quick run")
+    parser.add_argument('--force', action='store_true', help="replace the file (and its archive) if it exists")
+    for name, default in VOLUMES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, help=f"default {default:,}")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    path = os.path.abspath(args.path)
+    db_manager.set_db_path(path)
+    files = [path, db_manager.get_archive_path()]
+    if any(os.path.exists(name) for name in files):
+        if not args.force:
+            parser.error(f"{path} already exists (use --force to replace it)")
+        for name in files:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(name + suffix):
+                    os.remove(name + suffix)
+
+    volumes = _volumes(args)
+    init_db()
+    Generator(volumes, args.seed, args.end_date).run()
+    db_manager.close_all()
+    for name, count in volumes.items():
+        print(f"{name}: {count:,}")
+    print(f"Written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import logging
+from app.core.db import init_db
+from app.core.migrations import get_schema_version, explain_indexes
+
+def main():
+    """Bring the database schema up to date and check index usage"""
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    print(f"Schema version: {get_schema_version()}")
+    missing = 0
+    for name, used, plan in explain_indexes():
+        print(f"{'OK  ' if used else 'MISS'} {name}: {plan}")
+        missing += not used
+    if missing:
+        print(f"\n{missing} index(es) not used by their probe query.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import argparse
+import logging
+from app.core.db import init_db, rebuild_daily_stats
+
+def main():
+    """Recompute daily_stats from the stays, service charges and cancellations on record"""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--from-date', default=None, help="first day to rebuild, YYYY-MM-DD (default: start of history)")
+    parser.add_argument('--to-date', default=None, help="last day to rebuild, YYYY-MM-DD (default: end of history)")
+    args = parser.parse_args()
+    init_db()
+    count = rebuild_daily_stats(args.from_date, args.to_date)
+    print(f"daily_stats: {count} row(s) rebuilt")
+
+if __name__ == "__main__":
+    main()
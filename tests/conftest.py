@@ -0,0 +1,16 @@
+import pytest
+
+from app.core import db
+from app.core.cache import ref_cache
+from app.core.connection import db_manager
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh, empty database for the test; its path is returned"""
+    path = str(tmp_path / 'kissan.db')
+    db_manager.set_db_path(path)
+    ref_cache.invalidate()
+    db.init_db()
+    yield path
+    db_manager.close_all()
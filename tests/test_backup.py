@@ -0,0 +1,59 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.core import db
+from app.core.archive import archive_history
+from app.core.backup import create_backup, restore_backup
+from app.core.connection import db_manager
+
+
+@pytest.fixture
+def stays(database):
+    """Two checked-out stays from 2024, which archive_history() moves"""
+    with db.transaction() as c:
+        c.execute("INSERT INTO guests (first_name, last_name) VALUES ('Ann', 'Lee')")
+        guest_id = c.lastrowid
+    for code in ('C1', 'C2'):
+        db.insert_checkin({
+            'checkin_id': code, 'transaction_id': code, 'guest_id': guest_id, 'room_id': None,
+            'checkin_date': '2024-03-01 14:00:00', 'arrival_date': '2024-03-01',
+            'departure_date': '2024-03-04', 'num_guests': 1, 'total_paid': 100, 'amount_due': 0,
+            'payment_method': 'Cash', 'status': 'checked_out',
+        })
+
+
+def archive_of(path):
+    """The archive file of a backup set"""
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, filename.replace('kissan-', 'kissan_archive-'))
+
+
+def checkin_codes():
+    with db.cursor() as c:
+        c.execute('SELECT checkin_id FROM all_check_ins ORDER BY checkin_id')
+        return [row[0] for row in c.fetchall()]
+
+
+def test_restoring_a_set_without_archive_empties_the_archive(stays):
+    path = create_backup()
+    # A set taken before the archive database existed
+    os.remove(archive_of(path))
+    assert archive_history(months=1)['check_ins'] == 2
+
+    safety_path = restore_backup(path)
+
+    # Both stays come back from the backup once, none from the old archive
+    assert checkin_codes() == ['C1', 'C2']
+    archive = sqlite3.connect(db_manager.get_archive_path())
+    try:
+        assert archive.execute('SELECT COUNT(*) FROM check_ins').fetchone()[0] == 0
+    finally:
+        archive.close()
+    # The archived rows are kept in the safety backup
+    archive = sqlite3.connect(archive_of(safety_path))
+    try:
+        assert archive.execute('SELECT COUNT(*) FROM check_ins').fetchone()[0] == 2
+    finally:
+        archive.close()
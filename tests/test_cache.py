@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from app.core import db
+from app.core.cache import ref_cache
+
+
+@pytest.fixture
+def room_id(database):
+    return db.insert_room({'number': '101', 'type': 'Single', 'status': 'Available'})
+
+
+def status_seen_by_another_thread(room_id):
+    """The room's status as another thread reads it through the cache"""
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(db.room_by_id(room_id)['status']))
+    reader.start()
+    reader.join()
+    return seen[0]
+
+
+def test_writer_in_outer_transaction_invalidates_on_commit(room_id):
+    assert db.room_by_id(room_id)['status'] == 'Available'
+
+    with db.transaction():
+        db.update_room_status(room_id, 'Occupied')
+        # Not committed yet: the other thread reloads the old row and keeps it
+        assert status_seen_by_another_thread(room_id) == 'Available'
+
+    assert db.room_by_id(room_id)['status'] == 'Occupied'
+    assert status_seen_by_another_thread(room_id) == 'Occupied'
+
+
+def test_rolled_back_writer_leaves_cache_alone(room_id):
+    db.get_all_rooms()
+    version = ref_cache.version('rooms')
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.update_room_status(room_id, 'Occupied')
+            raise RuntimeError
+
+    assert ref_cache.version('rooms') == version
+    assert db.room_by_id(room_id)['status'] == 'Available'
+
+
+def test_rolled_back_savepoint_drops_only_its_invalidation(room_id):
+    version = ref_cache.version('rooms')
+
+    with db.transaction():
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.update_room_status(room_id, 'Occupied')
+                raise RuntimeError
+        assert ref_cache.version('rooms') == version
+        db.update_room_status(room_id, 'Maintenance')
+
+    assert ref_cache.version('rooms') == version + 1
+    assert db.room_by_id(room_id)['status'] == 'Maintenance'
+
+
+def test_writer_outside_transaction_invalidates_at_once(room_id):
+    db.get_all_rooms()
+
+    db.update_room_status(room_id, 'Occupied')
+
+    assert status_seen_by_another_thread(room_id) == 'Occupied'
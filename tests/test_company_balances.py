@@ -0,0 +1,97 @@
+import pytest
+
+from app.core import db
+from app.core.archive import archive_history
+from app.core.money import Money
+
+
+@pytest.fixture
+def companies(database):
+    for name in ('Atlas', 'Rif'):
+        db.add_company_account({'name': name, 'credit_limit': 5000})
+    return [company['id'] for company in db.get_company_accounts()]
+
+
+def stay(code, departure='2024-03-04'):
+    """A checked-out stay for a new guest; (checkin_id, guest id) is returned"""
+    with db.transaction() as c:
+        c.execute("INSERT INTO guests (first_name, last_name) VALUES ('Ann', ?)", (code,))
+        guest_id = c.lastrowid
+    db.insert_checkin({
+        'checkin_id': code, 'transaction_id': code, 'guest_id': guest_id, 'room_id': None,
+        'checkin_date': '2024-03-01 14:00:00', 'arrival_date': '2024-03-01', 'departure_date': departure,
+        'num_guests': 1, 'total_paid': 0, 'amount_due': 0, 'payment_method': 'Company',
+        'status': 'checked_out',
+    })
+    return code, guest_id
+
+
+def company_charge(company_id, checkin, total):
+    return {'company_id': company_id, 'checkin_id': checkin[0], 'guest_id': checkin[1],
+            'room_charges': total, 'total_amount': total}
+
+
+def unpaid_total(company_id):
+    """The company's unpaid charges summed from company_charges"""
+    with db.cursor() as c:
+        c.execute('''SELECT IFNULL(SUM(total_amount), 0) AS "total [MONEY]" FROM company_charges
+                     WHERE company_id = ? AND is_paid = 0''', (company_id,))
+        return Money.of(c.fetchone()[0])
+
+
+def assert_balances_match(*company_ids):
+    for company_id in company_ids:
+        assert db.get_company_balance(company_id) == unpaid_total(company_id)
+        assert db.get_company_account(company_id)['open_balance'] == unpaid_total(company_id)
+
+
+def test_charges_and_payments_move_the_open_balance(companies):
+    atlas, rif = companies
+    first, second = stay('C1'), stay('C2')
+
+    paid = db.add_company_charge(company_charge(atlas, first, '100.10'))
+    db.add_company_charges_bulk([company_charge(atlas, second, 50), company_charge(rif, second, '20.5')])
+    assert db.get_company_balance(atlas) == Money.of('150.10')
+    assert db.get_company_account(rif)['open_balance'] == Money.of('20.50')
+    assert_balances_match(atlas, rif)
+
+    db.mark_company_charge_paid(paid)
+    # Paying an already paid charge must not take it off twice
+    db.mark_company_charge_paid(paid)
+    assert db.get_company_balance(atlas) == Money.of(50)
+    assert_balances_match(atlas, rif)
+
+
+def test_rolled_back_charge_leaves_the_balance(companies):
+    atlas, _rif = companies
+    checkin = stay('C1')
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_company_charge(company_charge(atlas, checkin, 80))
+            raise RuntimeError
+
+    assert db.get_company_account(atlas)['open_balance'] == Money(0)
+    assert_balances_match(atlas)
+
+
+def test_deleted_charges_keep_the_balance_right(companies):
+    atlas, rif = companies
+    settled, owing = stay('C1'), stay('C2')
+    paid = db.add_company_charge(company_charge(atlas, settled, 300))
+    db.add_company_charge(company_charge(atlas, owing, 120))
+    db.add_company_charge(company_charge(rif, owing, 45))
+    db.mark_company_charge_paid(paid)
+
+    # Archiving deletes the settled stay's charge from the live table
+    moved = archive_history(months=1)
+    assert moved['company_charges'] == 1
+    assert db.get_company_balance(atlas) == Money.of(120)
+    assert_balances_match(atlas, rif)
+
+    # A charge deleted by hand is picked up by the rebuild
+    with db.transaction() as c:
+        c.execute('DELETE FROM company_charges WHERE company_id = ?', (rif,))
+    db.rebuild_company_balances()
+    assert db.get_company_balance(rif) == Money(0)
+    assert_balances_match(atlas, rif)
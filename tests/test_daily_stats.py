@@ -0,0 +1,131 @@
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from app.core import db
+from app.core.money import Money
+
+
+@pytest.fixture
+def rooms(database):
+    return (db.insert_room({'number': '101', 'type': 'Single', 'status': 'Available'}),
+            db.insert_room({'number': '201', 'type': 'Double', 'status': 'Available'}))
+
+
+def check_in(code, room_id, arrival, departure, total_paid):
+    with db.transaction() as c:
+        c.execute("INSERT INTO guests (first_name, last_name) VALUES ('Ann', ?)", (code,))
+        guest_id = c.lastrowid
+    db.insert_checkin({
+        'checkin_id': code, 'transaction_id': code, 'guest_id': guest_id, 'room_id': room_id,
+        'checkin_date': f'{arrival} 14:00:00', 'arrival_date': arrival, 'departure_date': departure,
+        'num_guests': 1, 'total_paid': total_paid, 'amount_due': 0, 'payment_method': 'Cash', 'status': 'Paid',
+    })
+    with db.cursor() as c:
+        c.execute('SELECT id FROM check_ins WHERE checkin_id = ?', (code,))
+        return c.fetchone()[0]
+
+
+def charge(booking_id, service_id, charge_date, total):
+    return db.add_booking_service({
+        'booking_id': booking_id, 'service_id': service_id, 'quantity': 1,
+        'unit_price_at_time_of_charge': total, 'total_charge': total,
+        'charge_date': f'{charge_date} 09:30:00',
+    })
+
+
+def days(first, last):
+    day = date.fromisoformat(first)
+    while day <= date.fromisoformat(last):
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def live_figures():
+    """Per day figures summed straight from the check-ins, charges and
+    cancellations, the way the reports did before daily_stats"""
+    figures = {}
+
+    def day(stat_date):
+        return figures.setdefault(stat_date, Counter())
+
+    with db.cursor() as c:
+        c.execute('''SELECT arrival_date, IFNULL(actual_departure, departure_date), total_paid
+                     FROM check_ins''')
+        for arrival, departure, paid in c.fetchall():
+            nights = list(days(arrival, departure))[:-1] or [arrival]
+            for i, night in enumerate(nights):
+                day(night)['rooms_sold'] += 1
+                day(night)['room_revenue'] += paid.cents // len(nights) + (i < paid.cents % len(nights))
+            day(arrival)['arrivals'] += 1
+            day(departure)['departures'] += 1
+        c.execute('SELECT date(charge_date), total_charge FROM booking_services')
+        for charged, total in c.fetchall():
+            day(charged)['service_revenue'] += total.cents
+        c.execute('SELECT date(cancellation_date) FROM reservation_cancellations')
+        for (cancelled,) in c.fetchall():
+            day(cancelled)['cancellations'] += 1
+    return figures
+
+
+def stored_figures(first, last):
+    figures = {}
+    for row in db.get_daily_stats(first, last):
+        figures[row['stat_date']] = Counter({
+            'rooms_sold': row['rooms_sold'], 'arrivals': row['arrivals'],
+            'departures': row['departures'], 'cancellations': row['cancellations'],
+            'room_revenue': row['room_revenue'].cents, 'service_revenue': row['service_revenue'].cents,
+        })
+    return figures
+
+
+def test_writers_keep_daily_stats_equal_to_the_live_figures(rooms):
+    single, double = rooms
+    db.add_service({'name': 'Breakfast', 'default_price': 50, 'unit': 'person'})
+    service_id = db.get_services()[0]['id']
+
+    first = check_in('C1', single, '2026-11-01', '2026-11-04', '300.01')
+    check_in('C2', double, '2026-11-02', '2026-11-03', 500)
+    check_in('C3', double, '2026-11-05', '2026-11-05', 120)
+    charge(first, service_id, '2026-11-02', 50)
+    dropped = charge(first, service_id, '2026-11-10', 75)
+    db.delete_booking_service(dropped)
+    # C1 leaves a night early
+    db.update_checkin('C1', {'total_paid': '300.01', 'amount_due': 0, 'payment_method': 'Cash',
+                             'status': 'checked_out', 'actual_departure': '2026-11-03'})
+    db.add_reservation({
+        'reservation_id': 'R1', 'guest_first_name': 'Bo', 'guest_last_name': 'Ng',
+        'arrival_date': '2026-12-01', 'departure_date': '2026-12-02', 'num_guests': 1,
+        'room_id': single, 'room_type': 'Single', 'status': 'Confirmed',
+        'created_on': '2026-10-01 10:00:00', 'deposit_amount': 0, 'amount_due': 0,
+    })
+    db.cancel_reservation('R1', {'reason': 'Plans changed'})
+
+    live = live_figures()
+    # The whole of November and December, and the day of the cancellation
+    first_day, last_day = min(*live, '2026-11-01'), max(*live, '2026-12-31')
+    expected = {day: figures for day, figures in live.items() if +figures}
+    stored = {day: figures for day, figures in stored_figures(first_day, last_day).items() if +figures}
+
+    assert stored == expected
+    assert sum(figures['room_revenue'] for figures in stored.values()) == Money.of('920.01').cents
+    assert stored['2026-11-02']['rooms_sold'] == 2
+    assert stored['2026-11-03']['departures'] == 2
+
+
+def test_rebuild_matches_the_incremental_refreshes(rooms):
+    single, double = rooms
+    check_in('C1', single, '2026-11-01', '2026-11-04', 300)
+    check_in('C2', double, '2026-11-03', '2026-11-06', 450)
+    db.update_checkin('C2', {'total_paid': 450, 'amount_due': 0, 'payment_method': 'Cash',
+                             'status': 'checked_out', 'actual_departure': '2026-11-04'})
+
+    def table():
+        with db.cursor() as c:
+            c.execute('SELECT * FROM daily_stats ORDER BY stat_date, room_type')
+            return [tuple(row) for row in c.fetchall()]
+
+    before = table()
+    assert db.rebuild_daily_stats() > 0
+    assert table() == before
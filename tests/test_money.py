@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+
+from app.core.connection import db_manager
+from app.core.migrations import migrate
+from app.core.money import Money, to_cents
+
+
+def test_sums_are_exact():
+    assert Money.of(0.1) + Money.of(0.2) == Money.of('0.30')
+    assert sum([Money.of('19.99')] * 3, Money(0)) == Money(5997)
+    assert Money.of(100) - 0.01 == Money(9999)
+    assert 250 - Money.of('0.5') == Money.of('249.50')
+
+
+@pytest.mark.parametrize('value, cents', [
+    (0.285, 29),            # the float's shortest repr, not 0.28499999...
+    ('10.005', 1001),       # half-up
+    ('-10.005', -1001),
+    ('MAD 1 234,50', 123450),
+    (Decimal('7.1'), 710),
+    (12, 1200),
+])
+def test_amounts_round_half_up_to_the_centime(value, cents):
+    assert Money.of(value).cents == cents
+    assert to_cents(value) == cents
+
+
+def test_scaling_rounds_once():
+    assert Money.of('19.99') * 3 == Money.of('59.97')
+    assert Money.of('100.05').percent(10) == Money.of('10.01')
+    assert Money.of('0.10') * 0.5 == Money(5)
+    assert Money.of(10) / 3 == Money.of('3.33')
+    assert Money.of(50) / Money.of(200) == 0.25
+
+
+def test_compares_and_prints_like_the_old_floats():
+    assert Money.of('0.05') == 0.05
+    assert Money.of(1) < 1.5 and Money.of(2) > Money.of('1.99')
+    assert not Money(0) and Money.of(None) is None
+    assert str(Money.of('1234.5')) == '1234.50'
+    assert f"{Money.of('1234.5'):,.2f}" == '1,234.50'
+    assert float(Money(1999)) == 19.99
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """A database at schema version 7 whose money columns are still REAL and
+    DECIMAL, as databases created before migration 8 have them"""
+    db_manager.set_db_path(str(tmp_path / 'legacy.db'))
+    with db_manager.transaction() as c:
+        c.execute('CREATE TABLE room_rates (room_type TEXT PRIMARY KEY, night_rate REAL NOT NULL)')
+        c.execute('''
+            CREATE TABLE company_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                credit_limit DECIMAL(10,2)
+            )
+        ''')
+        c.execute('CREATE INDEX idx_company_accounts_name ON company_accounts (name)')
+        c.executemany('INSERT INTO room_rates VALUES (?, ?)', [('Single', 450.5), ('Suite', 1299.99)])
+        c.execute("INSERT INTO company_accounts (name, credit_limit) VALUES ('Atlas', 10000.25), ('Rif', NULL)")
+        c.execute('PRAGMA user_version = 7')
+    yield
+    db_manager.close_all()
+
+
+def test_migration_8_rewrites_money_columns(legacy_db):
+    assert migrate(8) == [8]
+
+    with db_manager.cursor() as c:
+        for table, column in (('room_rates', 'night_rate'), ('company_accounts', 'credit_limit')):
+            c.execute('SELECT type FROM pragma_table_info(?) WHERE name = ?', (table, column))
+            assert c.fetchone()[0] == 'MONEY'
+            c.execute(f'SELECT DISTINCT typeof({column}) FROM {table} WHERE {column} IS NOT NULL')
+            assert [row[0] for row in c.fetchall()] == ['integer']
+
+        c.execute('SELECT room_type, night_rate FROM room_rates ORDER BY room_type')
+        assert c.fetchall() == [('Single', Money(45050)), ('Suite', Money(129999))]
+        c.execute('SELECT name, credit_limit FROM company_accounts ORDER BY id')
+        assert c.fetchall() == [('Atlas', Money(1000025)), ('Rif', None)]
+        c.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'company_accounts'")
+        assert 'idx_company_accounts_name' in [row[0] for row in c.fetchall()]
@@ -0,0 +1,138 @@
+import pytest
+
+from app.core import db
+from app.services.checkin_service import CheckInService
+
+
+@pytest.fixture
+def room_id(database):
+    """A fresh database with one room, whose id is returned"""
+    return db.insert_room({'number': '101', 'type': 'Single', 'status': 'Available'})
+
+
+@pytest.fixture
+def guest_id(room_id):
+    with db.transaction() as c:
+        c.execute("INSERT INTO guests (first_name, last_name, id_number) VALUES ('Ann', 'Lee', 'X1')")
+        return c.lastrowid
+
+
+def make_reservation(code, room_id, arrival='2026-11-01', departure='2026-11-04', status='Confirmed'):
+    db.add_reservation({
+        'reservation_id': code, 'guest_first_name': 'Ann', 'guest_last_name': 'Lee',
+        'arrival_date': arrival, 'departure_date': departure, 'num_guests': 1,
+        'room_id': room_id, 'room_type': 'Single', 'status': status,
+        'created_on': '2026-10-01 10:00:00', 'deposit_amount': 0, 'amount_due': 0,
+    })
+
+
+def make_checkin(code, guest_id, room_id, arrival='2026-11-01', departure='2026-11-04'):
+    return {
+        'checkin_id': code, 'transaction_id': code, 'guest_id': guest_id, 'room_id': room_id,
+        'checkin_date': f'{arrival} 14:00:00', 'arrival_date': arrival, 'departure_date': departure,
+        'num_guests': 1, 'total_paid': 0, 'amount_due': 0, 'payment_method': 'Cash', 'status': 'Paid',
+    }
+
+
+def held_by(room_id):
+    """(kind, code) of the bookings holding the room in November"""
+    return {(night['kind'], night['code']) for night in db.get_room_nights('2026-11-01', '2026-12-01')
+            if night['room_id'] == room_id}
+
+
+def test_check_in_on_reservation_takes_its_nights(room_id, guest_id):
+    make_reservation('R1', room_id)
+
+    CheckInService().perform_check_in(make_checkin('C1', guest_id, room_id), reservation_id='R1')
+
+    assert db.get_reservation('R1')['status'] == 'Checked-in'
+    assert held_by(room_id) == {('check_in', 'C1')}
+
+
+def test_reserved_room_is_free_only_for_its_reservation(room_id):
+    make_reservation('R1', room_id)
+
+    assert db.free_rooms('2026-11-02', '2026-11-03') == []
+    assert [room['id'] for room in db.free_rooms('2026-11-02', '2026-11-03', reservation_id='R1')] == [room_id]
+
+
+def test_check_in_without_reservation_conflicts(room_id, guest_id):
+    make_reservation('R1', room_id)
+
+    with pytest.raises(db.RoomUnavailableError):
+        CheckInService().perform_check_in(make_checkin('C1', guest_id, room_id))
+
+    assert db.get_reservation('R1')['status'] == 'Confirmed'
+    assert held_by(room_id) == {('reservation', 'R1')}
+
+
+def test_check_in_conflicting_with_another_reservation_rolls_back(room_id, guest_id):
+    make_reservation('R1', room_id, arrival='2026-11-01', departure='2026-11-04')
+    make_reservation('R2', room_id, arrival='2026-11-04', departure='2026-11-06')
+
+    # Staying a night longer than R1 runs into R2
+    with pytest.raises(db.RoomUnavailableError):
+        CheckInService().perform_check_in(make_checkin('C1', guest_id, room_id, departure='2026-11-05'),
+                                          reservation_id='R1')
+
+    assert db.get_reservation('R1')['status'] == 'Confirmed'
+    assert held_by(room_id) == {('reservation', 'R1'), ('reservation', 'R2')}
+
+
+def test_only_arriving_reservations_can_be_checked_in(room_id, guest_id):
+    make_reservation('R1', room_id)
+    db.cancel_reservation('R1', {'reason': 'Plans changed'})
+
+    with pytest.raises(ValueError):
+        CheckInService().perform_check_in(make_checkin('C1', guest_id, room_id), reservation_id='R1')
+
+    assert db.get_reservation('R1')['status'] == 'Cancelled'
+    assert held_by(room_id) == set()
+
+
+def test_overlapping_reservations_conflict(room_id):
+    make_reservation('R1', room_id, arrival='2026-11-01', departure='2026-11-04')
+
+    with pytest.raises(db.RoomUnavailableError):
+        make_reservation('R2', room_id, arrival='2026-11-03', departure='2026-11-05')
+    # Arriving the day the other stay leaves is no overlap
+    make_reservation('R3', room_id, arrival='2026-11-04', departure='2026-11-05')
+
+    assert held_by(room_id) == {('reservation', 'R1'), ('reservation', 'R3')}
+    assert db.get_reservation('R2') is None
+
+
+def test_find_arriving_reservation(room_id):
+    make_reservation('R1', room_id, arrival='2026-11-01', departure='2026-11-04')
+    make_reservation('R2', room_id, arrival='2026-11-10', departure='2026-11-12', status='Cancelled')
+
+    assert db.find_arriving_reservation('ann', 'LEE', '2026-11-03')['reservation_id'] == 'R1'
+    assert db.find_arriving_reservation('Ann', 'Lee', '2026-11-04') is None
+    assert db.find_arriving_reservation('Ann', 'Lee', '2026-11-10') is None
+
+
+def test_cancelling_twice_or_unknown_reservation_raises(room_id):
+    make_reservation('R1', room_id)
+    db.cancel_reservation('R1', {'reason': 'Plans changed'})
+
+    with pytest.raises(ValueError):
+        db.cancel_reservation('R1', {'reason': 'Plans changed'})
+    with pytest.raises(ValueError):
+        db.cancel_reservation('R404', {'reason': 'Plans changed'})
+
+    with db.cursor() as c:
+        c.execute("SELECT COUNT(*) FROM reservation_cancellations WHERE reservation_id = 'R1'")
+        assert c.fetchone()[0] == 1
+
+
+def test_failed_cancellation_rolls_back_the_outer_transaction(room_id):
+    make_reservation('R1', room_id)
+
+    with pytest.raises(KeyError):
+        with db.transaction():
+            db.update_room_status(room_id, 'Maintenance')
+            db.cancel_reservation('R1', {})  # no reason given
+
+    assert db.get_reservation('R1')['status'] == 'Confirmed'
+    assert db.room_by_id(room_id)['status'] == 'Available'
+    assert held_by(room_id) == {('reservation', 'R1')}
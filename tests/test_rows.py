@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from app.core import db
+from app.core.rows import fetch_all, fetch_one
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE rooms (id INTEGER PRIMARY KEY, number TEXT, status TEXT)')
+    conn.executemany('INSERT INTO rooms (number, status) VALUES (?, ?)',
+                     [('101', 'Available'), ('102', 'Occupied')])
+    yield conn
+    conn.close()
+
+
+def test_record_reads_like_a_dict(conn):
+    row = fetch_one(conn.execute('SELECT * FROM rooms ORDER BY id'))
+
+    assert row['number'] == '101' and row.number == '101'
+    assert row.get('status') == 'Available' and row.get('missing', 'x') == 'x'
+    assert 'status' in row and 'missing' not in row
+    assert dict(row) == {'id': 1, 'number': '101', 'status': 'Available'}
+    with pytest.raises(KeyError):
+        row['missing']
+
+
+def test_record_writes_stay_private_to_the_row(conn):
+    first, second = fetch_all(conn.execute('SELECT * FROM rooms ORDER BY id'))
+
+    first['status'] = 'Maintenance'
+    first['floor'] = 1
+    del second['number']
+
+    assert first['status'] == 'Maintenance' and first['floor'] == 1
+    assert list(first) == ['id', 'number', 'status', 'floor']
+    assert dict(second) == {'id': 2, 'status': 'Occupied'}
+    assert 'floor' not in second and type(first) is not type(second)
+
+
+def test_cached_rows_are_shared_and_read_only(database):
+    room_id = db.insert_room({'number': '101', 'type': 'Single', 'status': 'Available'})
+
+    room = db.room_by_id(room_id)
+    assert db.get_all_rooms()[0] is room
+    with pytest.raises(TypeError):
+        room['status'] = 'Occupied'
+
+    editable = room.copy()
+    editable['status'] = 'Occupied'
+    assert db.room_by_id(room_id)['status'] == 'Available'